@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: token_required latency against profile image size.
+
+Times the user auth decorator (JWT decode + principal load) for users whose
+profile images range from nothing to 4MB. Images live in the blob store and
+password hashes are deferred, so the auth query reads only narrow columns and
+latency should stay flat. The "inline" column replays the pre-blob-store
+layout (base64 image in the user row) for comparison.
+"""
+
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_path}'
+
+import base64
+import jwt
+from sqlalchemy import text
+from src.main import app
+from src.models.user import db, User
+from src.routes.user import SECRET_KEY, token_required
+from src.services.blob_store import blob_storage
+
+IMAGE_SIZES = [0, 16 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024]
+ITERATIONS = 500
+WARMUP = 50
+
+
+@token_required
+def _noop(current_user):
+    return current_user.id
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def seed(size, index):
+    image = os.urandom(size) if size else None
+    with app.app_context():
+        user = User(username=f'bench{index}', email=f'bench{index}@example.com', password_hash='x')
+        if image:
+            user.profile_image_blob = blob_storage.store(image)
+        db.session.add(user)
+        db.session.commit()
+
+        # The old layout: the same row with the image inline as base64
+        db.session.execute(
+            text('INSERT INTO legacy_user (id, username, email, password_hash, profile_image, is_blocked) '
+                 'VALUES (:id, :username, :email, :password_hash, :profile_image, 0)'),
+            {'id': user.id, 'username': user.username, 'email': user.email, 'password_hash': 'x',
+             'profile_image': base64.b64encode(image).decode() if image else None}
+        )
+        db.session.commit()
+        return user.id
+
+
+def time_current(user_id):
+    token = jwt.encode({'user_id': user_id}, SECRET_KEY, algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+    samples = []
+    for _ in range(WARMUP + ITERATIONS):
+        # A fresh request context per call, so the identity map starts empty
+        with app.test_request_context(headers=headers):
+            started = time.perf_counter()
+            _noop()
+            samples.append(time.perf_counter() - started)
+    return samples[WARMUP:]
+
+
+def time_inline(user_id):
+    token = jwt.encode({'user_id': user_id}, SECRET_KEY, algorithm='HS256')
+    samples = []
+    for _ in range(WARMUP + ITERATIONS):
+        with app.app_context():
+            started = time.perf_counter()
+            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            row = db.session.execute(
+                text('SELECT * FROM legacy_user WHERE id = :id'), {'id': data['user_id']}
+            ).first()
+            assert row is not None and not row.is_blocked
+            samples.append(time.perf_counter() - started)
+    return samples[WARMUP:]
+
+
+def main():
+    app.config['BLOB_STORAGE_PATH'] = tempfile.mkdtemp()
+    blob_storage.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(text(
+            'CREATE TABLE legacy_user (id INTEGER PRIMARY KEY, username TEXT, email TEXT, '
+            'password_hash TEXT, profile_image TEXT, is_blocked BOOLEAN)'
+        ))
+        db.session.commit()
+
+    print("=== Auth Decorator Latency vs Profile Image Size ===")
+    print()
+    print(f"{'image size':>12} {'current p50':>12} {'current p95':>12} {'inline p50':>12} {'inline p95':>12}")
+
+    for index, size in enumerate(IMAGE_SIZES):
+        user_id = seed(size, index)
+        current = time_current(user_id)
+        inline = time_inline(user_id)
+        print(f"{size // 1024:>10}KB "
+              f"{percentile(current, 0.5) * 1e6:>10.0f}us {percentile(current, 0.95) * 1e6:>10.0f}us "
+              f"{percentile(inline, 0.5) * 1e6:>10.0f}us {percentile(inline, 0.95) * 1e6:>10.0f}us")
+
+    print()
+    print(f"{ITERATIONS} calls per size; 'inline' is the pre-blob-store row layout")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        os.remove(_db_path)
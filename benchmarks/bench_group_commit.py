@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent /api/send throughput with and without group commit.
+
+Each thread sends from its own funded wallet, so requests never contend on
+a balance row, only on the commit itself. Reports successful sends per
+second, failed sends and p50/p95 latency for per-request commits and for
+group commit.
+
+The database lives in BENCH_DB_DIR (default: the system temp dir). Point
+it at a real disk; on tmpfs an fsync costs nothing and there is little to
+group. With the default WAL + synchronous=NORMAL profile a commit does not
+fsync either, so expect similar throughput, a tighter p95 and a much higher
+p50 for group commit.
+
+Usage: python benchmarks/bench_group_commit.py [threads] [sends_per_thread]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db', dir=os.environ.get('BENCH_DB_DIR'))
+os.close(_db_fd)
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_path}'
+
+import jwt
+from src.main import app
+from src.models.user import db, User, Wallet
+from src.routes.user import SECRET_KEY
+from src.utils.money import to_units
+
+THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+SENDS_PER_THREAD = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+MODES = [
+    ('per-request', False),
+    ('group commit', True),
+]
+
+
+def seed():
+    """One verified user per thread with a BTC wallet; returns their auth headers"""
+    headers = []
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for index in range(THREADS):
+            user = User(username=f'bench{index}', email=f'bench{index}@example.com',
+                        password_hash='x', is_verified=True)
+            db.session.add(user)
+            db.session.flush()
+            wallet = Wallet(user_id=user.id, currency='BTC', balance=to_units('1000', 'BTC'))
+            wallet.generate_address('BTC')
+            db.session.add(wallet)
+            token = jwt.encode({'user_id': user.id}, SECRET_KEY, algorithm='HS256')
+            headers.append({'Authorization': f'Bearer {token}'})
+        db.session.commit()
+    return headers
+
+
+def run(enabled, headers):
+    app.extensions['group_commit'].enabled = enabled
+    payload = {'currency': 'BTC', 'amount': '0.0001', 'to_address': '1benchdestination'}
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS + 1)
+
+    def worker(auth):
+        client = app.test_client()
+        client.post('/api/send', json=payload, headers=auth)  # warm up
+        own = []
+        failed = 0
+        start.wait()
+        for _ in range(SENDS_PER_THREAD):
+            began = time.perf_counter()
+            response = client.post('/api/send', json=payload, headers=auth)
+            own.append(time.perf_counter() - began)
+            # Per-request commits can exceed SQLite's busy timeout under load
+            failed += response.status_code != 200
+        with lock:
+            latencies.extend(own)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker, args=(auth,)) for auth in headers]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return (
+        (len(latencies) - sum(errors)) / elapsed,
+        sum(errors),
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.95)] * 1000
+    )
+
+
+def main():
+    print("=== Concurrent Send Throughput: Per-request vs Group Commit ===")
+    print(f"{THREADS} threads x {SENDS_PER_THREAD} sends, database at {_db_path}")
+    print()
+    print(f"{'mode':>14} {'sends/sec':>10} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for name, enabled in MODES:
+        rate, errors, p50, p95 = run(enabled, seed())
+        print(f"{name:>14} {rate:>10.0f} {errors:>7} {p50:>8.2f} {p95:>8.2f}")
+
+    metrics = app.extensions['group_commit'].metrics()
+    if metrics['batches']:
+        print()
+        print(f"group commit: {metrics['writes']} writes in {metrics['batches']} commits, largest batch {metrics['max_batch_seen']}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        os.remove(_db_path)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Benchmark: mixed-endpoint load test.
+
+Drives the app with concurrent workers issuing a weighted mix of the hot
+endpoints: register, login, wallets, transactions, send and the admin
+listings. Reports p50/p95/p99 latency, throughput and errors per endpoint
+and saves them as JSON (with the commit and configuration), so runs can be
+compared across commits with --compare.
+
+By default the app runs in-process (Flask test clients on worker threads)
+against a database seeded by seed_data.py. Pass --db to reuse a
+pre-seeded file, or --url to load a running server over HTTP instead; the
+server must hold a database seeded by seed_data.py.
+
+In-process workers share one interpreter, so CPU-bound endpoints contend
+for the GIL; use --url against a multi-worker server for absolute
+throughput, and the in-process mode to compare commits.
+
+Usage:
+  python benchmarks/bench_load.py [--users N] [--transactions N] [--workers N] [--duration S]
+  python benchmarks/bench_load.py --db /tmp/bench.db --compare benchmarks/results/<earlier>.json
+  python benchmarks/bench_load.py --url http://127.0.0.1:5001 --users 1000000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jwt
+
+from seed_data import ADMIN_USERNAME, PASSWORD, seed
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Same secrets as the routes, so workers mint tokens without logging in
+USER_SECRET_KEY = 'alphazee09_secret_key_2024'
+ADMIN_SECRET_KEY = 'alphazee09_admin_secret_key_2024'
+ADMIN_KEY_HEADERS = {'X-Admin-Key': 'alphazee09_admin_2024'}
+
+# (name, weight): roughly a mobile client's mix plus an admin panel
+MIX = [
+    ('register', 2),
+    ('login', 5),
+    ('wallets', 30),
+    ('transactions', 25),
+    ('send', 8),
+    ('admin_users', 4),
+    ('admin_transactions', 4),
+    ('admin_wallets', 2),
+]
+
+
+class InProcessClient:
+    """Flask test client with the interface of HttpClient"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, headers=None):
+        response = self.client.open(path, method=method, json=json, headers=headers)
+        # Closing ends the request as a WSGI server would
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    """Keep-alive HTTP session against a running server"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, json=None, headers=None):
+        return self.session.request(method, self.base_url + path, json=json, headers=headers).status_code
+
+
+class Scenario:
+    """The requests behind each endpoint in MIX, for a dataset of users 1..users"""
+
+    def __init__(self, users, admin_id):
+        self.users = users
+        self.admin_token = _token({'admin_id': admin_id}, ADMIN_SECRET_KEY)
+        self._registrations = itertools.count()
+        self._run = f'{int(time.time()):x}'
+
+    def user_headers(self, rng):
+        return {'Authorization': f'Bearer {_token({"user_id": rng.randint(1, self.users)}, USER_SECRET_KEY)}'}
+
+    def run(self, name, client, rng):
+        """Issue one request; returns (status, expected status)"""
+        if name == 'register':
+            username = f'load{self._run}x{next(self._registrations)}'
+            return client.request('POST', '/api/register', json={
+                'username': username, 'email': f'{username}@bench.example', 'password': PASSWORD
+            }), 201
+        if name == 'login':
+            return client.request('POST', '/api/login', json={
+                'username': f'user{rng.randint(1, self.users)}', 'password': PASSWORD
+            }), 200
+        if name == 'wallets':
+            return client.request('GET', '/api/wallets', headers=self.user_headers(rng)), 200
+        if name == 'transactions':
+            return client.request('GET', '/api/transactions', headers=self.user_headers(rng)), 200
+        if name == 'send':
+            return client.request('POST', '/api/send', headers=self.user_headers(rng), json={
+                'currency': 'USDT', 'amount': '1', 'to_address': f'0x{rng.getrandbits(160):040x}'
+            }), 200
+        if name == 'admin_users':
+            return client.request('GET', '/api/admin/users?limit=50', headers=ADMIN_KEY_HEADERS), 200
+        if name == 'admin_transactions':
+            return client.request('GET', '/api/admin/transactions?limit=50', headers=ADMIN_KEY_HEADERS), 200
+        if name == 'admin_wallets':
+            page = rng.randint(1, 20)
+            return client.request('GET', f'/api/admin/wallets?per_page=50&page={page}',
+                                  headers={'Authorization': f'Bearer {self.admin_token}'}), 200
+        raise ValueError(f'Unknown endpoint {name}')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def drive(make_client, scenario, mix, workers, duration, warmup, seed):
+    """Run workers for warmup + duration seconds; returns {endpoint: [(seconds, ok)]} for the timed part"""
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    errors = []
+
+    def work(index):
+        client = make_client()
+        rng = random.Random(seed * 1000 + index)
+        local = []
+        try:
+            while True:
+                name = rng.choices(names, weights)[0]
+                began = time.perf_counter()
+                if began >= deadline:
+                    break
+                status, expected = scenario.run(name, client, rng)
+                if began >= measure_from:
+                    local.append((name, time.perf_counter() - began, status == expected))
+        except Exception as e:
+            errors.append(e)
+        with lock:
+            for name, elapsed, ok in local:
+                samples[name].append((elapsed, ok))
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return samples
+
+
+def summarize(samples, duration):
+    """Per-endpoint and overall latency percentiles (ms), throughput and errors"""
+    def stats(entries):
+        times = [elapsed for elapsed, _ in entries]
+        result = {'requests': len(entries), 'errors': sum(1 for _, ok in entries if not ok),
+                  'throughput': round(len(entries) / duration, 2)}
+        if times:
+            result.update({
+                'p50_ms': round(percentile(times, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(times, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(times, 0.99) * 1000, 3),
+                'mean_ms': round(statistics.mean(times) * 1000, 3),
+            })
+        return result
+
+    endpoints = {name: stats(entries) for name, entries in samples.items()}
+    total = stats([entry for entries in samples.values() for entry in entries])
+    return endpoints, total
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def print_table(endpoints, total):
+    print(f"{'endpoint':>20} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in list(endpoints.items()) + [('total', total)]:
+        if not row['requests']:
+            print(f"{name:>20} {0:>9}")
+            continue
+        print(f"{name:>20} {row['requests']:>9} {row['errors']:>7} {row['throughput']:>9.1f} "
+              f"{row['p50_ms']:>7.2f}ms {row['p95_ms']:>7.2f}ms {row['p99_ms']:>7.2f}ms")
+
+
+def print_comparison(result, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    print()
+    print(f"Compared with {os.path.basename(baseline_path)} ({(baseline.get('commit') or '?')[:10]}):")
+    print(f"{'endpoint':>20} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9}")
+    rows = list(result['endpoints'].items()) + [('total', result['total'])]
+    for name, row in rows:
+        before = baseline['total'] if name == 'total' else baseline['endpoints'].get(name)
+        if not before or not before.get('requests') or not row.get('requests'):
+            continue
+        changes = [_change(row[key], before[key]) for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput')]
+        print(f"{name:>20} " + ' '.join(f'{change:>9}' for change in changes))
+
+
+def _change(now, before):
+    return f'{(now - before) / before * 100:+.1f}%' if before else 'n/a'
+
+
+def _token(claims, secret):
+    return jwt.encode(dict(claims, exp=datetime.utcnow() + timedelta(days=1)), secret, algorithm='HS256')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed-endpoint load test')
+    parser.add_argument('--db', help='pre-seeded SQLite file to run against (in-process mode)')
+    parser.add_argument('--url', help='base URL of a running server seeded by seed_data.py')
+    parser.add_argument('--users', type=int, default=2000, help='users to seed, or seeded on the target')
+    parser.add_argument('--transactions', type=int, default=20000, help='transactions to seed')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help=f'result file (default: {os.path.relpath(RESULTS_DIR, ROOT)}/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier result file to diff against')
+    args = parser.parse_args()
+
+    scratch = None
+    dataset = {'users': args.users}
+    admin_id = 1
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        from src.main import create_app, init_db
+        from src.models.user import Admin, db
+
+        scratch = tempfile.mkdtemp(dir=os.environ.get('BENCH_DB_DIR'))
+        path = os.path.abspath(args.db) if args.db else os.path.join(scratch, 'bench.db')
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'BLOB_STORAGE_PATH': os.path.join(scratch, 'blobs'),
+            'PRICE_FEED_BACKGROUND': False,
+        })
+        init_db(app)
+        if not args.db:
+            print(f"Seeding {args.users:,} users and {args.transactions:,} transactions...")
+            dataset = seed(app, args.users, args.transactions, seed=args.seed, progress=None)
+        with app.app_context():
+            admin_id = db.session.query(Admin.id).filter_by(username=ADMIN_USERNAME).scalar()
+            if args.db:
+                from src.models.user import Transaction, User, Wallet
+                dataset = {'users': User.query.count(), 'wallets': Wallet.query.count(),
+                           'transactions': Transaction.query.count()}
+            db.session.remove()
+        if admin_id is None:
+            raise SystemExit(f'{path} was not seeded by seed_data.py')
+        make_client = lambda: InProcessClient(app)
+
+    try:
+        scenario = Scenario(dataset['users'], admin_id)
+        print(f"=== Load Test: {args.workers} workers, {args.duration:g}s "
+              f"({'HTTP ' + args.url if args.url else 'in-process'}) ===")
+        print()
+        samples = drive(make_client, scenario, MIX, args.workers, args.duration, args.warmup, args.seed)
+        endpoints, total = summarize(samples, args.duration)
+        print_table(endpoints, total)
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    commit, dirty = git_revision()
+    result = {
+        'benchmark': 'bench_load',
+        'started_at': datetime.utcnow().isoformat(),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mode': 'http' if args.url else 'in-process',
+        'config': {'workers': args.workers, 'duration': args.duration, 'warmup': args.warmup,
+                   'seed': args.seed, 'mix': dict(MIX)},
+        'dataset': dataset,
+        'endpoints': endpoints,
+        'total': total,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{(commit or 'unknown')[:10]}.json")
+    with open(output, 'w') as result_file:
+        json.dump(result, result_file, indent=2)
+    print()
+    print(f"Results saved to {os.path.relpath(output)}")
+
+    if args.compare:
+        print_comparison(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark: mixed read/write concurrency, default SQLite setup vs the
+managed profile.
+
+Reader threads run the wallet and transaction-history queries behind the
+GET routes. Writer threads run the send path: debit a wallet and insert a
+transaction, one commit each. Both run against the same file for a fixed
+time. The default setup uses SQLAlchemy's out-of-the-box engine with a
+rollback journal. The profile uses the write pool plus a query-only read
+pool, configured as src.services.db_engine does.
+
+The database lives in BENCH_DB_DIR (default: the system temp dir).
+
+Usage: python benchmarks/bench_sqlite_profile.py [readers] [writers] [seconds]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from functools import partial
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert, select, update
+from sqlalchemy.exc import OperationalError
+from src.models.user import db, Transaction, User, Wallet
+from src.services.db_engine import apply_sqlite_pragmas
+from src.utils.ids import new_tx_hash
+
+READERS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+WRITERS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+SECONDS = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+USERS = 200
+
+# The defaults src.services.db_engine applies
+PROFILE = {
+    'SQLITE_JOURNAL_MODE': 'wal',
+    'SQLITE_SYNCHRONOUS': 'normal',
+    'SQLITE_BUSY_TIMEOUT': 5000,
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_CACHE_SIZE': -64 * 1024,
+}
+
+
+def default_engines(url):
+    engine = create_engine(url)
+    return engine, engine
+
+
+def profiled_engines(url):
+    writer = create_engine(url, pool_size=4, max_overflow=4, pool_timeout=30)
+    reader = create_engine(url, pool_size=16, max_overflow=16, pool_timeout=30)
+    event.listen(writer, 'connect', partial(apply_sqlite_pragmas, config=PROFILE, read_only=False))
+    event.listen(reader, 'connect', partial(apply_sqlite_pragmas, config=PROFILE, read_only=True))
+    return writer, reader
+
+
+SETUPS = [
+    ('default', default_engines),
+    ('profile', profiled_engines),
+]
+
+
+def seed(engine):
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            'username': f'bench{index}', 'email': f'bench{index}@example.com', 'password_hash': 'x',
+            'is_verified': True, 'created_at': now
+        } for index in range(USERS)])
+        conn.execute(insert(Wallet), [{
+            'user_id': index + 1, 'currency': 'BTC', 'address': f'1bench{index}',
+            'private_key': 'x', 'balance': 10 ** 12, 'created_at': now
+        } for index in range(USERS)])
+
+
+def read(engine, user_id):
+    with engine.connect() as conn:
+        conn.execute(select(Wallet).where(Wallet.user_id == user_id)).all()
+        conn.execute(
+            select(Transaction).where(Transaction.user_id == user_id)
+            .order_by(Transaction.created_at.desc()).limit(20)
+        ).all()
+
+
+def write(engine, user_id):
+    with engine.begin() as conn:
+        conn.execute(update(Wallet).where(Wallet.user_id == user_id).values(balance=Wallet.balance - 1000))
+        conn.execute(insert(Transaction).values(
+            user_id=user_id, from_address=f'1bench{user_id}', to_address='1destination',
+            currency='BTC', amount=1000, fee=0, tx_hash=new_tx_hash(), status='confirmed',
+            transaction_type='send', created_at=datetime.utcnow()
+        ))
+
+
+def run(make_engines):
+    fd, path = tempfile.mkstemp(suffix='.db', dir=os.environ.get('BENCH_DB_DIR'))
+    os.close(fd)
+    writer, reader = make_engines(f'sqlite:///{path}')
+    try:
+        seed(writer)
+        results = {'read': ([], [0]), 'write': ([], [0])}
+        deadline = time.perf_counter() + SECONDS
+
+        def loop(kind, operation, engine, offset):
+            latencies, errors = results[kind]
+            user_id = offset
+            while time.perf_counter() < deadline:
+                user_id = user_id % USERS + 1
+                began = time.perf_counter()
+                try:
+                    operation(engine, user_id)
+                    latencies.append(time.perf_counter() - began)
+                except OperationalError:
+                    # 'database is locked' once the busy timeout runs out
+                    errors[0] += 1
+
+        threads = [threading.Thread(target=loop, args=('read', read, reader, index * 7)) for index in range(READERS)]
+        threads += [threading.Thread(target=loop, args=('write', write, writer, index * 13)) for index in range(WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        summary = {}
+        for kind, (latencies, errors) in results.items():
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float('nan')
+            summary[kind] = (len(latencies) / SECONDS, p95, errors[0])
+        return summary
+    finally:
+        writer.dispose()
+        reader.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main():
+    print("=== SQLite Read/Write Concurrency: Default vs Managed Profile ===")
+    print(f"{READERS} readers, {WRITERS} writers, {SECONDS:g}s per setup")
+    print()
+    print(f"{'setup':>8} {'reads/s':>9} {'read p95':>9} {'writes/s':>9} {'write p95':>10} {'errors':>7}")
+
+    for name, make_engines in SETUPS:
+        summary = run(make_engines)
+        reads, read_p95, read_errors = summary['read']
+        writes, write_p95, write_errors = summary['write']
+        print(f"{name:>8} {reads:>9.0f} {read_p95:>8.1f}ms {writes:>9.0f} {write_p95:>8.1f}ms {read_errors + write_errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: process startup cost.
+
+Each phase runs in a fresh interpreter, so nothing is already imported:
+
+- import:        `import src.main`, all a pre-fork master needs before it
+                 chooses a factory
+- create_app:    import plus create_app(), every blueprint and extension
+- + init_db:     create_app() plus schema creation, what importing src.main
+                 used to do on every start
+- first request: create_app() plus one request that reads the database
+
+Then the pre-fork case: a master builds the app once (as with gunicorn
+--preload) and forks workers. Each worker's boot is the time from fork()
+to its first database-backed response.
+
+The database lives in BENCH_DB_DIR (default: the system temp dir).
+
+Usage: python benchmarks/bench_startup.py [runs] [workers]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+WORKERS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+PHASES = [
+    ('import', 'import src.main'),
+    ('create_app', 'import src.main; src.main.create_app()'),
+    ('+ init_db', 'import src.main; src.main.init_db(src.main.create_app())'),
+    ('first request', (
+        'import src.main; app = src.main.create_app(); '
+        "assert app.test_client().get('/api/users').status_code == 200"
+    )),
+]
+
+# Times the statement in a fresh interpreter and prints the seconds it took
+TIMER = 'import time; began = time.perf_counter(); {}; print(time.perf_counter() - began)'
+
+
+def time_phase(statement, env):
+    output = subprocess.run(
+        [sys.executable, '-c', TIMER.format(statement)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def fork_workers(env):
+    """Build the app once, fork WORKERS children; returns each child's fork-to-response seconds"""
+    os.environ.update(env)
+    from src.main import create_app
+
+    app = create_app({'PRICE_FEED_BACKGROUND': False})
+    boots = []
+    for _ in range(WORKERS):
+        read_end, write_end = os.pipe()
+        began = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            # db_engine's after-fork hook has emptied every inherited pool
+            # (default, readonly, replicas, shards); as under gunicorn, the
+            # worker opens its own connections
+            status = app.test_client().get('/api/users').status_code
+            os.write(write_end, json.dumps({'status': status, 'at': time.perf_counter()}).encode())
+            os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as reader:
+            result = json.loads(reader.read())
+        os.waitpid(pid, 0)
+        assert result['status'] == 200, result
+        boots.append(result['at'] - began)
+    return boots
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix='.db', dir=os.environ.get('BENCH_DB_DIR'))
+    os.close(fd)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    try:
+        time_phase('import src.main; src.main.init_db(src.main.create_app())', env)
+
+        print("=== Startup Cost ===")
+        print(f"{RUNS} fresh interpreters per phase, median")
+        print()
+        print(f"{'phase':>14} {'median':>10} {'min':>10}")
+        for name, statement in PHASES:
+            times = [time_phase(statement, env) for _ in range(RUNS)]
+            print(f"{name:>14} {statistics.median(times) * 1000:>8.1f}ms {min(times) * 1000:>8.1f}ms")
+
+        boots = fork_workers(env)
+        print()
+        print(f"Pre-fork: {WORKERS} workers forked from a built app")
+        print(f"{'worker boot':>14} {statistics.median(boots) * 1000:>8.1f}ms {min(boots) * 1000:>8.1f}ms")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
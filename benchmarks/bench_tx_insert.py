@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: transaction insert throughput by tx_hash scheme.
+
+Preloads a large transaction table, then times committed insert batches
+with the old content-hash tx_hash (random position in the unique index)
+and the ULID-prefixed one (always appended at the end of the index). The
+page cache is kept small so the index does not fit in memory, as on a
+production-sized table.
+
+Usage: python benchmarks/bench_tx_insert.py [preload_rows] [timed_rows]
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_path}'
+
+from sqlalchemy import event
+from src.main import app
+from src.models.user import db, Transaction
+from src.utils.ids import new_tx_hash
+
+PRELOAD_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+TIMED_ROWS = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+BATCH_SIZE = 500
+CACHE_KIB = 2048
+
+
+def content_hash(index):
+    """The previous scheme: sha256 of the transfer details and a timestamp"""
+    data = f'1sender1receiver{index}{datetime.utcnow().timestamp()}'
+    return '0x' + hashlib.sha256(data.encode()).hexdigest()
+
+
+def ulid_hash(index):
+    return new_tx_hash()
+
+
+SCHEMES = [
+    ('content hash', content_hash),
+    ('ULID', ulid_hash),
+]
+
+
+def rows(make_hash, start, count):
+    now = datetime.utcnow()
+    return [{
+        'user_id': 1,
+        'from_address': '1sender',
+        'to_address': '1receiver',
+        'currency': 'BTC',
+        'amount': 100000 + index,
+        'fee': 1000,
+        'tx_hash': make_hash(index),
+        'status': 'confirmed',
+        'transaction_type': 'send',
+        'created_at': now
+    } for index in range(start, start + count)]
+
+
+def insert_batches(make_hash, start, count):
+    insert = Transaction.__table__.insert()
+    for offset in range(0, count, BATCH_SIZE):
+        with db.engine.begin() as conn:
+            conn.execute(insert, rows(make_hash, start + offset, min(BATCH_SIZE, count - offset)))
+
+
+def run(make_hash):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        insert_batches(make_hash, 0, PRELOAD_ROWS)
+
+        started = time.perf_counter()
+        insert_batches(make_hash, PRELOAD_ROWS, TIMED_ROWS)
+        elapsed = time.perf_counter() - started
+    return TIMED_ROWS / elapsed
+
+
+def main():
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def small_cache(dbapi_connection, connection_record):
+            dbapi_connection.execute(f'PRAGMA cache_size = -{CACHE_KIB}')
+        db.engine.dispose()
+
+    print("=== Transaction Insert Throughput by tx_hash Scheme ===")
+    print(f"{PRELOAD_ROWS} preloaded rows, {TIMED_ROWS} timed rows in commits of {BATCH_SIZE}, {CACHE_KIB}KiB page cache")
+    print()
+    print(f"{'scheme':>14} {'rows/sec':>10}")
+
+    for name, make_hash in SCHEMES:
+        rate = run(make_hash)
+        print(f"{name:>14} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        os.remove(_db_path)
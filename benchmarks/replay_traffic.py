@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark: replay captured traffic and diff its latency.
+
+Re-issues requests recorded by the traffic capture middleware
+(TRAFFIC_CAPTURE_ENABLED) against a local instance, on the captured
+schedule: each request starts at its original offset divided by --speed,
+whether or not earlier ones have finished, so the captured overlap (and
+concurrency) is reproduced. Sanitised strings are filled with random
+values of the same length, seeded by --seed, so replays are repeatable.
+Principals get fresh tokens for the same ids. With --users N, user ids
+are folded into 1..N to fit a database seeded by seed_data.py, and logins
+use a seeded user's credentials; without it, logins replay as failed ones.
+
+Afterwards it prints captured vs replayed p50/p95/p99 per route and the
+requests whose status differed, and can save the comparison as JSON.
+Requests with non-JSON bodies (KYC uploads) are skipped.
+
+Usage:
+  python benchmarks/replay_traffic.py CAPTURE... --db /tmp/bench.db [--speed 2] [--users N]
+  python benchmarks/replay_traffic.py CAPTURE... --url http://127.0.0.1:5001
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jwt
+
+from seed_data import PASSWORD
+from bench_load import (
+    ADMIN_KEY_HEADERS, ADMIN_SECRET_KEY, USER_SECRET_KEY, HttpClient, InProcessClient, git_revision, percentile
+)
+from src.services.traffic_capture import load, materialize
+
+
+class Replayer:
+    """Turns capture records back into requests"""
+
+    def __init__(self, users=None, admin_id=None, seed=0):
+        self.users = users
+        self.admin_id = admin_id
+        self.seed = seed
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def replayable(self, record):
+        body = record.get('b')
+        return record.get('k') in (None, 'json') and not (isinstance(body, dict) and '~bytes' in body)
+
+    def build(self, index, record):
+        """(method, path, json body, headers) for one record"""
+        rng = random.Random(self.seed * 1000003 + index)
+        path = record['p']
+        query = materialize(record.get('q') or {}, rng)
+        if query:
+            path += '?' + urlencode(query)
+        body = materialize(record['b'], rng) if record.get('k') == 'json' else None
+        if record.get('r') == '/api/login' and self.users and isinstance(body, dict):
+            # Captured credentials are gone; sign in as a seeded user instead
+            body = dict(body, username=f'user{rng.randint(1, self.users)}', password=PASSWORD)
+        return record['m'], path, body, self.headers(record.get('a'))
+
+    def headers(self, principal):
+        if not principal:
+            return {}
+        if principal[0] == 'admin_key':
+            return dict(ADMIN_KEY_HEADERS)
+        if principal[0] == 'invalid':
+            return {'Authorization': 'Bearer invalid'}
+        kind, principal_id = principal
+        if kind == 'user' and self.users:
+            principal_id = (int(principal_id) - 1) % self.users + 1
+        if kind == 'admin' and self.admin_id is not None:
+            principal_id = self.admin_id
+        key = (kind, principal_id)
+        with self._lock:
+            if key not in self._tokens:
+                secret = USER_SECRET_KEY if kind == 'user' else ADMIN_SECRET_KEY
+                claims = {f'{kind}_id': principal_id, 'exp': datetime.utcnow() + timedelta(days=1)}
+                self._tokens[key] = jwt.encode(claims, secret, algorithm='HS256')
+            return {'Authorization': f'Bearer {self._tokens[key]}'}
+
+
+def replay(records, make_client, replayer, speed, workers):
+    """Issue records on their captured schedule; returns [(record, seconds, status, seconds late)]"""
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def issue(index, record, due):
+        if not hasattr(local, 'client'):
+            local.client = make_client()
+        method, path, body, headers = replayer.build(index, record)
+        began = time.perf_counter()
+        try:
+            status = local.client.request(method, path, json=body, headers=headers)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - began
+        with lock:
+            results.append((record, elapsed, status, max(began - due, 0)))
+
+    first = records[0]['t']
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, record in enumerate(records):
+            due = start + (record['t'] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(issue, index, record, due)
+    return results, time.perf_counter() - start
+
+
+def peak_concurrency(records):
+    """Most captured requests in flight at once"""
+    events = []
+    for record in records:
+        events.append((record['t'], 1))
+        events.append((record['t'] + (record.get('d') or 0) / 1000, -1))
+    peak = current = 0
+    for _, change in sorted(events):
+        current += change
+        peak = max(peak, current)
+    return peak
+
+
+def compare(results):
+    """Per-route captured vs replayed latency percentiles (ms) and status mismatches"""
+    routes = defaultdict(lambda: {'captured': [], 'replayed': [], 'mismatches': 0})
+    for record, elapsed, status, _ in results:
+        route = routes[f"{record['m']} {record.get('r') or record['p']}"]
+        route['captured'].append(record['d'] / 1000)
+        route['replayed'].append(elapsed)
+        if status != record.get('s'):
+            route['mismatches'] += 1
+
+    summary = {}
+    for name, route in sorted(routes.items(), key=lambda item: -len(item[1]['captured'])):
+        entry = {'requests': len(route['captured']), 'status_mismatches': route['mismatches']}
+        for side in ('captured', 'replayed'):
+            for label, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                entry[f'{side}_{label}_ms'] = round(percentile(route[side], fraction) * 1000, 3)
+        summary[name] = entry
+    return summary
+
+
+def print_comparison(summary):
+    print(f"{'route':>44} {'requests':>8} {'p50 then/now':>19} {'p95 then/now':>19} {'p99 then/now':>19} {'status≠':>7}")
+    for name, entry in summary.items():
+        cells = [f"{entry[f'captured_{label}_ms']:.1f}/{entry[f'replayed_{label}_ms']:.1f}ms"
+                 for label in ('p50', 'p95', 'p99')]
+        print(f"{name[-44:]:>44} {entry['requests']:>8} " + ' '.join(f'{cell:>19}' for cell in cells)
+              + f" {entry['status_mismatches']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay captured traffic and diff latency')
+    parser.add_argument('captures', nargs='+', help='capture files or directories')
+    parser.add_argument('--db', help='SQLite file to replay against in-process')
+    parser.add_argument('--url', help='base URL of a running server')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay N times faster than captured')
+    parser.add_argument('--workers', type=int, help='concurrent requests (default: 4x the captured peak)')
+    parser.add_argument('--users', type=int, help='fold captured user ids into 1..N')
+    parser.add_argument('--admin-id', type=int, help='replay every admin request as this admin')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='save the comparison as JSON')
+    args = parser.parse_args()
+    if not args.db and not args.url:
+        parser.error('pass --db or --url')
+
+    replayer = Replayer(users=args.users, admin_id=args.admin_id, seed=args.seed)
+    records = load(args.captures)
+    skipped = sum(1 for record in records if not replayer.replayable(record))
+    records = [record for record in records if replayer.replayable(record)]
+    if not records:
+        raise SystemExit('No replayable requests in the capture')
+    peak = peak_concurrency(records)
+    workers = args.workers or max(4 * peak, 8)
+
+    scratch = None
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        from src.main import create_app
+
+        scratch = tempfile.mkdtemp(dir=os.environ.get('BENCH_DB_DIR'))
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(args.db)}',
+            'BLOB_STORAGE_PATH': os.path.join(scratch, 'blobs'),
+            'PRICE_FEED_BACKGROUND': False,
+        })
+        make_client = lambda: InProcessClient(app)
+
+    span = records[-1]['t'] - records[0]['t']
+    print(f"=== Traffic Replay: {len(records)} requests over {span:.1f}s at {args.speed:g}x ===")
+    print(f"captured peak concurrency {peak}, {workers} workers, {skipped} non-JSON requests skipped")
+    print()
+    try:
+        results, elapsed = replay(records, make_client, replayer, args.speed, workers)
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    summary = compare(results)
+    print_comparison(summary)
+    late = sorted(lateness for _, _, _, lateness in results)
+    print()
+    print(f"Replayed in {elapsed:.1f}s; start lateness p99 {percentile(late, 0.99) * 1000:.1f}ms "
+          f"(high lateness means the replay could not keep the captured schedule)")
+
+    if args.output:
+        commit, dirty = git_revision()
+        with open(args.output, 'w') as output:
+            json.dump({
+                'benchmark': 'replay_traffic', 'commit': commit, 'dirty': dirty,
+                'started_at': datetime.utcnow().isoformat(), 'speed': args.speed, 'workers': workers,
+                'requests': len(records), 'skipped': skipped, 'routes': summary,
+            }, output, indent=2)
+        print(f"Comparison saved to {os.path.relpath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
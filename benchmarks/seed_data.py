@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for benchmarks.
+
+Bulk-loads a scratch database with users, their wallets and transactions,
+plus one admin, in batched multi-row inserts on a dedicated connection
+with synchronous=OFF. The data is deterministic for a given --seed:
+
+- users user1..userN, emails userN@bench.example, all with password
+  PASSWORD; every user is KYC-verified and funded, so /api/send works
+- one wallet per currency per user (BTC, USDT, ETH), so 1M users give 3M
+  wallets
+- transactions spread over the users and the past year, in id order
+
+Dashboard counters are rebuilt and ANALYZE is run afterwards, so the
+planner and /api/admin/stats see the seeded volumes. Sharded setups are
+not supported; seed a single database.
+
+Usage: python benchmarks/seed_data.py DATABASE_PATH [--users N] [--transactions N]
+e.g.   python benchmarks/seed_data.py /tmp/bench.db --users 1000000 --transactions 50000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'Bench123!'
+ADMIN_USERNAME = 'benchadmin'
+CURRENCIES = ('BTC', 'USDT', 'ETH')
+BATCH_SIZE = 10000
+
+# Starting balance of every seeded wallet, in whole coins
+FUNDING = {'BTC': '100', 'USDT': '1000000', 'ETH': '1000'}
+
+
+def seed(app, users, transactions, seed=0, progress=print):
+    """Seed app's database; returns the dataset's volumes. The schema must already exist"""
+    from src.models.user import Admin, Transaction, User, Wallet, db
+    from src.services.dashboard_counters import dashboard_counters
+    from src.utils.money import to_units
+
+    if app.config.get('DATABASE_SHARDS'):
+        raise RuntimeError('seed_data does not support DATABASE_SHARDS; seed a single database')
+
+    rng = random.Random(seed)
+    password_hash = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    year = timedelta(days=365)
+    funding = {currency: to_units(amount, currency) for currency, amount in FUNDING.items()}
+
+    with app.app_context():
+        url = db.engine.url
+        with db.engine.connect() as conn:
+            first_user = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+            first_wallet = (conn.execute(select(func.max(Wallet.id))).scalar() or 0) + 1
+            first_transaction = (conn.execute(select(func.max(Transaction.id))).scalar() or 0) + 1
+
+    # Separate from the app's pools, so synchronous=OFF never reaches them
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            if conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql('PRAGMA synchronous = OFF')
+            conn.commit()
+
+            with conn.begin():
+                if conn.execute(select(Admin.id).where(Admin.username == ADMIN_USERNAME)).first() is None:
+                    conn.execute(Admin.__table__.insert(), [{
+                        'username': ADMIN_USERNAME, 'email': f'{ADMIN_USERNAME}@bench.example',
+                        'password_hash': password_hash, 'role': 'super_admin', 'is_active': True,
+                        'created_at': now, 'updated_at': now
+                    }])
+
+            started = time.perf_counter()
+            for start in range(0, users, BATCH_SIZE):
+                user_rows, wallet_rows = [], []
+                for user_id in range(first_user + start, first_user + min(start + BATCH_SIZE, users)):
+                    created_at = now - year + timedelta(seconds=(user_id - first_user) * year.total_seconds() / users)
+                    user_rows.append({
+                        'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@bench.example',
+                        'password_hash': password_hash, 'first_name': 'Bench', 'last_name': f'User{user_id}',
+                        'phone': '', 'fingerprint_enabled': False, 'is_verified': True, 'is_blocked': False,
+                        'created_at': created_at, 'updated_at': created_at
+                    })
+                    for offset, currency in enumerate(CURRENCIES):
+                        wallet_id = first_wallet + (user_id - first_user) * len(CURRENCIES) + offset
+                        wallet_rows.append({
+                            'id': wallet_id, 'user_id': user_id, 'currency': currency,
+                            'address': _address(currency, wallet_id), 'private_key': f'{rng.getrandbits(256):064x}',
+                            'balance': funding[currency], 'created_at': created_at
+                        })
+                with conn.begin():
+                    conn.execute(User.__table__.insert(), user_rows)
+                    conn.execute(Wallet.__table__.insert(), wallet_rows)
+                _report(progress, 'users', start + len(user_rows), users, started)
+
+            started = time.perf_counter()
+            for start in range(0, transactions, BATCH_SIZE):
+                rows = []
+                for index in range(start, min(start + BATCH_SIZE, transactions)):
+                    user_offset = rng.randrange(users)
+                    offset = rng.randrange(len(CURRENCIES))
+                    currency = CURRENCIES[offset]
+                    wallet_id = first_wallet + user_offset * len(CURRENCIES) + offset
+                    created_at = now - year + timedelta(seconds=index * year.total_seconds() / transactions)
+                    send = rng.random() < 0.5
+                    counterparty = _address(currency, rng.getrandbits(64) + (1 << 64))
+                    rows.append({
+                        'id': first_transaction + index, 'user_id': first_user + user_offset,
+                        'from_wallet_id': wallet_id if send else None, 'to_wallet_id': None if send else wallet_id,
+                        'from_address': _address(currency, wallet_id) if send else counterparty,
+                        'to_address': counterparty if send else _address(currency, wallet_id),
+                        'currency': currency, 'amount': rng.randrange(1, funding[currency] // 1000),
+                        'fee': 0, 'tx_hash': f'0x{first_transaction + index:064x}',
+                        'block_number': 17000000 + index, 'block_hash': f'0x{rng.getrandbits(256):064x}',
+                        'status': 'confirmed', 'transaction_type': 'send' if send else 'receive',
+                        'created_at': created_at, 'confirmed_at': created_at
+                    })
+                with conn.begin():
+                    conn.execute(Transaction.__table__.insert(), rows)
+                _report(progress, 'transactions', start + len(rows), transactions, started)
+
+            if conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql('ANALYZE')
+                conn.commit()
+    finally:
+        engine.dispose()
+
+    with app.app_context():
+        dashboard_counters.reconcile()
+        with db.engine.connect() as conn:
+            return {
+                'users': conn.execute(select(func.count(User.id))).scalar(),
+                'wallets': conn.execute(select(func.count(Wallet.id))).scalar(),
+                'transactions': conn.execute(select(func.count(Transaction.id))).scalar(),
+            }
+
+
+def _address(currency, number):
+    """A unique, well-formed address derived from number"""
+    if currency == 'BTC':
+        return f'1B{number:032x}'
+    return f'0x{number:040x}'
+
+
+def _report(progress, what, done, total, started):
+    if progress and (done == total or done % (BATCH_SIZE * 10) == 0):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        progress(f"   {what}: {done:,}/{total:,} ({rate:,.0f}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-seed a scratch database for benchmarks')
+    parser.add_argument('database', help='SQLite file to create or extend')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from src.main import create_app, init_db
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(args.database)}',
+        'PRICE_FEED_BACKGROUND': False,
+    })
+    init_db(app)
+
+    print("=== Seeding Benchmark Data ===")
+    print(f"{args.database}: {args.users:,} users, {args.transactions:,} transactions")
+    started = time.perf_counter()
+    volumes = seed(app, args.users, args.transactions, seed=args.seed)
+    print()
+    print(f"✅ {volumes['users']:,} users, {volumes['wallets']:,} wallets, "
+          f"{volumes['transactions']:,} transactions in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
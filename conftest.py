@@ -0,0 +1,55 @@
+"""
+Shared pytest fixtures.
+
+Every test module gets its own app from create_app(), on a scratch SQLite
+database that init_db() brings up to date, so the tests run the real
+wiring and never touch src/database/app.db. A module that needs other
+settings overrides the app_config fixture. The scripts' __main__ runners
+call make_app() themselves.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+ADMIN_KEY_HEADERS = {'X-Admin-Key': 'alphazee09_admin_2024'}
+
+
+def scratch_dir():
+    """A temporary directory removed when the tests exit"""
+    path = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, path, True)
+    return path
+
+
+def make_app(config=None):
+    """create_app() on a scratch database with the schema in place; config overrides the test defaults"""
+    from src.main import create_app, init_db
+
+    scratch = scratch_dir()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(scratch, 'app.db')}",
+        'BLOB_STORAGE_PATH': os.path.join(scratch, 'blobs'),
+        'AUDIT_LOG_SPILL_PATH': os.path.join(scratch, 'audit_spill.jsonl'),
+        # No calls to the price API from tests
+        'PRICE_FEED_BACKGROUND': False,
+        **(config or {}),
+    })
+    init_db(app)
+    return app
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    """Config overrides for the module's app"""
+    return {}
+
+
+@pytest.fixture(scope='module')
+def app(app_config):
+    return make_app(app_config)
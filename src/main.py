@@ -4,58 +4,131 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.admin import admin_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'alphazee09_secret_key_2024'
-
-# Enable CORS for all routes
-CORS(app, origins="*", allow_headers=["Content-Type", "Authorization"], methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
-
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(admin_bp, url_prefix='/api')
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-@app.route('/admin')
-def admin_panel():
-    """Serve the admin panel interface"""
-    return send_from_directory(app.static_folder, 'admin.html')
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
+
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+
+
+def create_app(config=None):
+    """Build the app; config (a mapping) overrides the defaults. Never connects to the database, see init_db()"""
+    # Routes, models and services pull in SQLAlchemy, JWT and friends; load
+    # them here so importing this module stays cheap
+    from flask_cors import CORS
+    from src.routes.user import user_bp
+    from src.routes.admin import admin_bp
+    from src.services.audit_log import audit_log
+    from src.services.blob_store import blob_storage
+    from src.services.dashboard_counters import dashboard_counters
+    from src.services.db_engine import db_engine
+    from src.services.group_commit import group_commit
+    from src.services.metrics import metrics
+    from src.services.price_feed import price_feed
+    from src.services.principal_cache import principal_cache
+    from src.services.shards import shard_router
+    from src.services.slow_queries import slow_queries
+    from src.services.traffic_capture import traffic_capture
+    from src.services.unit_of_work import unit_of_work
+
+    app = Flask(__name__, static_folder=STATIC_FOLDER)
+    app.config['SECRET_KEY'] = 'alphazee09_secret_key_2024'
+
+    # Database configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    if config:
+        app.config.update(config)
+
+    # Enable CORS for all routes
+    CORS(app, origins="*", allow_headers=["Content-Type", "Authorization"], expose_headers=["X-Next-Cursor", "X-Total-Count"], methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+
+    db_engine.init_app(app)
+    audit_log.init_app(app)
+    blob_storage.init_app(app)
+    dashboard_counters.init_app(app)
+    group_commit.init_app(app)
+    metrics.init_app(app)
+    price_feed.init_app(app)
+    principal_cache.init_app(app)
+    shard_router.init_app(app)
+    slow_queries.init_app(app)
+    traffic_capture.init_app(app)
+    unit_of_work.init_app(app)
+
+    @app.route('/admin')
+    def admin_panel():
+        """Serve the admin panel interface"""
+        return send_from_directory(app.static_folder, 'admin.html')
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "Alphazee09 Backend API is running", 200
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "Alphazee09 Backend API is running", 200
+
+    @app.errorhandler(404)
+    def not_found(error):
+        return {"message": "Endpoint not found"}, 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return {"message": "Internal server error"}, 500
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables and apply migrations: flask --app src.main init-db"""
+        for version, description in init_db(app):
+            print(f"✅ {version:03d} {description}")
+        print("✅ Database schema is up to date")
+
+    return app
+
 
-@app.errorhandler(404)
-def not_found(error):
-    return {"message": "Endpoint not found"}, 404
+def init_db(app):
+    """Create missing tables, apply pending migrations and check the SQLite profile; once per deploy, not per worker
+
+    Returns the (version, description) pairs of the migrations it applied.
+    """
+    from src.models.migrations import run_migrations
+    from src.models.user import db
+    from src.services.shards import shard_router
+
+    with app.app_context():
+        db.create_all()
+        shard_router.create_all()
+        applied = run_migrations(db.engine)
+        engines = app.extensions['db_engine']
+        engines.verify()
+        # Leave no pooled connection behind for forked workers to inherit
+        engines.dispose()
+    return applied
+
+
+def __getattr__(name):
+    # `from src.main import app` still works: the default app is built on
+    # first use, with its database brought up to date as importing used to
+    if name == 'app':
+        app = globals()['app'] = create_app()
+        init_db(app)
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-@app.errorhandler(500)
-def internal_error(error):
-    return {"message": "Internal server error"}, 500
 
 if __name__ == '__main__':
+    app = create_app()
+    init_db(app)
     app.run(host='0.0.0.0', port=5001, debug=True)
-
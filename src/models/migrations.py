@@ -0,0 +1,228 @@
+"""
+Versioned schema migrations.
+
+Each migration is a numbered, idempotent function applied at most once per
+database; applied versions are recorded in the schema_migrations table.
+Migrations must tolerate a schema that db.create_all() has already brought
+up to date, so they check before they alter.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Integer, inspect, select, text
+
+from src.models.user import (
+    db, Admin, AdminAction, AddressDirectory, Blob, DashboardCounter, ReplicationHeartbeat, UserDirectory
+)
+from src.services import user_search
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register fn(connection) as schema version `version`"""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _create_indexes(conn, *names):
+    indexes = {
+        index.name: index
+        for table in db.metadata.sorted_tables
+        for index in table.indexes
+    }
+    for name in names:
+        indexes[name].create(bind=conn, checkfirst=True)
+
+
+@migration(1, 'Add user blocking columns and admin tables')
+def _admin_tables(conn):
+    columns = {column['name'] for column in inspect(conn).get_columns('user')}
+    table = conn.dialect.identifier_preparer.quote('user')
+    for name, ddl in [
+        ('is_blocked', 'BOOLEAN DEFAULT 0'),
+        ('blocked_at', 'DATETIME'),
+        ('blocked_by', 'INTEGER'),
+        ('blocked_reason', 'TEXT'),
+    ]:
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+    Admin.__table__.create(bind=conn, checkfirst=True)
+    AdminAction.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(2, 'Composite indexes for hot query shapes')
+def _hot_path_indexes(conn):
+    _create_indexes(
+        conn,
+        'ix_transaction_user_id_created_at',
+        'ix_transaction_user_id_currency_created_at',
+        'ix_transaction_created_at',
+        'ix_wallet_user_id_currency',
+        'ix_admin_action_admin_id_action_type_created_at',
+        'ix_admin_action_admin_id_created_at',
+        'ix_kyc_record_user_id_status',
+    )
+
+
+@migration(3, 'Move inline base64 images into the blob store')
+def _images_to_blob_store(conn):
+    Blob.__table__.create(bind=conn, checkfirst=True)
+    for table, legacy, target in [
+        ('user', 'profile_image', 'profile_image_blob'),
+        ('kyc_record', 'document_front', 'document_front_blob'),
+        ('kyc_record', 'document_back', 'document_back_blob'),
+        ('kyc_record', 'selfie_image', 'selfie_image_blob'),
+    ]:
+        _move_column_to_blobs(conn, table, legacy, target)
+
+
+def _move_column_to_blobs(conn, table, legacy, target, batch_size=100):
+    """Copy each legacy inline value into the blob store, point target at it, then drop legacy"""
+    from src.services.blob_store import blob_storage, decode_base64_image, guess_content_type
+
+    if blob_storage.backend is None:
+        raise RuntimeError('Blob storage is not configured; run migrations through the app')
+
+    columns = {column['name'] for column in inspect(conn).get_columns(table)}
+    quoted = conn.dialect.identifier_preparer.quote(table)
+    if target not in columns:
+        conn.execute(text(f'ALTER TABLE {quoted} ADD COLUMN {target} VARCHAR(64) REFERENCES blob (digest)'))
+    if legacy not in columns:
+        return
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(f"SELECT id, {legacy} FROM {quoted} WHERE id > :last_id "
+                 f"AND {legacy} IS NOT NULL AND {legacy} != '' ORDER BY id LIMIT :batch_size"),
+            {'last_id': last_id, 'batch_size': batch_size}
+        ).fetchall()
+        if not rows:
+            break
+
+        for row_id, value in rows:
+            try:
+                data = decode_base64_image(value)
+            except ValueError:
+                # Not base64 (e.g. an old image URL); keep the value verbatim
+                data = value.encode()
+            digest = blob_storage.backend.put(data)
+            if conn.execute(select(Blob.digest).where(Blob.digest == digest)).first() is None:
+                conn.execute(Blob.__table__.insert().values(
+                    digest=digest, size=len(data), content_type=guess_content_type(data),
+                    created_at=datetime.utcnow()
+                ))
+            conn.execute(
+                text(f'UPDATE {quoted} SET {target} = :digest WHERE id = :id'),
+                {'digest': digest, 'id': row_id}
+            )
+        last_id = rows[-1][0]
+
+    conn.execute(text(f'ALTER TABLE {quoted} DROP COLUMN {legacy}'))
+
+
+@migration(4, 'Store balances and amounts as integer minor units')
+def _integer_minor_units(conn):
+    from src.utils.money import CURRENCY_SCALES, DEFAULT_SCALE
+
+    def to_units(column):
+        factors = ' '.join(f"WHEN '{currency}' THEN {10 ** scale}" for currency, scale in CURRENCY_SCALES.items())
+        return f'ROUND({column} * CASE currency {factors} ELSE {10 ** DEFAULT_SCALE} END)'
+
+    for table, column, expression in [
+        ('wallet', 'balance', to_units('balance')),
+        ('transaction', 'amount', to_units('amount')),
+        ('transaction', 'fee', to_units('fee')),
+        # Admin transfers recorded wei, generated ones gwei; store gwei throughout
+        ('transaction', 'gas_price', 'ROUND(CASE WHEN gas_price >= 1000000 THEN gas_price / 1000000000 ELSE gas_price END)'),
+    ]:
+        _convert_to_bigint(conn, table, column, expression)
+
+
+def _convert_to_bigint(conn, table, column, expression):
+    """Rewrite a decimal column as BIGINT via expression, unless it already is an integer column"""
+    declared = {c['name']: c['type'] for c in inspect(conn).get_columns(table)}
+    if isinstance(declared[column], Integer):
+        return
+
+    quoted = conn.dialect.identifier_preparer.quote(table)
+    if conn.dialect.name == 'sqlite':
+        # SQLite cannot retype a column, but NUMERIC affinity stores
+        # integral values as exact 64-bit integers
+        conn.execute(text(f'UPDATE {quoted} SET {column} = CAST({expression} AS INTEGER) WHERE {column} IS NOT NULL'))
+    else:
+        conn.execute(text(f'ALTER TABLE {quoted} ALTER COLUMN {column} TYPE BIGINT USING {expression}'))
+
+
+@migration(5, 'Time-ordered event ids for audit rows')
+def _audit_event_ids(conn):
+    columns = {column['name'] for column in inspect(conn).get_columns('admin_action')}
+    if 'event_id' not in columns:
+        conn.execute(text('ALTER TABLE admin_action ADD COLUMN event_id VARCHAR(26)'))
+    _create_indexes(conn, 'ix_admin_action_event_id')
+
+
+@migration(6, 'Dashboard counter table')
+def _dashboard_counters(conn):
+    # Left empty: the first dashboard read reconciles it from the source tables
+    DashboardCounter.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(7, 'Replication heartbeat table')
+def _replication_heartbeat(conn):
+    ReplicationHeartbeat.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(8, 'Global user and address directory for sharded user data')
+def _shard_directory(conn):
+    # Filled as users register once DATABASE_SHARDS is set; existing rows
+    # are not sharded
+    UserDirectory.__table__.create(bind=conn, checkfirst=True)
+    AddressDirectory.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(9, 'Full-text user search index')
+def _user_search_index(conn):
+    if user_search.install(conn):
+        user_search.rebuild(conn)
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, '
+        'description VARCHAR(255) NOT NULL, '
+        'applied_at DATETIME NOT NULL)'
+    ))
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def run_migrations(engine):
+    """Apply every pending migration in order; returns the (version, description) pairs applied"""
+    applied = applied_versions(engine)
+    newly_applied = []
+
+    for version, description, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        # Each migration and its version row commit together
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) '
+                     'VALUES (:version, :description, :applied_at)'),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+        newly_applied.append((version, description))
+
+    return newly_applied
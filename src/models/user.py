@@ -1,22 +1,39 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from datetime import datetime
 import secrets
 import hashlib
 
-db = SQLAlchemy()
+from src.utils.ids import new_tx_hash, new_ulid
+from src.utils.money import to_float
+
+class RoutingSession(Session):
+    """db.session class that lets the app's shard router pick the engine for sharded tables"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            shards = current_app.extensions.get('shard_router')
+            if shards is not None:
+                bind = shards.get_bind(self, mapper, clause)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(255), nullable=False)
+    # Only login reads the hash; every other query (auth included) leaves it out
+    password_hash = db.deferred(db.Column(db.String(255), nullable=False), raiseload=True)
     first_name = db.Column(db.String(50), nullable=True)
     last_name = db.Column(db.String(50), nullable=True)
     phone = db.Column(db.String(20), nullable=True)
-    profile_image = db.Column(db.Text, nullable=True)
+    profile_image_blob = db.Column(db.String(64), db.ForeignKey('blob.digest'), nullable=True)
     fingerprint_enabled = db.Column(db.Boolean, default=False)
-    is_verified = db.Column(db.Boolean, default=False)
-    is_blocked = db.Column(db.Boolean, default=False)
+    # active_history keeps the old value on change for the dashboard counters
+    is_verified = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
+    is_blocked = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
     blocked_at = db.Column(db.DateTime, nullable=True)
     blocked_by = db.Column(db.Integer, db.ForeignKey('admin.id'), nullable=True)
     blocked_reason = db.Column(db.Text, nullable=True)
@@ -38,7 +55,7 @@ class User(db.Model):
             'first_name': self.first_name,
             'last_name': self.last_name,
             'phone': self.phone,
-            'profile_image': self.profile_image,
+            'profile_image': f'/api/users/{self.id}/profile-image' if self.profile_image_blob else None,
             'fingerprint_enabled': self.fingerprint_enabled,
             'is_verified': self.is_verified,
             'is_blocked': self.is_blocked,
@@ -52,7 +69,8 @@ class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(255), nullable=False)
+    # Only login reads the hash; every other query (auth included) leaves it out
+    password_hash = db.deferred(db.Column(db.String(255), nullable=False), raiseload=True)
     first_name = db.Column(db.String(50), nullable=True)
     last_name = db.Column(db.String(50), nullable=True)
     role = db.Column(db.String(50), default='admin')  # admin, super_admin
@@ -86,8 +104,16 @@ class AdminAction(db.Model):
     action_type = db.Column(db.String(50), nullable=False)  # block_user, unblock_user, send_crypto, view_wallet
     target_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     action_details = db.Column(db.JSON, nullable=True)  # Store additional details about the action
+    # Assigned when the action is recorded, so a retried batch write cannot duplicate it
+    event_id = db.Column(db.String(26), nullable=True, default=new_ulid)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_admin_action_admin_id_action_type_created_at', 'admin_id', 'action_type', 'created_at'),
+        db.Index('ix_admin_action_admin_id_created_at', 'admin_id', 'created_at'),
+        db.Index('ix_admin_action_event_id', 'event_id', unique=True),
+    )
+    
     def __repr__(self):
         return f'<AdminAction {self.action_type} by Admin {self.admin_id}>'
 
@@ -98,6 +124,7 @@ class AdminAction(db.Model):
             'action_type': self.action_type,
             'target_user_id': self.target_user_id,
             'action_details': self.action_details,
+            'event_id': self.event_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -107,12 +134,16 @@ class Wallet(db.Model):
     currency = db.Column(db.String(10), nullable=False)  # BTC, USDT, etc.
     address = db.Column(db.String(255), unique=True, nullable=False)
     private_key = db.Column(db.String(255), nullable=False)
-    balance = db.Column(db.Numeric(20, 8), default=0.0)
+    balance = db.column_property(db.Column(db.BigInteger, default=0), active_history=True)  # minor units, see src.utils.money
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     transactions_sent = db.relationship('Transaction', foreign_keys='Transaction.from_wallet_id', backref='from_wallet', lazy=True)
     transactions_received = db.relationship('Transaction', foreign_keys='Transaction.to_wallet_id', backref='to_wallet', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_wallet_user_id_currency', 'user_id', 'currency'),
+    )
+
     def __repr__(self):
         return f'<Wallet {self.currency}:{self.address[:10]}...>'
 
@@ -139,7 +170,7 @@ class Wallet(db.Model):
             'user_id': self.user_id,
             'currency': self.currency,
             'address': self.address,
-            'balance': float(self.balance),
+            'balance': to_float(self.balance, self.currency),
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -151,26 +182,34 @@ class Transaction(db.Model):
     from_address = db.Column(db.String(255), nullable=False)
     to_address = db.Column(db.String(255), nullable=False)
     currency = db.Column(db.String(10), nullable=False)
-    amount = db.Column(db.Numeric(20, 8), nullable=False)
-    fee = db.Column(db.Numeric(20, 8), default=0.0)
+    amount = db.Column(db.BigInteger, nullable=False)  # minor units of currency
+    fee = db.Column(db.BigInteger, default=0)
     tx_hash = db.Column(db.String(255), unique=True, nullable=False)
     block_number = db.Column(db.Integer, nullable=True)
     block_hash = db.Column(db.String(255), nullable=True)
     gas_used = db.Column(db.Integer, nullable=True)
-    gas_price = db.Column(db.Numeric(20, 8), nullable=True)
+    gas_price = db.Column(db.BigInteger, nullable=True)  # gwei
     contract_address = db.Column(db.String(255), nullable=True)
     token_id = db.Column(db.String(255), nullable=True)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, failed
+    status = db.column_property(db.Column(db.String(20), default='pending'), active_history=True)  # pending, confirmed, failed
     transaction_type = db.Column(db.String(20), nullable=False)  # send, receive
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     confirmed_at = db.Column(db.DateTime, nullable=True)
 
+    # SQLite appends the rowid (id) to every index, so these also serve
+    # the (created_at, id) keyset pagination order
+    __table_args__ = (
+        db.Index('ix_transaction_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_transaction_user_id_currency_created_at', 'user_id', 'currency', 'created_at'),
+        db.Index('ix_transaction_created_at', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Transaction {self.tx_hash[:10]}...>'
 
     def generate_tx_hash(self):
-        random_data = f"{self.from_address}{self.to_address}{self.amount}{datetime.utcnow().timestamp()}"
-        self.tx_hash = '0x' + hashlib.sha256(random_data.encode()).hexdigest()
+        # Time-ordered and unique even for identical sends in the same instant
+        self.tx_hash = new_tx_hash()
 
     def generate_blockchain_data(self):
         # Generate realistic blockchain data
@@ -190,13 +229,13 @@ class Transaction(db.Model):
             'from_address': self.from_address,
             'to_address': self.to_address,
             'currency': self.currency,
-            'amount': float(self.amount),
-            'fee': float(self.fee),
+            'amount': to_float(self.amount, self.currency),
+            'fee': to_float(self.fee, self.currency),
             'tx_hash': self.tx_hash,
             'block_number': self.block_number,
             'block_hash': self.block_hash,
             'gas_used': self.gas_used,
-            'gas_price': float(self.gas_price) if self.gas_price else None,
+            'gas_price': self.gas_price,
             'contract_address': self.contract_address,
             'token_id': self.token_id,
             'status': self.status,
@@ -210,14 +249,18 @@ class KYCRecord(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     document_type = db.Column(db.String(50), nullable=False)  # passport, driver_license, national_id
     document_number = db.Column(db.String(100), nullable=False)
-    document_front = db.Column(db.Text, nullable=False)  # Base64 encoded image
-    document_back = db.Column(db.Text, nullable=True)  # Base64 encoded image
-    selfie_image = db.Column(db.Text, nullable=False)  # Base64 encoded image
+    document_front_blob = db.Column(db.String(64), db.ForeignKey('blob.digest'), nullable=False)
+    document_back_blob = db.Column(db.String(64), db.ForeignKey('blob.digest'), nullable=True)
+    selfie_image_blob = db.Column(db.String(64), db.ForeignKey('blob.digest'), nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     reviewed_at = db.Column(db.DateTime, nullable=True)
     reviewer_notes = db.Column(db.Text, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_kyc_record_user_id_status', 'user_id', 'status'),
+    )
+
     def __repr__(self):
         return f'<KYCRecord {self.user_id}:{self.status}>'
 
@@ -233,6 +276,55 @@ class KYCRecord(db.Model):
             'reviewer_notes': self.reviewer_notes
         }
 
+class Blob(db.Model):
+    """Metadata for a content-addressed object in the blob store; bytes live outside the database"""
+    digest = db.Column(db.String(64), primary_key=True)  # SHA-256 of the content
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(100), nullable=False, default='application/octet-stream')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Blob {self.digest[:12]} {self.size}B>'
+
+class DashboardCounter(db.Model):
+    """One shard of a running total behind the admin dashboard; a counter's value is the sum of its shards"""
+    name = db.Column(db.String(50), primary_key=True)  # e.g. users, wallets:BTC, balance:BTC
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DashboardCounter {self.name}[{self.shard}]={self.value}>'
+
+class ReplicationHeartbeat(db.Model):
+    """A timestamp the primary keeps rewriting; a replica's copy of it shows how far behind it is"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    beat_at = db.Column(db.Float, nullable=False)  # unix time on the primary
+
+class UserDirectory(db.Model):
+    """Primary-side index of sharded users: claims each username and email across every shard"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # the user's id; it names the shard
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+
+    def __repr__(self):
+        return f'<UserDirectory {self.username}:{self.id}>'
+
+class AddressDirectory(db.Model):
+    """Primary-side claim on a wallet address, so addresses stay unique across shards"""
+    address = db.Column(db.String(255), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<AddressDirectory {self.address[:10]}...:{self.user_id}>'
+
+class ShardSequence(db.Model):
+    """Per-shard id counter for a sharded table; ids are counter * shard count + shard index"""
+    name = db.Column(db.String(50), primary_key=True)  # table name
+    last_value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ShardSequence {self.name}={self.last_value}>'
+
 class CryptoPrices(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(10), unique=True, nullable=False)
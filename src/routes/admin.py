@@ -1,11 +1,21 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from werkzeug.security import generate_password_hash, check_password_hash
-from src.models.user import Admin, User, Wallet, Transaction, AdminAction, db
+from src.models.user import Admin, User, Wallet, Transaction, AdminAction, KYCRecord, db
+from src.routes.user import admin_get_all_users
+from src.services.audit_log import audit_log
+from src.services.balances import credit
+from src.services.blob_store import blob_storage
+from src.services.dashboard_counters import dashboard_counters
+from src.services.group_commit import group_commit
+from src.services.principal_cache import principal_cache
+from src.services.shards import shard_router
+from src.services.slow_queries import SORT_KEYS, slow_queries
+from src.services.user_search import search_users
+from src.utils.money import format_amount, parse_amount, to_float
+from src.utils.pagination import InvalidCursor, paginate_keyset
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
-import secrets
-from decimal import Decimal
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -22,7 +32,7 @@ def admin_token_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_admin = Admin.query.get(data['admin_id'])
+            current_admin = principal_cache.get_admin(data['admin_id'])
             if not current_admin or not current_admin.is_active:
                 return jsonify({'message': 'Admin not found or inactive'}), 401
         except jwt.ExpiredSignatureError:
@@ -33,16 +43,10 @@ def admin_token_required(f):
         return f(current_admin, *args, **kwargs)
     return decorated
 
-def log_admin_action(admin_id, action_type, target_user_id=None, action_details=None):
-    """Log admin actions for audit trail"""
-    action = AdminAction(
-        admin_id=admin_id,
-        action_type=action_type,
-        target_user_id=target_user_id,
-        action_details=action_details
-    )
-    db.session.add(action)
-    db.session.commit()
+def log_admin_action(admin_id, action_type, target_user_id=None, action_details=None, durable=False, session=None):
+    """Log admin actions for audit trail; durable=True writes it in the request's own commit"""
+    audit_log.record(admin_id, action_type, target_user_id=target_user_id,
+                     action_details=action_details, durable=durable, session=session)
 
 # Admin Authentication Routes
 
@@ -71,7 +75,7 @@ def admin_register():
         )
         
         db.session.add(admin)
-        db.session.commit()
+        db.session.flush()
         
         return jsonify({
             'message': 'Admin registered successfully',
@@ -86,7 +90,7 @@ def admin_login():
     """Admin login"""
     try:
         data = request.json
-        admin = Admin.query.filter_by(username=data['username']).first()
+        admin = Admin.query.options(db.undefer(Admin.password_hash)).filter_by(username=data['username']).first()
         
         if admin and check_password_hash(admin.password_hash, data['password']):
             if not admin.is_active:
@@ -94,7 +98,6 @@ def admin_login():
             
             # Update last login time
             admin.last_login = datetime.utcnow()
-            db.session.commit()
             
             token = jwt.encode({
                 'admin_id': admin.id,
@@ -124,6 +127,12 @@ def admin_profile(current_admin):
 # User Management Routes
 
 @admin_bp.route('/admin/users', methods=['GET'])
+def list_users():
+    """The admin panel's X-Admin-Key requests get the keyset listing with wallets; admin tokens get get_all_users"""
+    if 'X-Admin-Key' in request.headers:
+        return admin_get_all_users()
+    return get_all_users()
+
 @admin_token_required
 def get_all_users(current_admin):
     """Get all users with pagination and filtering"""
@@ -134,15 +143,11 @@ def get_all_users(current_admin):
         status = request.args.get('status', '')  # active, blocked, verified, unverified
         
         query = User.query
+        rank = None
         
-        # Apply search filter
+        # Apply search filter: ranked full-text matches, best first
         if search:
-            query = query.filter(
-                (User.username.contains(search)) |
-                (User.email.contains(search)) |
-                (User.first_name.contains(search)) |
-                (User.last_name.contains(search))
-            )
+            query, rank = search_users(query, search)
         
         # Apply status filter
         if status == 'blocked':
@@ -154,9 +159,12 @@ def get_all_users(current_admin):
         elif status == 'unverified':
             query = query.filter(User.is_verified == False)
         
-        users = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        if rank is not None:
+            users = shard_router.paginate(query.add_columns(rank).order_by(rank), User.id,
+                                          lambda row: (row[1], row[0].id), page, per_page)
+            users.items = [user for user, _ in users.items]
+        else:
+            users = shard_router.paginate(query, User.id, lambda user: user.id, page, per_page)
         
         # Log admin action
         log_admin_action(current_admin.id, 'view_users', action_details={
@@ -184,6 +192,7 @@ def get_all_users(current_admin):
 def get_user_details(current_admin, user_id):
     """Get detailed user information"""
     try:
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -214,6 +223,7 @@ def block_user(current_admin, user_id):
     """Block a user"""
     try:
         data = request.json
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -228,11 +238,10 @@ def block_user(current_admin, user_id):
         user.blocked_by = current_admin.id
         user.blocked_reason = reason
         
-        db.session.commit()
-        
-        # Log admin action
+        # Log admin action; commits together with the block
         log_admin_action(current_admin.id, 'block_user', target_user_id=user_id, 
-                        action_details={'reason': reason})
+                        action_details={'reason': reason}, durable=True)
+        principal_cache.invalidate_user(user_id)
         
         return jsonify({
             'message': 'User blocked successfully',
@@ -247,6 +256,7 @@ def block_user(current_admin, user_id):
 def unblock_user(current_admin, user_id):
     """Unblock a user"""
     try:
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -259,10 +269,9 @@ def unblock_user(current_admin, user_id):
         user.blocked_by = None
         user.blocked_reason = None
         
-        db.session.commit()
-        
-        # Log admin action
-        log_admin_action(current_admin.id, 'unblock_user', target_user_id=user_id)
+        # Log admin action; commits together with the unblock
+        log_admin_action(current_admin.id, 'unblock_user', target_user_id=user_id, durable=True)
+        principal_cache.invalidate_user(user_id)
         
         return jsonify({
             'message': 'User unblocked successfully',
@@ -292,9 +301,7 @@ def get_all_wallets(current_admin):
         if user_id:
             query = query.filter(Wallet.user_id == user_id)
         
-        wallets = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        wallets = shard_router.paginate(query, Wallet.id, lambda row: row[0].id, page, per_page)
         
         # Log admin action
         log_admin_action(current_admin.id, 'view_wallets', action_details={
@@ -333,6 +340,7 @@ def get_all_wallets(current_admin):
 def get_user_wallets(current_admin, user_id):
     """Get specific user's wallet addresses"""
     try:
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -350,6 +358,40 @@ def get_user_wallets(current_admin, user_id):
     except Exception as e:
         return jsonify({'message': f'Failed to fetch user wallets: {str(e)}'}), 500
 
+# KYC Review Routes
+
+KYC_DOCUMENTS = {
+    'front': 'document_front_blob',
+    'back': 'document_back_blob',
+    'selfie': 'selfie_image_blob'
+}
+
+@admin_bp.route('/admin/kyc/<int:kyc_id>/documents/<string:document>', methods=['GET'])
+@admin_token_required
+def get_kyc_document(current_admin, kyc_id, document):
+    """Stream a KYC document image (front, back or selfie) from the blob store"""
+    try:
+        if document not in KYC_DOCUMENTS:
+            return jsonify({'message': 'Unknown document; use front, back or selfie'}), 400
+        
+        shard_router.use(kyc_id)
+        kyc_record = KYCRecord.query.get(kyc_id)
+        if not kyc_record:
+            return jsonify({'message': 'KYC record not found'}), 404
+        
+        digest = getattr(kyc_record, KYC_DOCUMENTS[document])
+        if not digest:
+            return jsonify({'message': 'Document not provided'}), 404
+        
+        # Log admin action
+        log_admin_action(current_admin.id, 'view_kyc_document', target_user_id=kyc_record.user_id,
+                        action_details={'kyc_id': kyc_id, 'document': document})
+        
+        return blob_storage.send(digest)
+        
+    except Exception as e:
+        return jsonify({'message': f'Failed to fetch KYC document: {str(e)}'}), 500
+
 # Crypto Sending Routes
 
 @admin_bp.route('/admin/send-crypto', methods=['POST'])
@@ -367,10 +409,11 @@ def admin_send_crypto(current_admin):
         
         user_id = data['user_id']
         currency = data['currency'].upper()
-        amount = Decimal(str(data['amount']))
+        amount = parse_amount(data['amount'], currency)
         note = data.get('note', '')
         
         # Validate user exists
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -384,9 +427,6 @@ def admin_send_crypto(current_admin):
         if not wallet:
             return jsonify({'message': f'User does not have a {currency} wallet'}), 404
         
-        # Update wallet balance
-        wallet.balance += amount
-        
         # Create transaction record
         transaction = Transaction(
             user_id=user_id,
@@ -405,26 +445,31 @@ def admin_send_crypto(current_admin):
         transaction.generate_blockchain_data()
         transaction.confirmed_at = datetime.utcnow()
         
-        db.session.add(transaction)
-        db.session.commit()
-        
-        # Log admin action
-        log_admin_action(current_admin.id, 'send_crypto', target_user_id=user_id, 
-                        action_details={
-                            'currency': currency,
-                            'amount': str(amount),
-                            'note': note,
-                            'transaction_id': transaction.id
-                        })
+        def write(session):
+            balance = credit(wallet, amount, session=session)
+            session.add(transaction)
+            session.flush()
+            
+            # Log admin action; commits together with the transfer
+            log_admin_action(current_admin.id, 'send_crypto', target_user_id=user_id, 
+                            action_details={
+                                'currency': currency,
+                                'amount': format_amount(amount, currency),
+                                'note': note,
+                                'transaction_id': transaction.id
+                            }, session=session)
+            return balance
+        
+        balance = group_commit.submit(write)
         
         return jsonify({
-            'message': f'Successfully sent {amount} {currency} to user {user.username}',
+            'message': f'Successfully sent {format_amount(amount, currency)} {currency} to user {user.username}',
             'transaction': transaction.to_dict(),
-            'updated_balance': float(wallet.balance)
+            'updated_balance': to_float(balance, currency)
         }), 200
         
-    except ValueError:
-        return jsonify({'message': 'Invalid amount format'}), 400
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to send crypto: {str(e)}'}), 500
 
@@ -433,40 +478,45 @@ def admin_send_crypto(current_admin):
 def get_admin_crypto_transfers(current_admin):
     """Get all admin crypto transfers"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        # Get admin crypto transfer actions with their target users in one statement
+        query = db.session.query(AdminAction, User).outerjoin(
+            User, AdminAction.target_user_id == User.id
+        ).filter(
+            AdminAction.admin_id == current_admin.id,
+            AdminAction.action_type == 'send_crypto'
+        )
+        actions = paginate_keyset(
+            query, AdminAction.created_at, AdminAction.id,
+            key=lambda row: (row[0].created_at, row[0].id), default_limit=20
+        )
         
-        # Get admin crypto transfer actions
-        actions = AdminAction.query.filter_by(
-            admin_id=current_admin.id,
-            action_type='send_crypto'
-        ).order_by(AdminAction.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        # With sharded user data the join finds no users; fetch them from their shards
+        sharded_users = shard_router.load_users(
+            action.target_user_id for action, user in actions.items if user is None and action.target_user_id
         )
         
         transfers = []
-        for action in actions.items:
+        for action, user in actions.items:
+            user = user or sharded_users.get(action.target_user_id)
             transfer_data = action.to_dict()
-            if action.target_user_id:
-                user = User.query.get(action.target_user_id)
-                if user:
-                    transfer_data['target_user'] = {
-                        'id': user.id,
-                        'username': user.username,
-                        'email': user.email
-                    }
+            if user:
+                transfer_data['target_user'] = {
+                    'id': user.id,
+                    'username': user.username,
+                    'email': user.email
+                }
             transfers.append(transfer_data)
         
         return jsonify({
             'transfers': transfers,
             'total': actions.total,
-            'pages': actions.pages,
-            'current_page': page,
-            'per_page': per_page,
-            'has_next': actions.has_next,
-            'has_prev': actions.has_prev
+            'per_page': actions.limit,
+            'next_cursor': actions.next_cursor,
+            'has_next': actions.has_next
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch crypto transfers: {str(e)}'}), 500
 
@@ -477,27 +527,10 @@ def get_admin_crypto_transfers(current_admin):
 def admin_dashboard(current_admin):
     """Get admin dashboard statistics"""
     try:
-        # Get user statistics
-        total_users = User.query.count()
-        blocked_users = User.query.filter_by(is_blocked=True).count()
-        verified_users = User.query.filter_by(is_verified=True).count()
-        active_users = total_users - blocked_users
-        
-        # Get wallet statistics
-        total_wallets = Wallet.query.count()
-        btc_wallets = Wallet.query.filter_by(currency='BTC').count()
-        usdt_wallets = Wallet.query.filter_by(currency='USDT').count()
-        eth_wallets = Wallet.query.filter_by(currency='ETH').count()
-        
-        # Get total balances by currency
-        btc_total = db.session.query(db.func.sum(Wallet.balance)).filter_by(currency='BTC').scalar() or 0
-        usdt_total = db.session.query(db.func.sum(Wallet.balance)).filter_by(currency='USDT').scalar() or 0
-        eth_total = db.session.query(db.func.sum(Wallet.balance)).filter_by(currency='ETH').scalar() or 0
-        
-        # Get transaction statistics
-        total_transactions = Transaction.query.count()
-        pending_transactions = Transaction.query.filter_by(status='pending').count()
-        confirmed_transactions = Transaction.query.filter_by(status='confirmed').count()
+        # Maintained running totals instead of a COUNT/SUM scan per figure
+        counters = dashboard_counters.snapshot()
+        total_users = counters.get('users', 0)
+        blocked_users = counters.get('users:blocked', 0)
         
         # Get recent admin actions
         recent_actions = AdminAction.query.order_by(
@@ -507,25 +540,25 @@ def admin_dashboard(current_admin):
         return jsonify({
             'user_stats': {
                 'total_users': total_users,
-                'active_users': active_users,
+                'active_users': total_users - blocked_users,
                 'blocked_users': blocked_users,
-                'verified_users': verified_users
+                'verified_users': counters.get('users:verified', 0)
             },
             'wallet_stats': {
-                'total_wallets': total_wallets,
-                'btc_wallets': btc_wallets,
-                'usdt_wallets': usdt_wallets,
-                'eth_wallets': eth_wallets
+                'total_wallets': counters.get('wallets', 0),
+                'btc_wallets': counters.get('wallets:BTC', 0),
+                'usdt_wallets': counters.get('wallets:USDT', 0),
+                'eth_wallets': counters.get('wallets:ETH', 0)
             },
             'balance_stats': {
-                'btc_total': float(btc_total),
-                'usdt_total': float(usdt_total),
-                'eth_total': float(eth_total)
+                'btc_total': to_float(counters.get('balance:BTC'), 'BTC'),
+                'usdt_total': to_float(counters.get('balance:USDT'), 'USDT'),
+                'eth_total': to_float(counters.get('balance:ETH'), 'ETH')
             },
             'transaction_stats': {
-                'total_transactions': total_transactions,
-                'pending_transactions': pending_transactions,
-                'confirmed_transactions': confirmed_transactions
+                'total_transactions': counters.get('transactions', 0),
+                'pending_transactions': counters.get('transactions:pending', 0),
+                'confirmed_transactions': counters.get('transactions:confirmed', 0)
             },
             'recent_actions': [action.to_dict() for action in recent_actions]
         }), 200
@@ -538,8 +571,6 @@ def admin_dashboard(current_admin):
 def get_admin_actions(current_admin):
     """Get admin action history"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         action_type = request.args.get('action_type', '')
         
         query = AdminAction.query.filter_by(admin_id=current_admin.id)
@@ -547,19 +578,38 @@ def get_admin_actions(current_admin):
         if action_type:
             query = query.filter_by(action_type=action_type)
         
-        actions = query.order_by(AdminAction.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        actions = paginate_keyset(query, AdminAction.created_at, AdminAction.id, default_limit=20)
         
         return jsonify({
             'actions': [action.to_dict() for action in actions.items],
             'total': actions.total,
-            'pages': actions.pages,
-            'current_page': page,
-            'per_page': per_page,
-            'has_next': actions.has_next,
-            'has_prev': actions.has_prev
+            'per_page': actions.limit,
+            'next_cursor': actions.next_cursor,
+            'has_next': actions.has_next
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
-        return jsonify({'message': f'Failed to fetch admin actions: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'message': f'Failed to fetch admin actions: {str(e)}'}), 500
+
+@admin_bp.route('/admin/actions/metrics', methods=['GET'])
+@admin_token_required
+def get_audit_log_metrics(current_admin):
+    """Get audit log queue depth and backpressure counters"""
+    return jsonify(audit_log.metrics()), 200
+
+@admin_bp.route('/admin/slow-queries', methods=['GET'])
+@admin_token_required
+def get_slow_queries(current_admin):
+    """Get the statements that ran slower than the threshold, worst first"""
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    sort = request.args.get('sort', 'total')
+    if sort not in SORT_KEYS:
+        return jsonify({'message': f'sort must be one of: {", ".join(SORT_KEYS)}'}), 400
+    log = current_app.extensions.get('slow_queries', slow_queries)
+    return jsonify({
+        'enabled': log.enabled,
+        'threshold': log.threshold,
+        'queries': log.top(limit=limit, sort=sort)
+    }), 200
@@ -1,12 +1,25 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.security import generate_password_hash, check_password_hash
 from src.models.user import User, Wallet, Transaction, KYCRecord, CryptoPrices, db
+from src.services.balances import InsufficientBalance, credit, debit
+from src.services.blob_store import blob_storage
+from src.services.dashboard_counters import dashboard_counters
+from src.services.group_commit import group_commit
+from src.services.price_feed import price_feed
+from src.services.principal_cache import principal_cache
+from src.services.shards import shard_router
+from src.utils.ids import new_tx_hash
+from src.utils.money import format_amount, parse_amount, to_float, to_units
+from src.utils.multipart import read_multipart
+from src.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, get_limit, paginate_keyset
+from sqlalchemy.orm import aliased
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
-import requests
 import secrets
 import base64
+import json
 
 user_bp = Blueprint('user', __name__)
 
@@ -23,7 +36,8 @@ def token_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            shard_router.use(data['user_id'])
+            current_user = principal_cache.get_user(data['user_id'])
             if not current_user:
                 return jsonify({'message': 'User not found'}), 401
             if current_user.is_blocked:
@@ -44,10 +58,10 @@ def register():
     try:
         data = request.json
         
-        if User.query.filter_by(username=data['username']).first():
+        if shard_router.user_exists(username=data['username']):
             return jsonify({'message': 'Username already exists'}), 400
         
-        if User.query.filter_by(email=data['email']).first():
+        if shard_router.user_exists(email=data['email']):
             return jsonify({'message': 'Email already exists'}), 400
         
         password_hash = generate_password_hash(data['password'])
@@ -62,7 +76,7 @@ def register():
         )
         
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         
         # Create default wallets for all supported cryptocurrencies
         supported_currencies = ['BTC', 'USDT', 'ETH']
@@ -74,7 +88,7 @@ def register():
             db.session.add(wallet)
             created_wallets.append(wallet)
         
-        db.session.commit()
+        db.session.flush()
         
         # Log wallet creation for audit
         print(f"Created {len(created_wallets)} wallets for user {user.username}: {[w.currency for w in created_wallets]}")
@@ -98,7 +112,9 @@ def register():
 def login():
     try:
         data = request.json
-        user = User.query.filter_by(username=data['username']).first()
+        if not shard_router.route_username(data['username']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+        user = User.query.options(db.undefer(User.password_hash)).filter_by(username=data['username']).first()
         
         if user and check_password_hash(user.password_hash, data['password']):
             # Check if user is blocked
@@ -139,17 +155,19 @@ def update_profile(current_user):
         current_user.first_name = data.get('first_name', current_user.first_name)
         current_user.last_name = data.get('last_name', current_user.last_name)
         current_user.phone = data.get('phone', current_user.phone)
-        current_user.profile_image = data.get('profile_image', current_user.profile_image)
         current_user.fingerprint_enabled = data.get('fingerprint_enabled', current_user.fingerprint_enabled)
-        current_user.updated_at = datetime.datetime.utcnow()
+        current_user.updated_at = datetime.utcnow()
         
-        db.session.commit()
+        if 'profile_image' in data:
+            current_user.profile_image_blob = blob_storage.store_base64(data['profile_image'])
         
         return jsonify({
             'message': 'Profile updated successfully',
             'user': current_user.to_dict()
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Profile update failed: {str(e)}'}), 500
 
@@ -170,14 +188,35 @@ def get_wallet_by_currency(current_user, currency):
 @user_bp.route('/transactions', methods=['GET'])
 @token_required
 def get_transactions(current_user):
-    transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.created_at.desc()).all()
-    return jsonify([tx.to_dict() for tx in transactions]), 200
+    try:
+        page = paginate_keyset(
+            Transaction.query.filter_by(user_id=current_user.id),
+            Transaction.created_at, Transaction.id
+        )
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
+    return _transaction_page_response(page)
 
 @user_bp.route('/transactions/<string:currency>', methods=['GET'])
 @token_required
 def get_transactions_by_currency(current_user, currency):
-    transactions = Transaction.query.filter_by(user_id=current_user.id, currency=currency.upper()).order_by(Transaction.created_at.desc()).all()
-    return jsonify([tx.to_dict() for tx in transactions]), 200
+    try:
+        page = paginate_keyset(
+            Transaction.query.filter_by(user_id=current_user.id, currency=currency.upper()),
+            Transaction.created_at, Transaction.id
+        )
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
+    return _transaction_page_response(page)
+
+def _transaction_page_response(page):
+    """Keep the bare-list body for existing clients; paging details travel in headers"""
+    response = jsonify([tx.to_dict() for tx in page.items])
+    if page.next_cursor:
+        response.headers['X-Next-Cursor'] = page.next_cursor
+    if page.total is not None:
+        response.headers['X-Total-Count'] = str(page.total)
+    return response, 200
 
 @user_bp.route('/send', methods=['POST'])
 @token_required
@@ -185,7 +224,7 @@ def send_crypto(current_user):
     try:
         data = request.json
         currency = data['currency'].upper()
-        amount = float(data['amount'])
+        amount = parse_amount(data['amount'], currency)
         to_address = data['to_address']
         
         # Check if user is verified for sending
@@ -196,9 +235,6 @@ def send_crypto(current_user):
         if not wallet:
             return jsonify({'message': 'Wallet not found'}), 404
         
-        if wallet.balance < amount:
-            return jsonify({'message': 'Insufficient balance'}), 400
-        
         # Create transaction
         transaction = Transaction(
             user_id=current_user.id,
@@ -207,27 +243,31 @@ def send_crypto(current_user):
             to_address=to_address,
             currency=currency,
             amount=amount,
-            fee=0.001 if currency == 'BTC' else 0.01,
+            fee=to_units('0.001' if currency == 'BTC' else '0.01', currency),
             transaction_type='send',
             status='confirmed'
         )
         
         transaction.generate_tx_hash()
         transaction.generate_blockchain_data()
-        transaction.confirmed_at = datetime.datetime.utcnow()
+        transaction.confirmed_at = datetime.utcnow()
         
-        # Update wallet balance
-        wallet.balance -= amount
-        wallet.balance -= transaction.fee
+        def write(session):
+            # Debit amount and fee atomically; fails instead of overdrawing
+            debit(wallet, amount + transaction.fee, session=session)
+            session.add(transaction)
         
-        db.session.add(transaction)
-        db.session.commit()
+        group_commit.submit(write)
         
         return jsonify({
             'message': 'Transaction sent successfully',
             'transaction': transaction.to_dict()
         }), 200
         
+    except InsufficientBalance:
+        return jsonify({'message': 'Insufficient balance'}), 400
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Send failed: {str(e)}'}), 500
 
@@ -242,8 +282,9 @@ def admin_send():
         
         user_id = data['user_id']
         currency = data['currency'].upper()
-        amount = float(data['amount'])
+        amount = parse_amount(data['amount'], currency)
         
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -267,19 +308,21 @@ def admin_send():
         
         transaction.generate_tx_hash()
         transaction.generate_blockchain_data()
-        transaction.confirmed_at = datetime.datetime.utcnow()
+        transaction.confirmed_at = datetime.utcnow()
         
-        # Update wallet balance
-        wallet.balance += amount
+        def write(session):
+            credit(wallet, amount, session=session)
+            session.add(transaction)
         
-        db.session.add(transaction)
-        db.session.commit()
+        group_commit.submit(write)
         
         return jsonify({
             'message': 'Crypto sent successfully',
             'transaction': transaction.to_dict()
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Admin send failed: {str(e)}'}), 500
 
@@ -287,9 +330,7 @@ def admin_send():
 @token_required
 def submit_kyc(current_user):
     try:
-        data = request.json
-        
-        # Check if user already has pending or approved KYC
+        # Check if user already has pending or approved KYC before reading any upload
         existing_kyc = KYCRecord.query.filter_by(user_id=current_user.id).filter(
             KYCRecord.status.in_(['pending', 'approved'])
         ).first()
@@ -297,26 +338,53 @@ def submit_kyc(current_user):
         if existing_kyc:
             return jsonify({'message': 'KYC already submitted or approved'}), 400
         
+        if request.mimetype == 'multipart/form-data':
+            data, documents = _read_kyc_multipart()
+        else:
+            # JSON with base64 images, kept for older clients
+            data = request.json
+            documents = {name: blob_storage.store_base64(data.get(name)) for name in KYC_DOCUMENT_FIELDS}
+        
+        if not documents['document_front'] or not documents['selfie_image']:
+            return jsonify({'message': 'document_front and selfie_image are required'}), 400
+        
         kyc_record = KYCRecord(
             user_id=current_user.id,
             document_type=data['document_type'],
             document_number=data['document_number'],
-            document_front=data['document_front'],
-            document_back=data.get('document_back'),
-            selfie_image=data['selfie_image']
+            document_front_blob=documents['document_front'],
+            document_back_blob=documents['document_back'],
+            selfie_image_blob=documents['selfie_image']
         )
         
         db.session.add(kyc_record)
-        db.session.commit()
+        db.session.flush()
         
         return jsonify({
             'message': 'KYC submitted successfully',
             'kyc': kyc_record.to_dict()
         }), 201
         
+    except RequestEntityTooLarge:
+        return jsonify({'message': 'Upload is too large'}), 413
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'KYC submission failed: {str(e)}'}), 500
 
+KYC_DOCUMENT_FIELDS = ['document_front', 'document_back', 'selfie_image']
+
+def _read_kyc_multipart():
+    """Stream each uploaded document part into the blob store without buffering the body"""
+    fields, writers = read_multipart(
+        request.stream, request.content_type,
+        lambda name, filename: blob_storage.writer() if name in KYC_DOCUMENT_FIELDS else None
+    )
+    documents = {}
+    for name in KYC_DOCUMENT_FIELDS:
+        documents[name] = blob_storage.commit_writer(writers[name]) if name in writers else None
+    return fields, documents
+
 @user_bp.route('/kyc/status', methods=['GET'])
 @token_required
 def get_kyc_status(current_user):
@@ -337,21 +405,20 @@ def approve_kyc():
             return jsonify({'message': 'Unauthorized'}), 401
         
         kyc_id = data['kyc_id']
+        shard_router.use(kyc_id)
         kyc_record = KYCRecord.query.get(kyc_id)
         
         if not kyc_record:
             return jsonify({'message': 'KYC record not found'}), 404
         
         kyc_record.status = 'approved'
-        kyc_record.reviewed_at = datetime.datetime.utcnow()
+        kyc_record.reviewed_at = datetime.utcnow()
         kyc_record.reviewer_notes = data.get('notes', 'Approved by admin')
         
         # Update user verification status
         user = User.query.get(kyc_record.user_id)
         user.is_verified = True
         
-        db.session.commit()
-        
         return jsonify({
             'message': 'KYC approved successfully',
             'kyc': kyc_record.to_dict()
@@ -362,71 +429,28 @@ def approve_kyc():
 
 @user_bp.route('/crypto/prices', methods=['GET'])
 def get_crypto_prices():
-    try:
-        # Fetch from CoinGecko API
-        url = 'https://api.coingecko.com/api/v3/simple/price'
-        params = {
-            'ids': 'bitcoin,tether,ethereum,binancecoin,cardano,solana,polkadot,dogecoin',
-            'vs_currencies': 'usd',
-            'include_24hr_change': 'true',
-            'include_market_cap': 'true',
-            'include_24hr_vol': 'true'
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-        
-        # Map to our format
-        crypto_mapping = {
-            'bitcoin': {'symbol': 'BTC', 'name': 'Bitcoin'},
-            'tether': {'symbol': 'USDT', 'name': 'Tether'},
-            'ethereum': {'symbol': 'ETH', 'name': 'Ethereum'},
-            'binancecoin': {'symbol': 'BNB', 'name': 'Binance Coin'},
-            'cardano': {'symbol': 'ADA', 'name': 'Cardano'},
-            'solana': {'symbol': 'SOL', 'name': 'Solana'},
-            'polkadot': {'symbol': 'DOT', 'name': 'Polkadot'},
-            'dogecoin': {'symbol': 'DOGE', 'name': 'Dogecoin'}
-        }
-        
-        prices = []
-        for coin_id, coin_data in data.items():
-            if coin_id in crypto_mapping:
-                crypto_info = crypto_mapping[coin_id]
-                prices.append({
-                    'symbol': crypto_info['symbol'],
-                    'name': crypto_info['name'],
-                    'price_usd': coin_data['usd'],
-                    'change_24h': coin_data.get('usd_24h_change', 0),
-                    'market_cap': coin_data.get('usd_market_cap'),
-                    'volume_24h': coin_data.get('usd_24h_vol')
-                })
-        
-        return jsonify(prices), 200
-        
-    except Exception as e:
-        # Fallback data if API fails
-        fallback_prices = [
-            {'symbol': 'BTC', 'name': 'Bitcoin', 'price_usd': 43250.50, 'change_24h': 2.45, 'market_cap': 847000000000, 'volume_24h': 15000000000},
-            {'symbol': 'USDT', 'name': 'Tether', 'price_usd': 1.00, 'change_24h': 0.01, 'market_cap': 95000000000, 'volume_24h': 25000000000},
-            {'symbol': 'ETH', 'name': 'Ethereum', 'price_usd': 2650.75, 'change_24h': 1.85, 'market_cap': 318000000000, 'volume_24h': 8000000000},
-            {'symbol': 'BNB', 'name': 'Binance Coin', 'price_usd': 315.20, 'change_24h': -0.75, 'market_cap': 47000000000, 'volume_24h': 1200000000},
-            {'symbol': 'ADA', 'name': 'Cardano', 'price_usd': 0.485, 'change_24h': 3.25, 'market_cap': 17000000000, 'volume_24h': 450000000},
-            {'symbol': 'SOL', 'name': 'Solana', 'price_usd': 98.45, 'change_24h': 4.15, 'market_cap': 42000000000, 'volume_24h': 1800000000},
-            {'symbol': 'DOT', 'name': 'Polkadot', 'price_usd': 7.25, 'change_24h': -1.25, 'market_cap': 9500000000, 'volume_24h': 180000000},
-            {'symbol': 'DOGE', 'name': 'Dogecoin', 'price_usd': 0.085, 'change_24h': 5.85, 'market_cap': 12000000000, 'volume_24h': 650000000}
-        ]
-        return jsonify(fallback_prices), 200
+    # Served from the in-process cache; refreshed from CoinGecko in the background
+    return jsonify(price_feed.get_prices()), 200
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
+    users = shard_router.merge(User.query.order_by(User.id), key=lambda user: user.id)
     return jsonify([user.to_dict() for user in users])
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
+    shard_router.use(user_id)
     user = User.query.get_or_404(user_id)
     return jsonify(user.to_dict())
 
+@user_bp.route('/users/<int:user_id>/profile-image', methods=['GET'])
+def get_user_profile_image(user_id):
+    shard_router.use(user_id)
+    user = User.query.get_or_404(user_id)
+    if not user.profile_image_blob:
+        return jsonify({'message': 'Profile image not found'}), 404
+    return blob_storage.send(user.profile_image_blob)
+
 
 
 # Admin functionality for adding crypto to user wallets
@@ -439,36 +463,59 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated
 
-@user_bp.route('/admin/users', methods=['GET'])
+# Served at GET /admin/users by admin.list_users for requests with the admin key
 @admin_required
 def admin_get_all_users():
-    """Get all users for admin panel"""
+    """Get users with their wallets for admin panel, one keyset page at a time"""
     try:
-        users = User.query.all()
-        users_data = []
-        
-        for user in users:
-            user_data = user.to_dict()
-            # Add wallet information
-            wallets = Wallet.query.filter_by(user_id=user.id).all()
-            user_data['wallets'] = []
-            
+        limit = get_limit(default=100, maximum=1000)
+        cursor = decode_cursor(request.args.get('cursor'), 1)
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        
+        query = User.query.order_by(User.id)
+        if cursor:
+            query = query.filter(User.id > cursor[0])
+        
+        # One extra row tells us whether another page exists without a COUNT
+        users = shard_router.merge(query.limit(limit + 1), key=lambda user: user.id, limit=limit + 1)
+        has_next = len(users) > limit
+        users = users[:limit]
+        
+        wallets_by_user = {user.id: [] for user in users}
+        if users:
+            wallets = shard_router.merge(Wallet.query.filter(
+                Wallet.user_id.in_(wallets_by_user.keys())
+            ).order_by(Wallet.user_id, Wallet.id), key=lambda wallet: (wallet.user_id, wallet.id))
             for wallet in wallets:
-                user_data['wallets'].append({
+                wallets_by_user[wallet.user_id].append({
                     'id': wallet.id,
                     'currency': wallet.currency,
                     'address': wallet.address,
-                    'balance': float(wallet.balance)
+                    'balance': to_float(wallet.balance, wallet.currency)
                 })
-            
-            users_data.append(user_data)
-        
-        return jsonify({
-            'message': 'Users retrieved successfully',
-            'users': users_data,
-            'total_users': len(users_data)
-        }), 200
         
+        # count is this page's size; total, the whole table, costs a COUNT per shard
+        trailer = {
+            'count': len(users),
+            'next_cursor': encode_cursor(users[-1].id) if has_next else None,
+            'has_next': has_next
+        }
+        if include_total:
+            trailer['total'] = shard_router.count(User.query)
+        
+        def generate():
+            # Serialise one user at a time instead of building the whole document
+            yield '{"message": "Users retrieved successfully", "users": ['
+            for index, user in enumerate(users):
+                user_data = user.to_dict()
+                user_data['wallets'] = wallets_by_user[user.id]
+                yield (',' if index else '') + json.dumps(user_data)
+            yield '], ' + json.dumps(trailer)[1:]
+        
+        return Response(stream_with_context(generate()), mimetype='application/json'), 200
+        
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error retrieving users: {str(e)}'}), 500
 
@@ -479,15 +526,19 @@ def admin_add_crypto_to_user(user_id):
     try:
         data = request.json
         currency = data.get('currency', '').upper()
-        amount = float(data.get('amount', 0))
+        try:
+            amount = parse_amount(data.get('amount', 0), currency)
+        except ValueError:
+            amount = None
         
-        if not currency or amount <= 0:
+        if not currency or amount is None:
             return jsonify({'message': 'Valid currency and amount required'}), 400
         
         if currency not in ['BTC', 'USDT', 'ETH']:
             return jsonify({'message': 'Unsupported currency. Use BTC, USDT, or ETH'}), 400
         
         # Check if user exists
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -511,13 +562,13 @@ def admin_add_crypto_to_user(user_id):
                 currency=currency,
                 address=address,
                 private_key=private_key,
-                balance=0.0
+                balance=0
             )
             db.session.add(wallet)
         
         # Add the amount to wallet balance
-        old_balance = float(wallet.balance)
-        wallet.balance = float(wallet.balance) + amount
+        new_balance = credit(wallet, amount)
+        old_balance = new_balance - amount
         
         # Create a transaction record for this admin addition
         transaction = Transaction(
@@ -526,14 +577,14 @@ def admin_add_crypto_to_user(user_id):
             transaction_type='receive',
             currency=currency,
             amount=amount,
-            fee=0.0,
+            fee=0,
             to_address=wallet.address,
             from_address='ADMIN_DEPOSIT',
-            tx_hash=f"admin_{secrets.token_hex(32)}",
+            tx_hash=new_tx_hash('admin_'),
             block_number=secrets.randbelow(1000000) + 800000,
             block_hash=f"0x{secrets.token_hex(32)}",
             gas_used=21000 if currency in ['ETH', 'USDT'] else None,
-            gas_price=20000000000 if currency in ['ETH', 'USDT'] else None,
+            gas_price=20 if currency in ['ETH', 'USDT'] else None,
             contract_address='0xa0b86a33e6ba3b936f1e5b6b7b8b5c6d8e9f0a1b' if currency == 'USDT' else None,
             status='confirmed',
             created_at=datetime.utcnow(),
@@ -541,10 +592,10 @@ def admin_add_crypto_to_user(user_id):
         )
         
         db.session.add(transaction)
-        db.session.commit()
+        db.session.flush()
         
         return jsonify({
-            'message': f'Successfully added {amount} {currency} to user {user.username}',
+            'message': f'Successfully added {format_amount(amount, currency)} {currency} to user {user.username}',
             'user': {
                 'id': user.id,
                 'username': user.username,
@@ -553,9 +604,9 @@ def admin_add_crypto_to_user(user_id):
             'wallet': {
                 'currency': currency,
                 'address': wallet.address,
-                'old_balance': old_balance,
-                'new_balance': float(wallet.balance),
-                'amount_added': amount
+                'old_balance': to_float(old_balance, currency),
+                'new_balance': to_float(new_balance, currency),
+                'amount_added': to_float(amount, currency)
             },
             'transaction': {
                 'id': transaction.id,
@@ -568,7 +619,6 @@ def admin_add_crypto_to_user(user_id):
     except ValueError:
         return jsonify({'message': 'Invalid amount format'}), 400
     except Exception as e:
-        db.session.rollback()
         return jsonify({'message': f'Error adding crypto: {str(e)}'}), 500
 
 @user_bp.route('/admin/users/<int:user_id>/wallets', methods=['GET'])
@@ -576,6 +626,7 @@ def admin_add_crypto_to_user(user_id):
 def admin_get_user_wallets(user_id):
     """Get all wallets for a specific user"""
     try:
+        shard_router.use(user_id)
         user = User.query.get(user_id)
         if not user:
             return jsonify({'message': 'User not found'}), 404
@@ -588,7 +639,7 @@ def admin_get_user_wallets(user_id):
                 'id': wallet.id,
                 'currency': wallet.currency,
                 'address': wallet.address,
-                'balance': float(wallet.balance),
+                'balance': to_float(wallet.balance, wallet.currency),
                 'created_at': wallet.created_at.isoformat() if wallet.created_at else None
             })
         
@@ -606,27 +657,31 @@ def admin_get_user_wallets(user_id):
     except Exception as e:
         return jsonify({'message': f'Error retrieving wallets: {str(e)}'}), 500
 
+def _admin_transaction_query():
+    """Transactions joined with their user and wallet currency in one statement"""
+    to_wallet = aliased(Wallet)
+    from_wallet = aliased(Wallet)
+    wallet_currency = db.func.coalesce(to_wallet.currency, from_wallet.currency, Transaction.currency)
+    return db.session.query(Transaction, User, wallet_currency.label('wallet_currency')).outerjoin(
+        User, Transaction.user_id == User.id
+    ).outerjoin(
+        to_wallet, Transaction.to_wallet_id == to_wallet.id
+    ).outerjoin(
+        from_wallet, Transaction.from_wallet_id == from_wallet.id
+    )
+
 @user_bp.route('/admin/transactions', methods=['GET'])
 @admin_required
 def admin_get_all_transactions():
     """Get all transactions for admin monitoring"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        
-        transactions = Transaction.query.order_by(Transaction.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        transactions = paginate_keyset(
+            _admin_transaction_query(), Transaction.created_at, Transaction.id,
+            key=lambda row: (row[0].created_at, row[0].id), gather=shard_router.scatter
         )
         
         transactions_data = []
-        for transaction in transactions.items:
-            user = User.query.get(transaction.user_id)
-            wallet = None
-            if transaction.to_wallet_id:
-                wallet = Wallet.query.get(transaction.to_wallet_id)
-            elif transaction.from_wallet_id:
-                wallet = Wallet.query.get(transaction.from_wallet_id)
-            
+        for transaction, user, wallet_currency in transactions.items:
             transactions_data.append({
                 'id': transaction.id,
                 'user': {
@@ -634,10 +689,10 @@ def admin_get_all_transactions():
                     'username': user.username,
                     'email': user.email
                 } if user else None,
-                'wallet_currency': wallet.currency if wallet else transaction.currency,
+                'wallet_currency': wallet_currency,
                 'transaction_type': transaction.transaction_type,
-                'amount': float(transaction.amount),
-                'fee': float(transaction.fee) if transaction.fee else 0,
+                'amount': to_float(transaction.amount, transaction.currency),
+                'fee': to_float(transaction.fee, transaction.currency),
                 'to_address': transaction.to_address,
                 'from_address': transaction.from_address,
                 'tx_hash': transaction.tx_hash,
@@ -650,15 +705,15 @@ def admin_get_all_transactions():
             'message': 'Transactions retrieved successfully',
             'transactions': transactions_data,
             'pagination': {
-                'page': page,
-                'per_page': per_page,
+                'per_page': transactions.limit,
                 'total': transactions.total,
-                'pages': transactions.pages,
-                'has_next': transactions.has_next,
-                'has_prev': transactions.has_prev
+                'next_cursor': transactions.next_cursor,
+                'has_next': transactions.has_next
             }
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error retrieving transactions: {str(e)}'}), 500
 
@@ -670,16 +725,21 @@ def admin_send_crypto_to_user():
         data = request.json
         username = data.get('username')
         currency = data.get('currency', '').upper()
-        amount = float(data.get('amount', 0))
+        try:
+            amount = parse_amount(data.get('amount', 0), currency)
+        except ValueError:
+            amount = None
         note = data.get('note', 'Admin transfer')
         
-        if not username or not currency or amount <= 0:
+        if not username or not currency or amount is None:
             return jsonify({'message': 'Username, currency, and amount are required'}), 400
         
         if currency not in ['BTC', 'USDT', 'ETH']:
             return jsonify({'message': 'Unsupported currency. Use BTC, USDT, or ETH'}), 400
         
         # Find user by username
+        if not shard_router.route_username(username):
+            return jsonify({'message': f'User {username} not found'}), 404
         user = User.query.filter_by(username=username).first()
         if not user:
             return jsonify({'message': f'User {username} not found'}), 404
@@ -703,13 +763,13 @@ def admin_send_crypto_to_user():
                 currency=currency,
                 address=address,
                 private_key=private_key,
-                balance=0.0
+                balance=0
             )
             db.session.add(wallet)
         
         # Add amount to wallet
-        old_balance = float(wallet.balance)
-        wallet.balance = float(wallet.balance) + amount
+        new_balance = credit(wallet, amount)
+        old_balance = new_balance - amount
         
         # Create transaction record
         transaction = Transaction(
@@ -718,14 +778,14 @@ def admin_send_crypto_to_user():
             transaction_type='receive',
             currency=currency,
             amount=amount,
-            fee=0.0,
+            fee=0,
             to_address=wallet.address,
             from_address='ADMIN_SEND',
-            tx_hash=f"admin_send_{secrets.token_hex(32)}",
+            tx_hash=new_tx_hash('admin_send_'),
             block_number=secrets.randbelow(1000000) + 800000,
             block_hash=f"0x{secrets.token_hex(32)}",
             gas_used=21000 if currency in ['ETH', 'USDT'] else None,
-            gas_price=20000000000 if currency in ['ETH', 'USDT'] else None,
+            gas_price=20 if currency in ['ETH', 'USDT'] else None,
             contract_address='0xa0b86a33e6ba3b936f1e5b6b7b8b5c6d8e9f0a1b' if currency == 'USDT' else None,
             status='confirmed',
             created_at=datetime.utcnow(),
@@ -733,19 +793,18 @@ def admin_send_crypto_to_user():
         )
         
         db.session.add(transaction)
-        db.session.commit()
         
         return jsonify({
-            'message': f'Successfully sent {amount} {currency} to {username}',
+            'message': f'Successfully sent {format_amount(amount, currency)} {currency} to {username}',
             'recipient': {
                 'username': user.username,
                 'email': user.email
             },
             'transfer_details': {
                 'currency': currency,
-                'amount': amount,
-                'old_balance': old_balance,
-                'new_balance': float(wallet.balance),
+                'amount': to_float(amount, currency),
+                'old_balance': to_float(old_balance, currency),
+                'new_balance': to_float(new_balance, currency),
                 'wallet_address': wallet.address,
                 'note': note
             },
@@ -760,7 +819,6 @@ def admin_send_crypto_to_user():
     except ValueError:
         return jsonify({'message': 'Invalid amount format'}), 400
     except Exception as e:
-        db.session.rollback()
         return jsonify({'message': f'Error sending crypto: {str(e)}'}), 500
 
 @user_bp.route('/admin/stats', methods=['GET'])
@@ -768,46 +826,37 @@ def admin_send_crypto_to_user():
 def admin_get_stats():
     """Get admin dashboard statistics"""
     try:
-        total_users = User.query.count()
-        verified_users = User.query.filter_by(is_verified=True).count()
-        total_wallets = Wallet.query.count()
-        total_transactions = Transaction.query.count()
-        
-        # Get wallet balances by currency
-        wallet_stats = db.session.query(
-            Wallet.currency,
-            db.func.count(Wallet.id).label('wallet_count'),
-            db.func.sum(Wallet.balance).label('total_balance')
-        ).group_by(Wallet.currency).all()
+        # Maintained running totals instead of COUNT/SUM scans
+        counters = dashboard_counters.snapshot()
+        total_users = counters.get('users', 0)
+        verified_users = counters.get('users:verified', 0)
+        total_wallets = counters.get('wallets', 0)
+        total_transactions = counters.get('transactions', 0)
         
         currency_stats = []
-        for stat in wallet_stats:
-            currency_stats.append({
-                'currency': stat.currency,
-                'wallet_count': stat.wallet_count,
-                'total_balance': float(stat.total_balance) if stat.total_balance else 0
-            })
+        for name in sorted(counters):
+            if name.startswith('wallets:') and counters[name]:
+                currency = name.split(':', 1)[1]
+                currency_stats.append({
+                    'currency': currency,
+                    'wallet_count': counters[name],
+                    'total_balance': to_float(counters.get(f'balance:{currency}'), currency)
+                })
         
         # Recent transactions
-        recent_transactions = Transaction.query.order_by(
-            Transaction.created_at.desc()
-        ).limit(10).all()
+        recent_transactions = shard_router.merge(
+            _admin_transaction_query().order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(10),
+            key=lambda row: (row[0].created_at, row[0].id), limit=10, reverse=True
+        )
         
         recent_tx_data = []
-        for tx in recent_transactions:
-            user = User.query.get(tx.user_id)
-            wallet = None
-            if tx.to_wallet_id:
-                wallet = Wallet.query.get(tx.to_wallet_id)
-            elif tx.from_wallet_id:
-                wallet = Wallet.query.get(tx.from_wallet_id)
-            
+        for tx, user, wallet_currency in recent_transactions:
             recent_tx_data.append({
                 'id': tx.id,
                 'username': user.username if user else 'Unknown',
-                'currency': wallet.currency if wallet else tx.currency,
+                'currency': wallet_currency,
                 'type': tx.transaction_type,
-                'amount': float(tx.amount),
+                'amount': to_float(tx.amount, tx.currency),
                 'status': tx.status,
                 'created_at': tx.created_at.isoformat() if tx.created_at else None
             })
@@ -0,0 +1,270 @@
+"""
+Buffered admin audit log.
+
+Durable entries (money movement, account state changes) are added to the
+request's session and commit with the rest of its unit of work. Everything else is queued
+in-process and written in batches by a background thread with one
+executemany INSERT, so read-only admin pages no longer pay a write
+transaction per view.
+
+The queue is bounded. When it is full, producers wait up to
+AUDIT_LOG_ENQUEUE_TIMEOUT for room and then write the entry synchronously
+rather than drop it; the counters returned by metrics() show how often that
+happens.
+
+Each queued entry remembers the app that recorded it and is written to
+that app's database. A batch that still fails after three attempts is
+appended to AUDIT_LOG_SPILL_PATH as JSON lines, and the next successful
+write to the same database replays the file. Entries carry a unique
+event_id, so a retry of a batch whose commit did land writes nothing twice.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, has_app_context, has_request_context
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import AdminAction, db
+from src.services.background import BackgroundThread
+from src.utils.ids import new_ulid
+
+
+class AuditLog:
+    """Flask extension that records AdminAction rows synchronously or in batches"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = 'async'
+        self.batch_size = 200
+        self.flush_interval = 0.5
+        self.enqueue_timeout = 0.05
+
+        self._queue = queue.Queue(maxsize=10000)
+        self._write_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._writer = BackgroundThread(self._run_writer, 'audit-log-writer')
+        self._stop = threading.Event()
+        self._counters = dict.fromkeys([
+            'enqueued', 'written', 'batches', 'sync_writes', 'backpressure_waits',
+            'overflow_writes', 'already_written', 'spilled', 'replayed', 'failed', 'max_queue_depth'
+        ], 0)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_LOG_MODE', 'async')
+        app.config.setdefault('AUDIT_LOG_QUEUE_SIZE', 10000)
+        app.config.setdefault('AUDIT_LOG_BATCH_SIZE', 200)
+        app.config.setdefault('AUDIT_LOG_FLUSH_INTERVAL', 0.5)
+        app.config.setdefault('AUDIT_LOG_ENQUEUE_TIMEOUT', 0.05)
+        app.config.setdefault('AUDIT_LOG_SPILL_PATH', os.path.join(app.root_path, 'database', 'audit_spill.jsonl'))
+
+        # Entries queued for an app initialised earlier still go to its database
+        self.flush()
+        self.app = app
+        self.mode = app.config['AUDIT_LOG_MODE']
+        self.batch_size = app.config['AUDIT_LOG_BATCH_SIZE']
+        self.flush_interval = app.config['AUDIT_LOG_FLUSH_INTERVAL']
+        self.enqueue_timeout = app.config['AUDIT_LOG_ENQUEUE_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['AUDIT_LOG_QUEUE_SIZE'])
+        app.extensions['audit_log'] = self
+        atexit.register(self.flush)
+
+    def record(self, admin_id, action_type, target_user_id=None, action_details=None, durable=False, session=None):
+        """Record an admin action; durable entries commit with the request's unit of work"""
+        entry = {
+            'admin_id': admin_id,
+            'action_type': action_type,
+            'target_user_id': target_user_id,
+            'action_details': action_details,
+            'event_id': new_ulid(),
+            'created_at': datetime.utcnow()
+        }
+
+        if session is not None:
+            # Part of a unit of work the caller commits (e.g. a group commit)
+            self._count('sync_writes')
+            session.add(AdminAction(**entry))
+            return
+
+        app = current_app._get_current_object() if has_app_context() else self.app
+        # An app that never set up the audit log has no queue settings to honour
+        if durable or self.mode == 'sync' or app is None or 'audit_log' not in app.extensions:
+            self._count('sync_writes')
+            db.session.add(AdminAction(**entry))
+            if not has_request_context():
+                # No request to commit it for us (scripts, background jobs)
+                db.session.commit()
+            return
+
+        item = (app, entry)
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count('backpressure_waits')
+            try:
+                self._queue.put(item, timeout=self.enqueue_timeout)
+            except queue.Full:
+                # Never drop an audit entry; pay for a synchronous write instead
+                self._count('overflow_writes')
+                self._write([item])
+                return
+
+        self._count('enqueued')
+        depth = self._queue.qsize()
+        with self._counter_lock:
+            if depth > self._counters['max_queue_depth']:
+                self._counters['max_queue_depth'] = depth
+
+    def flush(self, timeout=5):
+        """Write every queued entry now; returns once they are committed"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._write_lock:
+                batch = self._drain()
+                if batch:
+                    self._write(batch)
+                    self._done(batch)
+                    continue
+            # The writer may hold a batch it has taken but not yet written
+            if not self._queue.unfinished_tasks or time.monotonic() > deadline:
+                return
+            time.sleep(0.005)
+
+    def metrics(self):
+        with self._counter_lock:
+            counters = dict(self._counters)
+        counters['queue_depth'] = self._queue.qsize()
+        counters['queue_capacity'] = self._queue.maxsize
+        counters['mode'] = self.mode
+        return counters
+
+    def stop(self):
+        """Stop the background writer after flushing what is queued"""
+        self._stop.set()
+        self.flush()
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self._counters[name] += amount
+
+    def _ensure_writer(self):
+        if not self._stop.is_set():
+            self._writer.ensure_started()
+
+    def _run_writer(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            with self._write_lock:
+                batch = [first] + self._drain(self.batch_size - 1)
+                self._write(batch)
+                self._done(batch)
+
+    def _drain(self, limit=None):
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _done(self, batch):
+        for _ in batch:
+            self._queue.task_done()
+
+    def _write(self, batch):
+        """Write (app, entry) pairs, each to its own app's database"""
+        by_app = {}
+        for app, entry in batch:
+            by_app.setdefault(app, []).append(entry)
+        for app, entries in by_app.items():
+            if self._insert_with_retries(app, entries):
+                self._count('written', len(entries))
+                self._count('batches')
+                self._replay_spill(app)
+            else:
+                self._spill(app, entries)
+
+    def _insert_with_retries(self, app, entries):
+        error = None
+        for attempt in range(3):
+            try:
+                self._insert(app, entries)
+                return True
+            except Exception as e:
+                error = e
+                time.sleep(0.1 * (attempt + 1))
+        app.logger.error('Failed to write %d audit log entries', len(entries), exc_info=error)
+        return False
+
+    def _insert(self, app, entries):
+        with app.app_context():
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(AdminAction.__table__.insert(), entries)
+            except IntegrityError:
+                # An earlier attempt may have committed before it failed:
+                # its entries are already written, so insert only the rest
+                with db.engine.begin() as conn:
+                    written = set(conn.execute(select(AdminAction.event_id).where(
+                        AdminAction.event_id.in_([entry['event_id'] for entry in entries])
+                    )).scalars())
+                    if not written:
+                        raise
+                    self._count('already_written', len(written))
+                    missing = [entry for entry in entries if entry['event_id'] not in written]
+                    if missing:
+                        conn.execute(AdminAction.__table__.insert(), missing)
+
+    def _spill(self, app, entries):
+        """Keep entries the database refused on disk until it takes them again"""
+        path = app.config['AUDIT_LOG_SPILL_PATH']
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'a') as spill:
+                    for entry in entries:
+                        spill.write(json.dumps(dict(entry, created_at=entry['created_at'].isoformat()), default=str) + '\n')
+            self._count('spilled', len(entries))
+            app.logger.warning('Spilled %d audit log entries to %s', len(entries), path)
+        except OSError:
+            self._count('failed', len(entries))
+            app.logger.exception('Failed to spill %d audit log entries', len(entries))
+
+    def _replay_spill(self, app):
+        path = app.config['AUDIT_LOG_SPILL_PATH']
+        if not os.path.exists(path):
+            return
+        with self._spill_lock:
+            try:
+                with open(path) as spill:
+                    entries = [json.loads(line) for line in spill if line.strip()]
+                for entry in entries:
+                    entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+                for start in range(0, len(entries), self.batch_size):
+                    self._insert(app, entries[start:start + self.batch_size])
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            except Exception:
+                # Kept for the next successful write to try again
+                app.logger.exception('Failed to replay spilled audit log entries from %s', path)
+                return
+        self._count('replayed', len(entries))
+
+
+audit_log = AuditLog()
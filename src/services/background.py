@@ -0,0 +1,55 @@
+"""
+Lazily started background threads.
+
+Services start their worker threads on first use rather than in init_app(),
+so a pre-fork server's master starts none. Threads do not survive a fork
+anyway: a BackgroundThread runs at most one thread per process, and a
+forked child, or a process whose thread has died, starts a new one on its
+next ensure_started().
+"""
+
+import os
+import threading
+import weakref
+
+
+class BackgroundThread:
+    """A named daemon thread running target, started once per process"""
+
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        _instances.add(self)
+
+    def ensure_started(self):
+        """Start the thread unless this process is already running it"""
+        if self.is_alive():
+            return
+        with self._lock:
+            if self.is_alive():
+                return
+            self._thread = threading.Thread(target=self.target, name=self.name, daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def is_alive(self):
+        return self._pid == os.getpid() and self._thread.is_alive()
+
+    def _after_fork(self):
+        # The parent may have held the lock at the moment of the fork
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+
+def _reset_after_fork():
+    for instance in list(_instances):
+        instance._after_fork()
+
+
+_instances = weakref.WeakSet()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
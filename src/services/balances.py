@@ -0,0 +1,61 @@
+"""
+Wallet balance mutations.
+
+Every change to Wallet.balance goes through debit() or credit(). Each is a
+single conditional UPDATE evaluated by the database, so concurrent requests
+cannot lose updates and a debit never takes a balance below zero. There is
+no read-check-write window in Python and no lock held across a request.
+Amounts are integer minor units (see src.utils.money).
+"""
+
+from sqlalchemy import inspect, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.models.user import Wallet, db
+from src.services.dashboard_counters import dashboard_counters
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def debit(wallet, units, session=None):
+    """Subtract units from wallet if it can cover them; returns the new balance"""
+    session = session or db.session
+    result = session.execute(
+        update(Wallet)
+        .where(Wallet.id == wallet.id, Wallet.balance >= units)
+        .values(balance=Wallet.balance - units)
+        .returning(Wallet.balance)
+        .execution_options(synchronize_session=False)
+    )
+    balance = result.scalar_one_or_none()
+    if balance is None:
+        raise InsufficientBalance(f'Insufficient {wallet.currency} balance')
+    dashboard_counters.add(dashboard_counters.connection(session), {f'balance:{wallet.currency}': -units})
+    return _refresh(session, wallet, balance)
+
+
+def credit(wallet, units, session=None):
+    """Add units to wallet; returns the new balance"""
+    session = session or db.session
+    if wallet.id is None:
+        session.flush()
+    result = session.execute(
+        update(Wallet)
+        .where(Wallet.id == wallet.id)
+        .values(balance=Wallet.balance + units)
+        .returning(Wallet.balance)
+        .execution_options(synchronize_session=False)
+    )
+    dashboard_counters.add(dashboard_counters.connection(session), {f'balance:{wallet.currency}': units})
+    return _refresh(session, wallet, result.scalar_one())
+
+
+def _refresh(session, wallet, balance):
+    # Keep the in-session object in step with the row without another SELECT.
+    # A wallet loaded by another session (group commit) is left alone; its
+    # owner thread must not see a value that may still be rolled back.
+    if inspect(wallet).session is session:
+        set_committed_value(wallet, 'balance', balance)
+    return balance
@@ -0,0 +1,232 @@
+"""
+Content-addressed blob storage for images and documents.
+
+Bytes are stored once under their SHA-256 digest by a pluggable backend;
+the database only keeps the digest and a Blob metadata row. The local
+backend shards files as <root>/ab/cd/<digest> so no directory grows large.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import send_file
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.models.user import Blob, db
+
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+_DATA_URL = re.compile(r'^data:[\w.+/-]*(?:;[\w=.+-]+)*;base64,')
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+# Dialect inserts that can skip a digest already recorded
+_inserts = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+# Leading bytes of the formats clients upload
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+]
+
+
+def decode_base64_image(value):
+    """Decode a base64 string, optionally wrapped in a data: URL, into bytes"""
+    match = _DATA_URL.match(value)
+    if match:
+        value = value[match.end():]
+    try:
+        data = base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError('Invalid base64 image data')
+    if not data:
+        raise ValueError('Invalid base64 image data')
+    return data
+
+
+def guess_content_type(data):
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return DEFAULT_CONTENT_TYPE
+
+
+class LocalBlobWriter:
+    """Streams one blob to a temp file, hashing it incrementally as chunks arrive"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.size = 0
+        self.head = b''
+        self._hash = hashlib.sha256()
+        os.makedirs(backend.tmp_dir, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=backend.tmp_dir)
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        if len(self.head) < 16:
+            self.head += chunk[:16 - len(self.head)]
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        """Make the blob visible under its digest; returns the digest"""
+        digest = self._hash.hexdigest()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if self.backend.exists(digest):
+            os.remove(self._tmp_path)
+        else:
+            self.backend._commit(self._tmp_path, digest)
+        return digest
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class LocalBlobBackend:
+    """Stores blobs as files in sharded directories under root"""
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def local_path(self, digest):
+        if not _DIGEST.match(digest):
+            raise ValueError('Invalid blob digest')
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.local_path(digest))
+
+    def put(self, data):
+        """Write data unless an identical blob is already stored; returns its digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.exists(digest):
+            return digest
+
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            self._commit(tmp_path, digest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def writer(self):
+        return LocalBlobWriter(self)
+
+    def open(self, digest):
+        return open(self.local_path(digest), 'rb')
+
+    def delete(self, digest):
+        try:
+            os.remove(self.local_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _commit(self, tmp_path, digest):
+        path = self.local_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomic rename: readers never see a partially written blob
+        os.replace(tmp_path, path)
+
+
+class BlobStorage:
+    """Flask extension wiring the configured backend to Blob metadata rows"""
+
+    backends = {
+        'local': LocalBlobBackend,
+    }
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BLOB_STORAGE_BACKEND', 'local')
+        app.config.setdefault('BLOB_STORAGE_PATH', os.path.join(app.root_path, 'database', 'blobs'))
+
+        backend_class = self.backends[app.config['BLOB_STORAGE_BACKEND']]
+        self.backend = backend_class(app.config['BLOB_STORAGE_PATH'])
+        app.extensions['blob_storage'] = self
+
+    def store(self, data):
+        """Store raw bytes and stage their Blob row on the session; returns the digest"""
+        digest = self.backend.put(data)
+        # The type is sniffed from the bytes, never taken from the client
+        self._record(digest, len(data), guess_content_type(data))
+        return digest
+
+    def writer(self):
+        """Open a streaming writer; finish it with commit_writer() or writer.abort()"""
+        return self.backend.writer()
+
+    def commit_writer(self, writer):
+        """Commit a streamed blob and stage its Blob row; returns the digest, or None if empty"""
+        if writer.size == 0:
+            writer.abort()
+            return None
+        digest = writer.commit()
+        self._record(digest, writer.size, guess_content_type(writer.head))
+        return digest
+
+    def store_base64(self, value):
+        """Store a base64 string (optionally a data: URL) sent by older clients"""
+        if not value:
+            return None
+        return self.store(decode_base64_image(value))
+
+    def send(self, digest):
+        """Stream a blob with ETag and Range support"""
+        blob = db.session.get(Blob, digest)
+        if blob is None or not self.backend.exists(digest):
+            return {'message': 'File not found'}, 404
+
+        local_path = getattr(self.backend, 'local_path', None)
+        source = local_path(digest) if local_path else self.backend.open(digest)
+        response = send_file(
+            source,
+            mimetype=blob.content_type,
+            conditional=True,
+            etag=digest,
+            max_age=0
+        )
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+
+    def _record(self, digest, size, content_type):
+        # Concurrent uploads of the same bytes race to insert one digest;
+        # the loser's row is skipped instead of failing its request
+        insert = _inserts[db.session.get_bind(Blob).dialect.name]
+        db.session.execute(
+            insert(Blob).values(digest=digest, size=size, content_type=content_type)
+            .on_conflict_do_nothing(index_elements=['digest'])
+        )
+
+
+blob_storage = BlobStorage()
@@ -0,0 +1,243 @@
+"""
+Incrementally maintained admin dashboard counters.
+
+User, wallet, balance and transaction totals live in the dashboard_counter
+table and are adjusted in the same transaction as the change that moves
+them: a session hook turns each flush of User, Wallet and Transaction rows
+into counter deltas, and the balance engine reports the balance changes it
+makes with Core UPDATEs. The dashboards then read a handful of rows instead
+of scanning user, wallet and transaction.
+
+Each counter is split over a few shard rows and writers pick one at random,
+so concurrent writers do not all queue on a single hot row. Writes that
+bypass the ORM and the balance engine (raw SQL, bulk loads) are not seen,
+so reconcile() periodically recomputes every counter from the source
+tables.
+
+With sharded user data (src.services.shards) each shard keeps the
+counters for its own rows, reconcile() recounts each shard separately and
+snapshot() sums the shards.
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.models.user import DashboardCounter, Transaction, User, Wallet, db
+from src.services.background import BackgroundThread
+from src.services.shards import shard_router
+
+RECONCILED = '_reconciled_at'
+
+_upserts = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+class Counters:
+    """One app's counter settings and reconciler thread; stored as app.extensions['dashboard_counters']"""
+
+    def __init__(self, app):
+        self.app = app
+        self.shards = app.config['DASHBOARD_COUNTER_SHARDS']
+        self.reconcile_interval = app.config['DASHBOARD_RECONCILE_INTERVAL']
+        self._reconciler = BackgroundThread(self._run_reconciler, 'dashboard-reconciler')
+        self._stop = threading.Event()
+
+    def ensure_reconciler(self):
+        if self.reconcile_interval and not self._stop.is_set():
+            self._reconciler.ensure_started()
+
+    def stop(self):
+        """Stop the background reconciler thread"""
+        self._stop.set()
+
+    def _run_reconciler(self):
+        while not self._stop.wait(self.reconcile_interval):
+            try:
+                with self.app.app_context():
+                    drift = dashboard_counters.reconcile()
+                if drift:
+                    self.app.logger.warning('Dashboard counters drifted: %s', drift)
+            except Exception:
+                self.app.logger.exception('Dashboard counter reconciliation failed')
+
+
+class DashboardCounters:
+    """Flask extension maintaining and reading the dashboard_counter table"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DASHBOARD_COUNTER_SHARDS', 8)
+        app.config.setdefault('DASHBOARD_RECONCILE_INTERVAL', 3600)
+
+        # Per app, so each app's reconciler recounts its own database
+        app.extensions['dashboard_counters'] = Counters(app)
+
+        if not event.contains(Session, 'after_flush', _count_flushed_changes):
+            event.listen(Session, 'after_flush', _count_flushed_changes)
+
+    def add(self, connection, deltas):
+        """Apply {name: delta} to the counters inside connection's transaction"""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        insert = _upserts[connection.dialect.name]
+        counters = self._counters()
+        shard = random.randrange(counters.shards) if counters is not None else 0
+        # Sorted so concurrent writers take row locks in the same order
+        for name in sorted(deltas):
+            statement = insert(DashboardCounter.__table__).values(name=name, shard=shard, value=deltas[name])
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=['name', 'shard'],
+                set_={'value': DashboardCounter.__table__.c.value + statement.excluded.value}
+            ))
+
+    def connection(self, session):
+        """The connection in session's transaction that holds the counters"""
+        return session.connection(bind_arguments={'mapper': DashboardCounter})
+
+    def snapshot(self):
+        """Current value of every counter; reconciles first if they were never built"""
+        counters = self._counters()
+        if counters is not None:
+            counters.ensure_reconciler()
+        parts = shard_router.scatter(self._read)
+        if any(RECONCILED not in part for part in parts):
+            self.reconcile()
+            parts = shard_router.scatter(self._read)
+        if len(parts) == 1:
+            return parts[0]
+        values = Counter()
+        for part in parts:
+            values.update(part)
+        values[RECONCILED] = min(part[RECONCILED] for part in parts)
+        return dict(values)
+
+    def reconcile(self):
+        """Rebuild every counter from the source tables; returns {name: drift} for counters that were off"""
+        drift = Counter()
+        for engine in shard_router.engines():
+            with engine.begin() as conn:
+                # Deleting first takes the write lock, so no increment can land
+                # between the recount and the rewrite
+                before = _sum_shards(conn.execute(
+                    delete(DashboardCounter).returning(DashboardCounter.name, DashboardCounter.value)
+                ))
+                actual = _recount(conn)
+                actual[RECONCILED] = int(time.time())
+                conn.execute(DashboardCounter.__table__.insert(), [
+                    {'name': name, 'shard': 0, 'value': value} for name, value in actual.items()
+                ])
+
+            for name in set(actual) | set(before):
+                if name != RECONCILED:
+                    drift[name] += actual.get(name, 0) - before.get(name, 0)
+
+        return {name: value for name, value in drift.items() if value}
+
+    def _counters(self):
+        return current_app.extensions.get('dashboard_counters') if has_app_context() else None
+
+    def _read(self):
+        rows = db.session.execute(
+            select(DashboardCounter.name, func.sum(DashboardCounter.value)).group_by(DashboardCounter.name)
+        )
+        return _sum_shards(rows)
+
+
+
+def _sum_shards(rows):
+    totals = Counter()
+    for name, value in rows:
+        totals[name] += int(value or 0)
+    return dict(totals)
+
+
+def _recount(conn):
+    counts = Counter()
+
+    users = conn.execute(select(
+        func.count(User.id),
+        func.count().filter(User.is_blocked == True),
+        func.count().filter(User.is_verified == True)
+    )).one()
+    counts['users'], counts['users:blocked'], counts['users:verified'] = users
+
+    for currency, wallets, balance in conn.execute(
+        select(Wallet.currency, func.count(Wallet.id), func.sum(Wallet.balance)).group_by(Wallet.currency)
+    ):
+        counts['wallets'] += wallets
+        counts[f'wallets:{currency}'] = wallets
+        counts[f'balance:{currency}'] = int(balance or 0)
+
+    for status, transactions in conn.execute(
+        select(Transaction.status, func.count(Transaction.id)).group_by(Transaction.status)
+    ):
+        counts['transactions'] += transactions
+        counts[f'transactions:{status}'] = transactions
+
+    return counts
+
+
+def _tracked(obj, sign, deltas):
+    """Add (sign=1) or remove (sign=-1) obj's contribution to the counters"""
+    if isinstance(obj, User):
+        deltas['users'] += sign
+        deltas['users:blocked'] += sign * bool(obj.is_blocked)
+        deltas['users:verified'] += sign * bool(obj.is_verified)
+    elif isinstance(obj, Wallet):
+        deltas['wallets'] += sign
+        deltas[f'wallets:{obj.currency}'] += sign
+        deltas[f'balance:{obj.currency}'] += sign * int(obj.balance or 0)
+    elif isinstance(obj, Transaction):
+        deltas['transactions'] += sign
+        deltas[f'transactions:{obj.status}'] += sign
+
+
+def _changed(obj, attributes):
+    """Yield (old, new) for each attribute changed in this flush"""
+    state = inspect(obj)
+    for name in attributes:
+        history = state.attrs[name].history
+        if history.added or history.deleted:
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            yield name, old, new
+
+
+def _count_flushed_changes(session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        _tracked(obj, 1, deltas)
+    for obj in session.deleted:
+        _tracked(obj, -1, deltas)
+
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            for name, old, new in _changed(obj, ['is_blocked', 'is_verified']):
+                deltas[f'users:{name[3:]}'] += bool(new) - bool(old)
+        elif isinstance(obj, Wallet):
+            for name, old, new in _changed(obj, ['balance']):
+                deltas[f'balance:{obj.currency}'] += int(new or 0) - int(old or 0)
+        elif isinstance(obj, Transaction):
+            for name, old, new in _changed(obj, ['status']):
+                deltas[f'transactions:{old}'] -= 1
+                deltas[f'transactions:{new}'] += 1
+
+    if deltas:
+        dashboard_counters.add(dashboard_counters.connection(session), deltas)
+
+
+dashboard_counters = DashboardCounters()
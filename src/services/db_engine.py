@@ -0,0 +1,381 @@
+"""
+Managed database engines.
+
+Wraps db.init_app() to give the app a production profile instead of
+SQLAlchemy's defaults:
+
+- Pool sizes and timeouts come from config. SQLite has a single writer,
+  so the write pool is kept small and extra writers queue for a pooled
+  connection rather than spin on the database lock.
+- A file-backed SQLite database gets per-connection pragmas: WAL, so
+  readers and the writer stop blocking each other, plus synchronous=NORMAL,
+  busy_timeout, mmap_size and cache_size. The pragmas are read back by
+  init_db() and by each process's first request, which fails if SQLite
+  did not apply them. Building the app never connects.
+- Pooled connections do not cross a fork: a forked child (a pre-fork
+  worker) discards the pools it inherited and opens its own.
+- A separate read-only engine ('readonly', query_only=ON) with its own
+  pool serves SELECTs issued by GET and HEAD requests.
+
+Replicas
+--------
+DATABASE_REPLICAS lists read engines (Postgres standbys, or SQLite file
+copies for local testing). They become read engines 'replica0',
+'replica1', and so on. GET/HEAD reads go to a replica whose lag is within
+DATABASE_REPLICA_MAX_LAG seconds. The lag is measured by a monitor thread:
+it rewrites a heartbeat row on the primary and reads each replica's copy
+of it. With no replica in bounds, reads fall back to the local read pool.
+
+Writes always go to the primary, and so do reads run with the PRIMARY
+execution option (the auth decorators' principal loads, so a block takes
+effect at once). A request reads from the primary once its
+session has written, and so does every request from the same client
+(Authorization header, else remote address) for DATABASE_REPLICA_MAX_LAG
+seconds after a successful write request. A client therefore reads its own
+writes even from a lagging replica. The pin lives in process memory: with
+several workers, a client's next request may land on a worker that has
+not seen its write.
+
+Every app built by the factory keeps its own engines, lag readings and
+pins in app.extensions['db_engine'], and requests are routed through the
+current app's.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import partial
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import create_engine, event, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from src.models.user import ReplicationHeartbeat, db
+from src.services.background import BackgroundThread
+from src.services.unit_of_work import WROTE
+
+READ_ONLY = 'readonly'
+
+REPLICA = 'replica{}'
+
+READ_METHODS = {'GET', 'HEAD'}
+
+# Session.info key holding the engine a request reads from
+READ_ENGINE = 'db_engine_read_engine'
+
+# Execution option keeping a read on the primary, e.g. auth checks that
+# must see a block the moment it commits
+PRIMARY = 'db_engine_primary'
+
+# SQLite reports synchronous as a number
+_SYNCHRONOUS_LEVELS = {'off': 0, 'normal': 1, 'full': 2, 'extra': 3}
+
+
+class Engines:
+    """One app's engines, replica lag and read-your-writes pins; stored as app.extensions['db_engine']"""
+
+    def __init__(self, app):
+        self.app = app
+        self.max_lag = app.config['DATABASE_REPLICA_MAX_LAG']
+        self.check_interval = app.config['DATABASE_REPLICA_CHECK_INTERVAL']
+        self.pin_capacity = app.config['DATABASE_REPLICA_PIN_CAPACITY']
+        self._lags = {}
+        self._healthy = []
+        self._pins = OrderedDict()
+        self._lock = threading.Lock()
+        self._monitor = BackgroundThread(self._run_monitor, 'replica-monitor')
+        self._stop = threading.Event()
+        self._verified_pid = None
+
+        # Read engines are not Flask-SQLAlchemy binds: they hold no tables
+        # of their own and must stay out of db.create_all()
+        with app.app_context():
+            self.primary = db.engine
+        self.read_engines = {}
+        if _sqlite_file(self.primary.url) and app.config['DATABASE_READ_POOL']:
+            # The primary's URL, after Flask-SQLAlchemy resolved relative paths
+            self.read_engines[READ_ONLY] = self._read_engine(self.primary.url)
+        self.replicas = []
+        for index, replica_uri in enumerate(app.config['DATABASE_REPLICAS']):
+            key = REPLICA.format(index)
+            self.read_engines[key] = self._read_engine(make_url(replica_uri))
+            self.replicas.append(key)
+
+        for key, engine in self.engines().items():
+            if _sqlite_file(engine.url):
+                event.listen(engine, 'connect', partial(
+                    apply_sqlite_pragmas, config=app.config, read_only=key is not None
+                ))
+        _instances.add(self)
+
+    def verify(self):
+        """Check every SQLite engine's connections carry the configured pragmas; raises RuntimeError"""
+        problems = []
+        # The write engine first: its connection is the one that switches
+        # the file to WAL
+        for key, engine in self.engines().items():
+            problems += check_sqlite_profile(engine, self.app.config, key or 'default', read_only=key is not None)
+        for index, engine in enumerate(self._shard_engines()):
+            problems += check_sqlite_profile(engine, self.app.config, f'shard{index}')
+        if problems:
+            raise RuntimeError('SQLite profile not applied: ' + '; '.join(problems))
+        self._verified_pid = os.getpid()
+
+    def dispose(self, close=True):
+        """Empty every pool, shards included; close=False drops connections a forked child inherited"""
+        for engine in [*self.engines().values(), *self._shard_engines()]:
+            if engine is not None:
+                engine.dispose(close=close)
+
+    def read_engine(self):
+        """Engine for the current request's reads: a replica in bounds, else the local read pool"""
+        if self.replicas and not self._pinned(_client_key()):
+            self._ensure_monitor()
+            healthy = self._healthy
+            if healthy:
+                return self.read_engines[random.choice(healthy)]
+        return self.read_engines.get(READ_ONLY)
+
+    def engines(self):
+        """Every engine this app uses: the primary under None, then the read engines"""
+        return {None: self.primary, **self.read_engines}
+
+    def check_replicas(self):
+        """Beat the primary's heartbeat and measure every replica's lag; returns {name: lag seconds}"""
+        now = self.beat()
+        lags = {}
+        for key in self.replicas:
+            try:
+                with self.read_engines[key].connect() as conn:
+                    beat_at = conn.execute(
+                        select(ReplicationHeartbeat.beat_at).where(ReplicationHeartbeat.id == 1)
+                    ).scalar()
+                lags[key] = now - beat_at if beat_at is not None else float('inf')
+            except Exception:
+                self.app.logger.warning('Replica %s is unreachable', key, exc_info=True)
+                lags[key] = float('inf')
+
+        with self._lock:
+            self._lags = lags
+            self._healthy = [key for key in self.replicas if lags[key] <= self.max_lag]
+        return lags
+
+    def beat(self):
+        """Write the current time to the primary's heartbeat row; returns it"""
+        now = time.time()
+        with self.primary.begin() as conn:
+            beat = conn.execute(update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == 1).values(beat_at=now))
+            if not beat.rowcount:
+                conn.execute(ReplicationHeartbeat.__table__.insert().values(id=1, beat_at=now))
+        return now
+
+    def replica_status(self):
+        with self._lock:
+            return {key: {'lag': self._lags.get(key), 'healthy': key in self._healthy} for key in self.replicas}
+
+    def pool_status(self):
+        """Pool occupancy of each engine, keyed by name"""
+        return {key or 'default': engine.pool.status() for key, engine in self.engines().items()}
+
+    def stop(self):
+        """Stop the replica monitor thread"""
+        self._stop.set()
+
+    def _read_engine(self, url):
+        options = {}
+        if not _in_memory(url):
+            options['pool_size'] = self.app.config['DATABASE_READ_POOL_SIZE']
+            options['max_overflow'] = self.app.config['DATABASE_READ_MAX_OVERFLOW']
+            options['pool_timeout'] = self.app.config['DATABASE_POOL_TIMEOUT']
+        if url.get_backend_name() == 'postgresql':
+            options['connect_args'] = {'options': '-c default_transaction_read_only=on'}
+        return create_engine(url, echo=self.app.config.get('SQLALCHEMY_ECHO', False), **options)
+
+    def _shard_engines(self):
+        shards = self.app.extensions.get('shard_router')
+        return shards.engines if shards is not None else []
+
+    def _verify_once(self):
+        # The first request in each process checks its own connections
+        if self._verified_pid != os.getpid():
+            self.verify()
+
+    def _pin_writers(self, response):
+        # A successful write pins its client to the primary until any
+        # replica within bounds has caught up with it
+        if self.replicas and request.method not in READ_METHODS and response.status_code < 400:
+            key = _client_key()
+            with self._lock:
+                self._pins[key] = time.monotonic() + self.max_lag
+                self._pins.move_to_end(key)
+                while len(self._pins) > self.pin_capacity:
+                    self._pins.popitem(last=False)
+        return response
+
+    def _pinned(self, key):
+        with self._lock:
+            until = self._pins.get(key)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self._pins[key]
+                return False
+            return True
+
+    def _ensure_monitor(self):
+        if not self._stop.is_set():
+            self._monitor.ensure_started()
+
+    def _run_monitor(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.check_replicas()
+            except Exception:
+                self.app.logger.exception('Replica lag check failed')
+            if self._stop.wait(self.check_interval):
+                return
+
+
+class DatabaseEngine:
+    """Flask extension configuring db's engines, pools, SQLite pragmas and read routing"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure and initialise db for app; call instead of db.init_app(app)"""
+        app.config.setdefault('DATABASE_POOL_SIZE', 4)
+        app.config.setdefault('DATABASE_MAX_OVERFLOW', 4)
+        app.config.setdefault('DATABASE_POOL_TIMEOUT', 30)
+        app.config.setdefault('DATABASE_READ_POOL', True)
+        app.config.setdefault('DATABASE_READ_POOL_SIZE', 16)
+        app.config.setdefault('DATABASE_READ_MAX_OVERFLOW', 16)
+        app.config.setdefault('DATABASE_REPLICAS', [])
+        app.config.setdefault('DATABASE_REPLICA_MAX_LAG', 5)
+        app.config.setdefault('DATABASE_REPLICA_CHECK_INTERVAL', 1)
+        app.config.setdefault('DATABASE_REPLICA_PIN_CAPACITY', 10000)
+        app.config.setdefault('SQLITE_JOURNAL_MODE', 'wal')
+        app.config.setdefault('SQLITE_SYNCHRONOUS', 'normal')
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT', 5000)  # milliseconds
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        app.config.setdefault('SQLITE_CACHE_SIZE', -64 * 1024)  # negative: KiB
+
+        if not _in_memory(make_url(app.config['SQLALCHEMY_DATABASE_URI'])):
+            options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+            options.setdefault('pool_timeout', app.config['DATABASE_POOL_TIMEOUT'])
+
+        db.init_app(app)
+        # Per app, so every app built by the factory reads its own databases
+        engines = app.extensions['db_engine'] = Engines(app)
+        app.before_request(engines._verify_once)
+        app.after_request(engines._pin_writers)
+
+        if not event.contains(Session, 'do_orm_execute', _route_reads):
+            event.listen(Session, 'do_orm_execute', _route_reads)
+
+
+def expected_sqlite_pragmas(config, read_only=False):
+    """PRAGMA values a connection should report once apply_sqlite_pragmas has run"""
+    # mmap_size is not checked: builds may cap or disable it, which only
+    # costs speed. Read-only connections leave journal_mode to the file.
+    expected = {
+        'synchronous': _SYNCHRONOUS_LEVELS[config['SQLITE_SYNCHRONOUS'].lower()],
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT'],
+        'cache_size': config['SQLITE_CACHE_SIZE'],
+        'query_only': int(read_only)
+    }
+    if not read_only:
+        expected['journal_mode'] = config['SQLITE_JOURNAL_MODE'].lower()
+    return expected
+
+
+def check_sqlite_profile(engine, config, name, read_only=False):
+    """Compare a SQLite engine's connection against the profile; returns a list of problems"""
+    if engine.dialect.name != 'sqlite' or _in_memory(engine.url):
+        return []
+    problems = []
+    with engine.connect() as conn:
+        for pragma, value in expected_sqlite_pragmas(config, read_only=read_only).items():
+            actual = conn.exec_driver_sql(f'PRAGMA {pragma}').scalar()
+            if actual != value:
+                problems.append(f'{name}: {pragma} is {actual!r}, expected {value!r}')
+    return problems
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record, config, read_only=False):
+    """'connect' listener applying the SQLite profile to a new DBAPI connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            # Persistent in the database file; the write pool sets it once
+            cursor.execute(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}")
+        cursor.execute(f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+        cursor.execute(f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}")
+        cursor.execute(f'PRAGMA query_only = {int(read_only)}')
+    finally:
+        cursor.close()
+
+
+def _in_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _sqlite_file(url):
+    return url.get_backend_name() == 'sqlite' and not _in_memory(url)
+
+
+def _client_key():
+    return request.headers.get('Authorization') or request.remote_addr
+
+
+def _route_reads(orm_execute_state):
+    """Send SELECTs made while serving GET/HEAD requests to a read engine"""
+    if not orm_execute_state.is_select or 'bind' in orm_execute_state.bind_arguments:
+        return
+    if orm_execute_state.execution_options.get(PRIMARY):
+        return
+    if not has_request_context() or request.method not in READ_METHODS:
+        return
+    session = orm_execute_state.session
+    if session.info.get(WROTE) or session.new or session.dirty or session.deleted:
+        return
+    engines = current_app.extensions.get('db_engine')
+    if engines is None:
+        return
+    # Sharded tables are read from their shard, which the shard router picks
+    shards = current_app.extensions.get('shard_router')
+    if shards is not None and shards.owns(orm_execute_state.bind_arguments.get('mapper'), orm_execute_state.statement):
+        return
+    # One engine per request, so its reads see a single consistent snapshot
+    if READ_ENGINE not in session.info:
+        session.info[READ_ENGINE] = engines.read_engine()
+    engine = session.info[READ_ENGINE]
+    if engine is not None:
+        orm_execute_state.bind_arguments['bind'] = engine
+
+
+def _dispose_after_fork():
+    for instance in list(_instances):
+        instance.dispose(close=False)
+
+
+# Every app's Engines, so a forked child can empty their pools
+_instances = weakref.WeakSet()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
+
+db_engine = DatabaseEngine()
@@ -0,0 +1,164 @@
+"""
+Group commit for high-rate money writes.
+
+With GROUP_COMMIT_ENABLED, routes hand their write to submit() instead of
+committing it themselves. A committer thread gathers submissions for up
+to GROUP_COMMIT_MAX_DELAY seconds or GROUP_COMMIT_MAX_BATCH items, runs
+each in its own SAVEPOINT within one transaction and commits the batch
+once. That is one journal fsync per batch instead of one per request.
+submit() returns only after the batch is durable. It raises the write's
+own exception (e.g. InsufficientBalance) when that write was rolled back,
+or the commit error if the batch failed.
+
+Batches run one after another on the committer thread, so each write
+waits for its batch: this trades median latency for fewer commits and a
+tighter tail. It only pays off where a commit is expensive (synchronous=FULL,
+a Postgres primary with slow fsync); with WAL and synchronous=NORMAL,
+benchmarks/bench_group_commit.py shows no throughput gain and a p50 several
+times higher.
+
+Disabled (the default), submit() runs the write on the request's session
+and it commits with the request's unit of work, so routes use the same
+code either way. The same holds while user data is sharded (see
+src.services.shards): each shard is its own writer.
+"""
+
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy.orm import Session
+
+from src.models.user import db
+from src.services.background import BackgroundThread
+from src.services.shards import shard_router
+
+
+class _Pending:
+    __slots__ = ('work', 'result', 'error', 'done')
+
+    def __init__(self, work):
+        self.work = work
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class Committer:
+    """One app's submission queue and committer thread; stored as app.extensions['group_commit']"""
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = app.config['GROUP_COMMIT_ENABLED']
+        self.max_batch = app.config['GROUP_COMMIT_MAX_BATCH']
+        self.max_delay = app.config['GROUP_COMMIT_MAX_DELAY']
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._committer = BackgroundThread(self._run, 'group-committer')
+        self._counters = dict.fromkeys(['writes', 'batches', 'failed_batches', 'max_batch_seen'], 0)
+
+    def submit(self, work):
+        """Run work(session) as part of a commit; returns its result"""
+        # Batches share one primary transaction; sharded writes go to their
+        # own shard inline instead
+        if not self.enabled or shard_router.enabled:
+            return work(db.session)
+
+        # Hand the request's pooled connection back before waiting, or enough
+        # waiting requests starve the committer of one. Loaded objects stay
+        # readable; the request session must not hold writes of its own.
+        db.session.close()
+
+        pending = _Pending(work)
+        self._committer.ensure_started()
+        self._queue.put(pending)
+        # No timeout: once queued, the write's outcome is only known when
+        # its batch commits or fails
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters['queue_depth'] = self._queue.qsize()
+        counters['enabled'] = self.enabled
+        return counters
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        with self.app.app_context():
+            # Objects stay loaded after commit so request threads can read them
+            session = Session(db.engine, expire_on_commit=False)
+            try:
+                if db.engine.dialect.name == 'sqlite':
+                    # Take the write lock up front; pysqlite also needs an
+                    # explicit BEGIN for SAVEPOINTs to nest inside it
+                    session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+                for pending in batch:
+                    try:
+                        with session.begin_nested():
+                            pending.result = pending.work(session)
+                    except Exception as e:
+                        pending.error = e
+                session.commit()
+                failed = False
+            except Exception as e:
+                session.rollback()
+                failed = True
+                for pending in batch:
+                    if pending.error is None:
+                        pending.error = e
+            finally:
+                session.close()
+                with self._lock:
+                    self._counters['writes'] += len(batch)
+                    self._counters['batches'] += 1
+                    self._counters['failed_batches'] += failed
+                    self._counters['max_batch_seen'] = max(self._counters['max_batch_seen'], len(batch))
+                for pending in batch:
+                    pending.done.set()
+
+
+class GroupCommit:
+    """Flask extension batching submitted writes into shared commits"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('GROUP_COMMIT_ENABLED', False)
+        app.config.setdefault('GROUP_COMMIT_MAX_BATCH', 64)
+        app.config.setdefault('GROUP_COMMIT_MAX_DELAY', 0.002)
+
+        # Per app, so each app's batches commit to its own database
+        app.extensions['group_commit'] = Committer(app)
+
+    def submit(self, work):
+        """Run work(session) as part of the current app's next commit; returns its result"""
+        committer = current_app.extensions.get('group_commit')
+        if committer is None:
+            return work(db.session)
+        return committer.submit(work)
+
+    def metrics(self):
+        return current_app.extensions['group_commit'].metrics()
+
+
+group_commit = GroupCommit()
@@ -0,0 +1,202 @@
+"""
+Per-route request metrics in the Prometheus text format.
+
+With METRICS_ENABLED set, every request is measured by endpoint (the
+Flask endpoint name, e.g. 'user.get_wallets'), method and status:
+
+- http_request_duration_seconds: latency histogram
+- http_request_sql_statements: statements issued, counted by SQLAlchemy
+  cursor-execute events on every engine (primary, read pools, replicas,
+  shards)
+- http_request_sql_duration_seconds: time spent in those statements
+- http_response_size_bytes: body size, when known up front (streamed
+  bodies are not observed)
+- http_requests_in_flight: requests being served right now
+
+They are served at METRICS_PATH (default /metrics) for a Prometheus
+scrape. Disabled, nothing is registered: no request hooks, no engine
+listeners and no endpoint.
+
+Counts live in process memory, so each worker reports its own; scrape
+every worker or aggregate them in Prometheus. Writes handed to group
+commit run on the committer thread, outside any request, so their
+statements are not counted against the requests that submitted them.
+"""
+
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SQL_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# g attribute holding the current request's [statements, seconds]
+SQL = 'metrics_sql'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            labels = _labels(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{self.name}_bucket{{{labels},le="{_number(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {_number(total)}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Metrics:
+    """Flask extension measuring each request and serving the results to Prometheus"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', False)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+
+        self.enabled = app.config['METRICS_ENABLED']
+        if not self.enabled:
+            return
+
+        app.extensions['metrics'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._leave)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.export, methods=['GET'])
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_execute)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = []
+            for histogram in self.histograms:
+                lines += histogram.render()
+            lines += [
+                '# HELP http_requests_in_flight Requests being served',
+                '# TYPE http_requests_in_flight gauge',
+                f'http_requests_in_flight {self.in_flight}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """Prometheus scrape endpoint"""
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def _reset(self):
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Request latency', ('endpoint', 'method', 'status'), LATENCY_BUCKETS
+        )
+        self.sql_statements = Histogram(
+            'http_request_sql_statements', 'SQL statements per request', ('endpoint', 'method'), SQL_COUNT_BUCKETS
+        )
+        self.sql_time = Histogram(
+            'http_request_sql_duration_seconds', 'Time spent in SQL per request', ('endpoint', 'method'), SQL_TIME_BUCKETS
+        )
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'Response body size', ('endpoint', 'method'), SIZE_BUCKETS
+        )
+        self.histograms = (self.latency, self.sql_statements, self.sql_time, self.response_size)
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        setattr(g, SQL, [0, 0.0])
+        with self._lock:
+            self.in_flight += 1
+
+    def _finish(self, response):
+        # Registered before unit_of_work, so this runs after its commit and
+        # the commit's statements are counted
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        statements, sql_seconds = g.get(SQL, (0, 0.0))
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        size = None if response.is_streamed else response.calculate_content_length()
+        with self._lock:
+            self.latency.observe((endpoint, method, str(response.status_code)), elapsed)
+            self.sql_statements.observe((endpoint, method), statements)
+            self.sql_time.observe((endpoint, method), sql_seconds)
+            if size is not None:
+                self.response_size.observe((endpoint, method), size)
+        return response
+
+    def _leave(self, exc):
+        # Teardown runs even when a request fails before its after_request
+        if g.pop(SQL, None) is not None:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and SQL in g and context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    totals = g.get(SQL)
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def _labels(pairs):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
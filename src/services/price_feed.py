@@ -0,0 +1,246 @@
+"""
+Background-refreshed crypto price feed.
+
+Quotes are fetched from CoinGecko into an in-process TTL cache and persisted
+into the CryptoPrices table. Readers are served from memory; stale quotes are
+returned while a single refresh runs in the background (stale-while-revalidate)
+and concurrent misses share one upstream fetch (single-flight).
+
+Requests never wait on the upstream. With no quotes at all (a cold start
+with an empty table, or an outage), readers get the last quotes known,
+however old, or FALLBACK_PRICES, while the refresh runs in the background.
+After a failed fetch no request starts another one for
+PRICE_FEED_FAILURE_BACKOFF seconds.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from src.models.user import CryptoPrices, db
+from src.services.background import BackgroundThread
+
+COINGECKO_URL = 'https://api.coingecko.com/api/v3/simple/price'
+
+CRYPTO_MAPPING = {
+    'bitcoin': {'symbol': 'BTC', 'name': 'Bitcoin'},
+    'tether': {'symbol': 'USDT', 'name': 'Tether'},
+    'ethereum': {'symbol': 'ETH', 'name': 'Ethereum'},
+    'binancecoin': {'symbol': 'BNB', 'name': 'Binance Coin'},
+    'cardano': {'symbol': 'ADA', 'name': 'Cardano'},
+    'solana': {'symbol': 'SOL', 'name': 'Solana'},
+    'polkadot': {'symbol': 'DOT', 'name': 'Polkadot'},
+    'dogecoin': {'symbol': 'DOGE', 'name': 'Dogecoin'}
+}
+
+# Served when neither the upstream nor the database has ever produced quotes
+FALLBACK_PRICES = [
+    {'symbol': 'BTC', 'name': 'Bitcoin', 'price_usd': 43250.50, 'change_24h': 2.45, 'market_cap': 847000000000, 'volume_24h': 15000000000},
+    {'symbol': 'USDT', 'name': 'Tether', 'price_usd': 1.00, 'change_24h': 0.01, 'market_cap': 95000000000, 'volume_24h': 25000000000},
+    {'symbol': 'ETH', 'name': 'Ethereum', 'price_usd': 2650.75, 'change_24h': 1.85, 'market_cap': 318000000000, 'volume_24h': 8000000000},
+    {'symbol': 'BNB', 'name': 'Binance Coin', 'price_usd': 315.20, 'change_24h': -0.75, 'market_cap': 47000000000, 'volume_24h': 1200000000},
+    {'symbol': 'ADA', 'name': 'Cardano', 'price_usd': 0.485, 'change_24h': 3.25, 'market_cap': 17000000000, 'volume_24h': 450000000},
+    {'symbol': 'SOL', 'name': 'Solana', 'price_usd': 98.45, 'change_24h': 4.15, 'market_cap': 42000000000, 'volume_24h': 1800000000},
+    {'symbol': 'DOT', 'name': 'Polkadot', 'price_usd': 7.25, 'change_24h': -1.25, 'market_cap': 9500000000, 'volume_24h': 180000000},
+    {'symbol': 'DOGE', 'name': 'Dogecoin', 'price_usd': 0.085, 'change_24h': 5.85, 'market_cap': 12000000000, 'volume_24h': 650000000}
+]
+
+
+class Quotes:
+    """One app's price cache with stale-while-revalidate and single-flight refreshes"""
+
+    def __init__(self, app):
+        self.app = app
+        self.ttl = app.config['PRICE_FEED_TTL']
+        self.refresh_interval = app.config['PRICE_FEED_REFRESH_INTERVAL']
+        self.timeout = app.config['PRICE_FEED_TIMEOUT']
+        self.background = app.config['PRICE_FEED_BACKGROUND']
+        self.failure_backoff = app.config['PRICE_FEED_FAILURE_BACKOFF']
+
+        self._prices = None
+        self._fetched_at = 0.0
+        self._failed_at = None
+        self._loaded_persisted = False
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._refresher = BackgroundThread(self._run_refresher, 'price-feed-refresher')
+        self._stop = threading.Event()
+
+    def get_prices(self):
+        """Return the cached quotes, refreshing them if they are stale or missing"""
+        if not self._loaded_persisted:
+            self._load_persisted()
+
+        prices = self._prices
+        age = time.monotonic() - self._fetched_at
+        if prices is not None and age < self.ttl:
+            return prices
+
+        self._ensure_refresher()
+
+        # Serve what we have now and revalidate off the request thread
+        if not self._backing_off():
+            self.refresh(wait=False)
+        return prices if prices is not None else FALLBACK_PRICES
+
+    def refresh(self, wait=True):
+        """Refresh quotes from upstream; concurrent callers share a single fetch"""
+        with self._lock:
+            done = self._inflight
+            leader = done is None
+            if leader:
+                done = self._inflight = threading.Event()
+
+        if not leader:
+            if wait:
+                done.wait(self.timeout + 1)
+            return
+
+        if wait:
+            self._refresh(done)
+        else:
+            threading.Thread(target=self._refresh, args=(done,), daemon=True).start()
+
+    def stop(self):
+        """Stop the background refresher thread"""
+        self._stop.set()
+
+    def _backing_off(self):
+        failed_at = self._failed_at
+        return failed_at is not None and time.monotonic() - failed_at < self.failure_backoff
+
+    def _refresh(self, done):
+        prices = None
+        try:
+            prices = self._fetch()
+            if not prices:
+                raise ValueError('Upstream returned no quotes')
+            self._prices = prices
+            self._fetched_at = time.monotonic()
+            self._failed_at = None
+        except Exception:
+            prices = None
+            self._failed_at = time.monotonic()
+            self._log('warning', 'Price refresh failed; retrying in %ss', self.failure_backoff)
+        finally:
+            with self._lock:
+                self._inflight = None
+            done.set()
+
+        if prices:
+            self._persist(prices)
+
+    def _fetch(self):
+        # requests costs ~0.1s to import; only the refresher needs it
+        import requests
+
+        params = {
+            'ids': ','.join(CRYPTO_MAPPING),
+            'vs_currencies': 'usd',
+            'include_24hr_change': 'true',
+            'include_market_cap': 'true',
+            'include_24hr_vol': 'true'
+        }
+
+        response = requests.get(COINGECKO_URL, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+
+        prices = []
+        for coin_id, coin_data in data.items():
+            if coin_id in CRYPTO_MAPPING:
+                crypto_info = CRYPTO_MAPPING[coin_id]
+                prices.append({
+                    'symbol': crypto_info['symbol'],
+                    'name': crypto_info['name'],
+                    'price_usd': coin_data['usd'],
+                    'change_24h': coin_data.get('usd_24h_change') or 0,
+                    'market_cap': coin_data.get('usd_market_cap'),
+                    'volume_24h': coin_data.get('usd_24h_vol')
+                })
+        return prices
+
+    def _ensure_refresher(self):
+        if self.background and not self._stop.is_set():
+            self._refresher.ensure_started()
+
+    def _run_refresher(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh(wait=True)
+
+    def _load_persisted(self):
+        """Warm the cache from the CryptoPrices table after a restart"""
+        self._loaded_persisted = True
+        try:
+            with self.app.app_context():
+                rows = CryptoPrices.query.all()
+                if not rows:
+                    return
+                prices = [{
+                    'symbol': row.symbol,
+                    'name': row.name,
+                    'price_usd': float(row.price_usd),
+                    'change_24h': float(row.change_24h),
+                    'market_cap': float(row.market_cap) if row.market_cap else None,
+                    'volume_24h': float(row.volume_24h) if row.volume_24h else None
+                } for row in rows]
+                oldest = min(row.updated_at or datetime.min for row in rows)
+        except Exception:
+            self._log('warning', 'Could not load persisted price quotes')
+            return
+
+        age = (datetime.utcnow() - oldest).total_seconds()
+        with self._lock:
+            if self._prices is None:
+                self._prices = prices
+                self._fetched_at = time.monotonic() - max(age, 0)
+
+    def _persist(self, prices):
+        try:
+            with self.app.app_context():
+                existing = {row.symbol: row for row in CryptoPrices.query.all()}
+                now = datetime.utcnow()
+                for price in prices:
+                    row = existing.get(price['symbol'])
+                    if row is None:
+                        row = CryptoPrices(symbol=price['symbol'])
+                        db.session.add(row)
+                    row.name = price['name']
+                    row.price_usd = price['price_usd']
+                    row.change_24h = price['change_24h']
+                    row.market_cap = price['market_cap']
+                    row.volume_24h = price['volume_24h']
+                    row.updated_at = now
+                db.session.commit()
+        except Exception:
+            self._log('error', 'Could not persist price quotes')
+
+    def _log(self, level, message, *args):
+        getattr(self.app.logger, level)(message, *args, exc_info=True)
+
+
+class PriceFeed:
+    """Flask extension serving each app's quotes from its own cache"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PRICE_FEED_TTL', 60)
+        app.config.setdefault('PRICE_FEED_REFRESH_INTERVAL', 30)
+        app.config.setdefault('PRICE_FEED_TIMEOUT', 10)
+        app.config.setdefault('PRICE_FEED_BACKGROUND', True)
+        app.config.setdefault('PRICE_FEED_FAILURE_BACKOFF', 30)
+
+        # Per app, so quotes are loaded from and persisted to its own database
+        app.extensions['price_feed'] = Quotes(app)
+
+    def get_prices(self):
+        """The current app's quotes; see Quotes.get_prices()"""
+        return current_app.extensions['price_feed'].get_prices()
+
+
+price_feed = PriceFeed()
@@ -0,0 +1,195 @@
+"""
+Authenticated-principal cache for the user and admin auth decorators.
+
+Keeps a small snapshot of the fields the decorators check (blocked/active
+flags and a few identity fields) in a bounded LRU with a TTL, so steady-state
+authenticated requests need no auth query. Routes receive a CachedPrincipal
+that answers snapshot fields from memory and loads the full row into the
+request's session only when something else is touched.
+
+Entries are dropped explicitly when an admin blocks or unblocks a user, and
+whenever a flush writes to a cached User or Admin row (KYC approval, profile
+updates, deactivation). Invalidation is per process: other workers pick the
+change up when their entry expires, so keep the TTL short. Principals are
+always loaded from the primary, never from a read replica. Each app keeps
+its own cache, since ids restart in every database.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models.user import Admin, User, db
+from src.services.db_engine import PRIMARY
+
+USER_FIELDS = ('id', 'username', 'is_verified', 'is_blocked', 'blocked_reason')
+ADMIN_FIELDS = ('id', 'username', 'role', 'is_active')
+
+
+class CachedPrincipal:
+    """Stands in for a User/Admin instance, loading the row only when needed"""
+
+    __slots__ = ('_model', '_fields', '_instance')
+
+    def __init__(self, model, fields, instance=None):
+        object.__setattr__(self, '_model', model)
+        object.__setattr__(self, '_fields', fields)
+        object.__setattr__(self, '_instance', instance)
+
+    def _load(self):
+        instance = self._instance
+        if instance is None:
+            instance = _load_principal(self._model, self._fields['id'])
+            object.__setattr__(self, '_instance', instance)
+        return instance
+
+    def __getattr__(self, name):
+        fields = object.__getattribute__(self, '_fields')
+        if name in fields and object.__getattribute__(self, '_instance') is None:
+            return fields[name]
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __repr__(self):
+        return f'<CachedPrincipal {self._model.__name__} {self._fields["id"]}>'
+
+
+class Principals:
+    """One app's bounded LRU + TTL cache of principal snapshots keyed by (model, id)"""
+
+    def __init__(self, app):
+        self.enabled = app.config['PRINCIPAL_CACHE_ENABLED']
+        self.max_size = app.config['PRINCIPAL_CACHE_SIZE']
+        self.ttl = app.config['PRINCIPAL_CACHE_TTL']
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, model, principal_id):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop((model.__name__, principal_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def get(self, model, principal_id, field_names):
+        if not self.enabled:
+            return _uncached(model, principal_id)
+
+        key = (model.__name__, principal_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return CachedPrincipal(model, entry[1])
+            self.misses += 1
+            epoch = self._epoch
+
+        instance = _load_principal(model, principal_id)
+        if instance is None:
+            return None
+        fields = {name: getattr(instance, name) for name in field_names}
+
+        with self._lock:
+            # Skip caching if anything was invalidated while we were loading
+            if self._epoch == epoch:
+                self._entries[key] = (now + self.ttl, fields)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        return CachedPrincipal(model, fields, instance)
+
+
+class PrincipalCache:
+    """Flask extension giving the auth decorators the current app's principal cache"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PRINCIPAL_CACHE_ENABLED', True)
+        app.config.setdefault('PRINCIPAL_CACHE_SIZE', 10000)
+        app.config.setdefault('PRINCIPAL_CACHE_TTL', 30)
+
+        # Per app: ids restart in every database, so apps cannot share entries
+        app.extensions['principal_cache'] = Principals(app)
+
+        if not event.contains(Session, 'after_flush', _collect_principal_writes):
+            event.listen(Session, 'after_flush', _collect_principal_writes)
+            event.listen(Session, 'after_commit', _invalidate_committed_writes)
+
+    def get_user(self, user_id):
+        return self._get(User, user_id, USER_FIELDS)
+
+    def get_admin(self, admin_id):
+        return self._get(Admin, admin_id, ADMIN_FIELDS)
+
+    def invalidate_user(self, user_id):
+        self.invalidate(User, user_id)
+
+    def invalidate_admin(self, admin_id):
+        self.invalidate(Admin, admin_id)
+
+    def invalidate(self, model, principal_id):
+        principals = _principals()
+        if principals is not None:
+            principals.invalidate(model, principal_id)
+
+    def clear(self):
+        principals = _principals()
+        if principals is not None:
+            principals.clear()
+
+    def _get(self, model, principal_id, field_names):
+        principals = _principals()
+        if principals is None:
+            return _uncached(model, principal_id)
+        return principals.get(model, principal_id, field_names)
+
+
+def _principals():
+    return current_app.extensions.get('principal_cache') if has_app_context() else None
+
+
+def _load_principal(model, principal_id):
+    # Always from the primary: a lagging replica would serve, and the cache
+    # keep, a principal from before its block
+    return db.session.get(model, principal_id, execution_options={PRIMARY: True})
+
+
+def _uncached(model, principal_id):
+    instance = _load_principal(model, principal_id)
+    return CachedPrincipal(model, {'id': principal_id}, instance) if instance else None
+
+
+def _collect_principal_writes(session, flush_context):
+    written = session.info.setdefault('principal_writes', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (User, Admin)) and obj.id is not None:
+            written.add((type(obj), obj.id))
+            principal_cache.invalidate(type(obj), obj.id)
+
+
+def _invalidate_committed_writes(session):
+    # Invalidate again once the write is visible, so a concurrent reader
+    # cannot re-cache the pre-commit row
+    for model, principal_id in session.info.pop('principal_writes', ()):
+        principal_cache.invalidate(model, principal_id)
+
+
+principal_cache = PrincipalCache()
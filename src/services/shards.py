@@ -0,0 +1,320 @@
+"""
+Horizontal sharding of user data.
+
+With DATABASE_SHARDS set, every user's rows (user, wallet, transaction,
+kyc_record) live in one of N shard databases, and the dashboard counters
+for those rows live beside them. Everything else (admins, the audit log,
+blobs, prices) stays on the primary, which also holds the global
+directory: user_directory claims each username and email and
+address_directory claims each wallet address, so uniqueness holds across
+shards and login can find a user from the username alone.
+
+Ids of sharded rows are counter * N + shard, taken from a per-shard
+shard_sequence row in the same transaction as the insert. Any user id,
+wallet id, transaction id or KYC id therefore names its shard (id % N),
+and rows from different shards never share an id.
+
+Routing is per request session. Once a request knows whose data it
+serves (the token's user, an id in the URL, the user being registered),
+use() pins db.session to that shard, and statements on sharded tables go
+there; the rest go to the primary. Touching a sharded table with no shard
+chosen raises ShardNotSelected rather than reading the primary's empty
+copy, and a session that has written to one shard cannot be moved to
+another.
+
+Admin listings and dashboard aggregates scatter: scatter(fn) runs fn once
+per shard on the request's session, one shard after another, and merge(),
+count() and paginate() combine the results. Offset pages fetch
+page * per_page rows from every shard, so deep pages cost more than with
+a single database; keyset pages do not.
+
+Not covered: a request that writes the primary and a shard (registration's
+directory claims, an admin action on a user) commits the two one after the
+other, not atomically. Group commit runs writes inline while sharding is
+on. Existing single-database data is not moved, and migrate_db.py only
+migrates the primary; shards get their tables from create_all().
+"""
+
+import heapq
+import itertools
+import math
+from collections import defaultdict
+from functools import partial
+
+from flask import current_app, has_app_context
+from sqlalchemy import create_engine, event, inspect, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+from src.models.user import (
+    AddressDirectory, DashboardCounter, KYCRecord, ShardSequence, Transaction, User, UserDirectory, Wallet, db
+)
+from src.services.db_engine import apply_sqlite_pragmas
+from src.services.unit_of_work import WROTE
+
+# Models whose tables live on the shards
+SHARDED_MODELS = (User, Wallet, Transaction, KYCRecord, DashboardCounter, ShardSequence)
+
+SHARDED_TABLES = frozenset(model.__table__.name for model in SHARDED_MODELS)
+
+# Sharded models with an integer id drawn from shard_sequence
+SEQUENCED_MODELS = (User, Wallet, Transaction, KYCRecord)
+
+# Session.info key holding the index of the shard a session works on
+SHARD = 'shard_router_shard'
+
+
+class ShardNotSelected(RuntimeError):
+    """Raised when a session touches sharded tables before a shard was chosen"""
+
+
+class CrossShardWrite(RuntimeError):
+    """Raised when a session that has written to one shard is pointed at another"""
+
+
+class ShardPage:
+    """One offset page gathered from every shard, shaped like Flask-SQLAlchemy's Pagination"""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def pages(self):
+        return math.ceil(self.total / self.per_page) if self.total else 0
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+
+class Shards:
+    """One app's shard engines; RoutingSession asks it where sharded tables live"""
+
+    def __init__(self, app):
+        self.engines = []
+        self._placements = itertools.count()
+        for uri in app.config['DATABASE_SHARDS']:
+            url = make_url(uri)
+            options = {}
+            if url.get_backend_name() != 'sqlite' or url.database not in (None, '', ':memory:'):
+                options['pool_size'] = app.config['DATABASE_POOL_SIZE']
+                options['max_overflow'] = app.config['DATABASE_MAX_OVERFLOW']
+                options['pool_timeout'] = app.config['DATABASE_POOL_TIMEOUT']
+            engine = create_engine(url, echo=app.config.get('SQLALCHEMY_ECHO', False), **options)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', partial(apply_sqlite_pragmas, config=app.config))
+            self.engines.append(engine)
+
+    def shard_of(self, row_id):
+        return int(row_id) % len(self.engines)
+
+    def place(self):
+        """Shard for a new user: round-robin, so shards fill evenly"""
+        return next(self._placements) % len(self.engines)
+
+    def owns(self, mapper=None, clause=None):
+        """Whether a statement on mapper/clause belongs on a shard"""
+        if mapper is not None:
+            return inspect(mapper).local_table.name in SHARDED_TABLES
+        if clause is not None:
+            return any(getattr(table, 'name', None) in SHARDED_TABLES for table in find_tables(clause, include_crud=True))
+        return False
+
+    def get_bind(self, session, mapper=None, clause=None):
+        """Engine for a statement, or None to leave it to the primary"""
+        if not self.owns(mapper, clause):
+            return None
+        key = session.info.get(SHARD)
+        if key is None:
+            raise ShardNotSelected('No shard chosen for this session; call shard_router.use() first')
+        return self.engines[key]
+
+    def pin(self, session, key):
+        current = session.info.get(SHARD)
+        if current is not None and current != key and (
+            session.info.get(WROTE) or session.new or session.dirty or session.deleted
+        ):
+            raise CrossShardWrite(f'Session has written to shard {current}; cannot move it to shard {key}')
+        session.info[SHARD] = key
+
+    def next_id(self, session, model):
+        """Take the next id for model on the session's shard, inside its transaction"""
+        key = session.info[SHARD]
+        conn = session.connection(bind_arguments={'mapper': ShardSequence})
+        value = conn.execute(
+            update(ShardSequence)
+            .where(ShardSequence.name == model.__table__.name)
+            .values(last_value=ShardSequence.last_value + 1)
+            .returning(ShardSequence.last_value)
+        ).scalar()
+        if value is None:
+            raise RuntimeError(f'Shard {key} has no id sequence for {model.__table__.name}; run shard_router.create_all()')
+        return value * len(self.engines) + key
+
+
+class ShardRouter:
+    """Flask extension placing user data on shard databases by user id"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Open the shard engines for app; call after db_engine.init_app(app)"""
+        app.config.setdefault('DATABASE_SHARDS', [])
+
+        # Per app, so RoutingSession and the routes find the current app's shards
+        if app.config['DATABASE_SHARDS']:
+            app.extensions['shard_router'] = Shards(app)
+
+        if not event.contains(Session, 'before_flush', _place_new_rows):
+            event.listen(Session, 'before_flush', _place_new_rows)
+
+    @property
+    def enabled(self):
+        return self._shards() is not None
+
+    def engines(self):
+        """Engines holding the sharded tables: the shards, or the primary alone"""
+        shards = self._shards()
+        return list(shards.engines) if shards is not None else [db.engine]
+
+    def create_all(self):
+        """Create the sharded tables and id sequences on every shard"""
+        shards = self._shards()
+        if shards is None:
+            return
+        tables = [model.__table__ for model in SHARDED_MODELS]
+        for engine in shards.engines:
+            db.metadata.create_all(engine, tables=tables)
+            with engine.begin() as conn:
+                existing = set(conn.execute(select(ShardSequence.name)).scalars())
+                missing = [model.__table__.name for model in SEQUENCED_MODELS if model.__table__.name not in existing]
+                if missing:
+                    conn.execute(ShardSequence.__table__.insert(), [{'name': name, 'last_value': 0} for name in missing])
+
+    def use(self, row_id):
+        """Pin the request's session to the shard of row_id (a user id or any sharded row's id)"""
+        shards = self._shards()
+        if shards is not None:
+            shards.pin(db.session(), shards.shard_of(row_id))
+
+    def route_username(self, username):
+        """Pin the session to username's shard; False if no such user. Always True without sharding"""
+        shards = self._shards()
+        if shards is None:
+            return True
+        user_id = db.session.query(UserDirectory.id).filter_by(username=username).scalar()
+        if user_id is None:
+            return False
+        shards.pin(db.session(), shards.shard_of(user_id))
+        return True
+
+    def user_exists(self, **fields):
+        """Whether a user with these username/email values exists on any shard"""
+        model = UserDirectory if self.enabled else User
+        return db.session.query(model.id).filter_by(**fields).first() is not None
+
+    def scatter(self, fn):
+        """Run fn() once per shard with the session pinned there; returns the results in shard order"""
+        shards = self._shards()
+        if shards is None:
+            return [fn()]
+        return self._gather(range(len(shards.engines)), fn)
+
+    def merge(self, query, key, limit=None, reverse=False):
+        """query.all() from every shard, merged on key; query must already be ordered by it"""
+        parts = self.scatter(query.all)
+        rows = parts[0] if len(parts) == 1 else list(heapq.merge(*parts, key=key, reverse=reverse))
+        return rows if limit is None else rows[:limit]
+
+    def count(self, query):
+        return sum(self.scatter(query.count))
+
+    def paginate(self, query, order_by, key, page, per_page):
+        """Offset page of query ordered by order_by (key gives a row's order_by value)"""
+        query = query.order_by(order_by)
+        if not self.enabled:
+            return query.paginate(page=page, per_page=per_page, error_out=False)
+        page, per_page = max(page, 1), max(per_page, 1)
+        total = self.count(query.order_by(None))
+        rows = self.merge(query.limit(page * per_page), key, limit=page * per_page)
+        return ShardPage(rows[(page - 1) * per_page:], page, per_page, total)
+
+    def load_users(self, user_ids):
+        """{id: User} for user_ids, asking only the shards that hold them; {} without sharding"""
+        shards = self._shards()
+        user_ids = set(user_ids)
+        if shards is None or not user_ids:
+            return {}
+        by_shard = defaultdict(list)
+        for user_id in user_ids:
+            by_shard[shards.shard_of(user_id)].append(user_id)
+        users = {}
+        for key, ids in by_shard.items():
+            for user in self._gather([key], User.query.filter(User.id.in_(ids)).all)[0]:
+                users[user.id] = user
+        return users
+
+    def _shards(self):
+        return current_app.extensions.get('shard_router') if has_app_context() else None
+
+    def _gather(self, keys, fn):
+        # Reads only: nothing is flushed while the session is pointed
+        # somewhere other than the shard it writes to
+        session = db.session()
+        pinned = session.info.get(SHARD)
+        results = []
+        try:
+            with session.no_autoflush:
+                for key in keys:
+                    session.info[SHARD] = key
+                    results.append(fn())
+        finally:
+            if pinned is None:
+                session.info.pop(SHARD, None)
+            else:
+                session.info[SHARD] = pinned
+        return results
+
+
+def _place_new_rows(session, flush_context, instances):
+    """Give new sharded rows their shard and id, and claim their directory entries"""
+    shards = current_app.extensions.get('shard_router') if has_app_context() else None
+    if shards is None:
+        return
+
+    new = list(session.new)
+    for obj in new:
+        if isinstance(obj, User) and obj.id is None:
+            # A new user goes to the session's shard, or the next in turn
+            key = session.info.get(SHARD)
+            if key is None:
+                key = shards.place()
+            shards.pin(session, key)
+            obj.id = shards.next_id(session, User)
+            session.add(UserDirectory(id=obj.id, username=obj.username, email=obj.email))
+
+    for obj in new:
+        if not isinstance(obj, SEQUENCED_MODELS) or isinstance(obj, User):
+            continue
+        key = session.info.get(SHARD)
+        if key is None:
+            raise ShardNotSelected(f'No shard chosen for new {type(obj).__name__}; call shard_router.use() first')
+        if obj.user_id is not None and shards.shard_of(obj.user_id) != key:
+            raise CrossShardWrite(f'{type(obj).__name__} for user {obj.user_id} does not belong on shard {key}')
+        if obj.id is None:
+            obj.id = shards.next_id(session, type(obj))
+        if isinstance(obj, Wallet):
+            session.add(AddressDirectory(address=obj.address, user_id=obj.user_id))
+
+
+shard_router = ShardRouter()
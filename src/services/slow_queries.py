@@ -0,0 +1,199 @@
+"""
+Slow-query log.
+
+With SLOW_QUERY_LOG_ENABLED set, every SQL statement is timed through
+SQLAlchemy's cursor-execute events, on every engine the app uses. A
+statement slower than SLOW_QUERY_THRESHOLD seconds is recorded with:
+
+- the statement text and the shape of its bound parameters (type names
+  only; values never leave the process, so passwords and addresses stay
+  out of the log)
+- the route that issued it (endpoint, method and URL rule), when there is
+  a request
+- its plan: EXPLAIN QUERY PLAN on SQLite, EXPLAIN elsewhere. The plan is
+  taken on a fresh cursor of the same connection, so it describes the
+  statement as it just ran and does not execute it again.
+
+Records are appended as JSON lines to SLOW_QUERY_LOG_PATH, rotated at
+SLOW_QUERY_LOG_MAX_BYTES with SLOW_QUERY_LOG_BACKUPS old files kept. The
+log also keeps per-process totals for each distinct statement, which
+GET /api/admin/slow-queries lists, worst first. Statements that differ
+only in the length of an IN list count as one.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SORT_KEYS = ('total', 'max', 'count')
+
+_IN_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+
+class SlowQueryLog:
+    """Flask extension recording statements slower than a threshold, with their plans"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold = 0.2
+        self.max_statements = 500
+        self.logger = None
+        self._stats = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_LOG_ENABLED', False)
+        app.config.setdefault('SLOW_QUERY_THRESHOLD', 0.2)  # seconds
+        app.config.setdefault('SLOW_QUERY_LOG_PATH', os.path.join(app.root_path, 'database', 'slow_queries.log'))
+        app.config.setdefault('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('SLOW_QUERY_LOG_BACKUPS', 5)
+        app.config.setdefault('SLOW_QUERY_MAX_STATEMENTS', 500)
+
+        self.enabled = app.config['SLOW_QUERY_LOG_ENABLED']
+        self.threshold = app.config['SLOW_QUERY_THRESHOLD']
+        self.max_statements = app.config['SLOW_QUERY_MAX_STATEMENTS']
+        if not self.enabled:
+            return
+
+        path = app.config['SLOW_QUERY_LOG_PATH']
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.logger = logging.getLogger(f'{__name__}.{id(self)}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(
+            path, maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'], backupCount=app.config['SLOW_QUERY_LOG_BACKUPS']
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+
+        app.extensions['slow_queries'] = self
+        if not event.contains(Engine, 'before_cursor_execute', _before_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_execute)
+
+    def record(self, statement, parameters, executemany, elapsed, cursor, dialect):
+        """Log one slow statement and add it to the per-statement totals"""
+        entry = {
+            'at': datetime.utcnow().isoformat(),
+            'duration': round(elapsed, 6),
+            'statement': statement,
+            'parameters': parameter_shape(parameters, executemany),
+            'route': _route(),
+            'plan': explain(cursor, dialect, statement, parameters, executemany),
+        }
+        try:
+            self.logger.info(json.dumps(entry))
+        except Exception:
+            current_app.logger.exception('Could not write the slow-query log')
+
+        key = _IN_LIST.sub('?, ...', statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_statements:
+                    # Forget the statement that has cost least so far
+                    del self._stats[min(self._stats, key=lambda known: self._stats[known]['total'])]
+                stats = self._stats[key] = {'statement': key, 'count': 0, 'total': 0.0, 'max': 0.0}
+            stats['count'] += 1
+            stats['total'] += elapsed
+            if elapsed >= stats['max']:
+                stats['max'] = elapsed
+                stats['parameters'] = entry['parameters']
+                stats['route'] = entry['route']
+                stats['plan'] = entry['plan']
+            stats['last_at'] = entry['at']
+        return entry
+
+    def top(self, limit=20, sort='total'):
+        """The worst statements by total time, worst single run or count"""
+        with self._lock:
+            ranked = sorted(self._stats.values(), key=lambda stats: stats[sort], reverse=True)[:limit]
+            return [dict(stats, total=round(stats['total'], 6), max=round(stats['max'], 6)) for stats in ranked]
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def parameter_shape(parameters, executemany=False):
+    """Type names of bound parameters, without their values"""
+    if executemany:
+        rows = list(parameters or [])
+        return {'rows': len(rows), 'first': parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def explain(cursor, dialect, statement, parameters, executemany=False):
+    """The plan of statement as a list of lines, or None if it cannot be explained"""
+    if not statement.lstrip().lower().startswith(_EXPLAINABLE):
+        return None
+    if executemany:
+        parameters = next(iter(parameters or []), ())
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    plan_cursor = None
+    try:
+        plan_cursor = cursor.connection.cursor()
+        plan_cursor.execute(prefix + statement, parameters or ())
+        rows = plan_cursor.fetchall()
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        if plan_cursor is not None:
+            plan_cursor.close()
+    if dialect.name == 'sqlite':
+        # (id, parent, notused, detail): indent each step under its parent
+        depth = {0: 0}
+        lines = []
+        for step, parent, _, detail in rows:
+            depth[step] = depth.get(parent, 0) + 1
+            lines.append('  ' * (depth[step] - 1) + detail)
+        return lines
+    return [str(row[0]) for row in rows]
+
+
+def _route():
+    if not has_request_context():
+        return None
+    rule = request.url_rule.rule if request.url_rule is not None else None
+    return {'endpoint': request.endpoint, 'method': request.method, 'rule': rule}
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slow_query_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_slow_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if not has_app_context():
+        return
+    log = current_app.extensions.get('slow_queries')
+    if log is None or elapsed < log.threshold:
+        return
+    try:
+        log.record(statement, parameters, executemany, elapsed, cursor, conn.dialect)
+    except Exception:
+        current_app.logger.exception('Could not record a slow query')
+
+
+slow_queries = SlowQueryLog()
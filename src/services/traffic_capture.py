@@ -0,0 +1,302 @@
+"""
+Traffic capture for deterministic replay.
+
+With TRAFFIC_CAPTURE_ENABLED set, a WSGI middleware records a sample
+(TRAFFIC_CAPTURE_SAMPLE_RATE) of requests as JSON lines in
+TRAFFIC_CAPTURE_DIR. Each worker process appends to its own segment file
+and starts a new one past TRAFFIC_CAPTURE_SEGMENT_BYTES, so files are
+only ever appended to and pre-fork workers never interleave. One record:
+
+    {"t": 1760000000.123,           wall-clock start, for replay timing
+     "m": "GET", "p": "/api/admin/users/5",
+     "r": "/api/admin/users/<int:user_id>",   matched URL rule
+     "q": {"page": 2, "search": "~s4"},       query string, sanitised
+     "b": {"to_address": "~s42", "currency": "BTC"}, JSON body, sanitised
+     "k": "json",                   body kind: json, form, other or null
+     "a": ["user", 5],              principal: user/admin id from the
+                                    bearer token, or ["admin_key"]
+     "s": 200, "d": 12.3, "z": 1830, "c": 3}  status, duration (ms),
+                                    response bytes, requests in flight
+
+Sanitising keeps the shape of the traffic and drops its content. Strings
+become "~s<length>" ("~e<length>" for email addresses), except for
+fields in KEPT_FIELDS (currency, amount, page cursors, sort orders and
+the like) whose values steer query plans or validation. Numbers, booleans and nulls are kept.
+Tokens, passwords, names and addresses are never written, and non-JSON
+bodies are recorded by kind and size only.
+
+load() reads segments back in time order and materialize() turns a
+sanitised value into a concrete one for benchmarks/replay_traffic.py.
+"""
+
+import glob
+import json
+import os
+import random
+import re
+import string
+import threading
+import time
+from datetime import datetime
+from io import BytesIO
+from urllib.parse import parse_qsl
+
+import jwt
+from flask import request
+
+# Fields whose string values are kept verbatim
+KEPT_FIELDS = frozenset({
+    'currency', 'amount', 'status', 'transaction_type', 'action_type', 'sort', 'order', 'role',
+    'cursor', 'include_total', 'document', 'type', 'is_blocked', 'is_verified',
+})
+
+# environ key the Flask hook fills with the matched URL rule
+RULE = 'traffic_capture.rule'
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_SHAPE = re.compile(r'^~([se])(\d+)$')
+
+
+class TrafficCapture:
+    """Flask extension installing the capture middleware around app.wsgi_app"""
+
+    def __init__(self, app=None):
+        self.middleware = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TRAFFIC_CAPTURE_ENABLED', False)
+        app.config.setdefault('TRAFFIC_CAPTURE_DIR', os.path.join(app.root_path, 'database', 'traffic'))
+        app.config.setdefault('TRAFFIC_CAPTURE_SAMPLE_RATE', 1.0)
+        app.config.setdefault('TRAFFIC_CAPTURE_SEGMENT_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('TRAFFIC_CAPTURE_MAX_BODY', 64 * 1024)
+
+        if not app.config['TRAFFIC_CAPTURE_ENABLED']:
+            return
+
+        self.middleware = CaptureMiddleware(
+            app.wsgi_app,
+            app.config['TRAFFIC_CAPTURE_DIR'],
+            sample_rate=app.config['TRAFFIC_CAPTURE_SAMPLE_RATE'],
+            segment_bytes=app.config['TRAFFIC_CAPTURE_SEGMENT_BYTES'],
+            max_body=app.config['TRAFFIC_CAPTURE_MAX_BODY'],
+        )
+        app.wsgi_app = self.middleware
+        app.extensions['traffic_capture'] = self
+        app.before_request(_note_rule)
+
+
+class CaptureMiddleware:
+    """WSGI middleware appending one sanitised record per sampled request"""
+
+    def __init__(self, wsgi_app, directory, sample_rate=1.0, segment_bytes=64 * 1024 * 1024, max_body=64 * 1024):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.segment_bytes = segment_bytes
+        self.max_body = max_body
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def __call__(self, environ, start_response):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.wsgi_app(environ, start_response)
+
+        record = {
+            't': round(time.time(), 6),
+            'm': environ.get('REQUEST_METHOD', 'GET'),
+            'p': environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', ''),
+            'q': sanitize(_query(environ.get('QUERY_STRING', ''))),
+            'a': _principal(environ),
+        }
+        record['k'], record['b'] = self._body(environ)
+        with self._lock:
+            self.in_flight += 1
+            record['c'] = self.in_flight
+        started = time.perf_counter()
+        response = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, capture_start_response)
+        except Exception:
+            self._finish(record, environ, started, 500, 0)
+            raise
+        return _CountingBody(body, lambda size: self._finish(record, environ, started, response.get('status'), size))
+
+    def _body(self, environ):
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if not length:
+            return None, None
+        content_type = environ.get('CONTENT_TYPE', '')
+        if 'json' not in content_type:
+            kind = 'form' if 'form' in content_type else 'other'
+            return kind, {'~bytes': length}
+        if length > self.max_body:
+            return 'json', {'~bytes': length}
+        # Buffer the body so the app can still read it
+        data = environ['wsgi.input'].read(length)
+        environ['wsgi.input'] = BytesIO(data)
+        try:
+            return 'json', sanitize(json.loads(data))
+        except ValueError:
+            return 'json', {'~bytes': length}
+
+    def _finish(self, record, environ, started, status, size):
+        record['d'] = round((time.perf_counter() - started) * 1000, 3)
+        record['r'] = environ.get(RULE)
+        record['s'] = status
+        record['z'] = size
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self.in_flight -= 1
+            try:
+                self._segment().write(line)
+            except OSError:
+                pass
+
+    def _segment(self):
+        # Per process: a forked worker opens its own segment
+        if self._file is not None and (self._pid != os.getpid() or self._file.tell() >= self.segment_bytes):
+            if self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._pid = os.getpid()
+            name = f'capture-{datetime.utcnow():%Y%m%dT%H%M%S%f}-{self._pid}.jsonl'
+            self._file = open(os.path.join(self.directory, name), 'a', buffering=1)
+        return self._file
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _CountingBody:
+    """Response iterable counting the bytes sent; reports them once sent or closed"""
+
+    def __init__(self, body, done):
+        self.body = body
+        self.done = done
+        self.size = 0
+        self.reported = False
+
+    def __iter__(self):
+        for chunk in self.body:
+            self.size += len(chunk)
+            yield chunk
+        self._report()
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self._report()
+
+    def _report(self):
+        if not self.reported:
+            self.reported = True
+            self.done(self.size)
+
+
+def sanitize(value, key=None):
+    """The shape of a query or JSON value, with free-form strings replaced by their length"""
+    if isinstance(value, dict):
+        return {name: sanitize(item, name) for name, item in value.items()}
+    if isinstance(value, list):
+        return [sanitize(item, key) for item in value]
+    if isinstance(value, str):
+        if key in KEPT_FIELDS:
+            return value
+        return f'~{"e" if _EMAIL.match(value) else "s"}{len(value)}'
+    return value
+
+
+def materialize(value, rng, key=None):
+    """A concrete value of the shape sanitize() recorded; strings are random, emails stay emails"""
+    if isinstance(value, dict):
+        return {name: materialize(item, rng, name) for name, item in value.items()}
+    if isinstance(value, list):
+        return [materialize(item, rng, key) for item in value]
+    if isinstance(value, str):
+        match = _SHAPE.match(value)
+        if match is None:
+            return value
+        kind, length = match.group(1), int(match.group(2))
+        if kind == 'e':
+            domain = '@replay.example'
+            return _random_text(rng, max(length - len(domain), 1)) + domain
+        return _random_text(rng, length)
+    return value
+
+
+def load(paths):
+    """Records from capture files (or directories of them), oldest first"""
+    files = []
+    for path in paths:
+        files += sorted(glob.glob(os.path.join(path, '*.jsonl'))) if os.path.isdir(path) else [path]
+    records = []
+    for path in files:
+        with open(path) as capture:
+            for line in capture:
+                if line.strip():
+                    records.append(json.loads(line))
+    records.sort(key=lambda record: record['t'])
+    return records
+
+
+def _random_text(rng, length):
+    # Digits first would make usernames look like ids; start with a letter
+    if length <= 0:
+        return ''
+    return rng.choice(string.ascii_lowercase) + ''.join(
+        rng.choice(string.ascii_lowercase + string.digits) for _ in range(length - 1)
+    )
+
+
+def _query(query_string):
+    query = {}
+    for name, value in parse_qsl(query_string, keep_blank_values=True):
+        query.setdefault(name, int(value) if value.isdigit() and len(value) < 16 else value)
+    return query
+
+
+def _principal(environ):
+    if environ.get('HTTP_X_ADMIN_KEY'):
+        return ['admin_key']
+    token = environ.get('HTTP_AUTHORIZATION', '')
+    if token.startswith('Bearer '):
+        token = token[7:]
+    if not token:
+        return None
+    try:
+        # Identity only; the routes verify the signature
+        claims = jwt.decode(token, options={'verify_signature': False})
+    except jwt.InvalidTokenError:
+        return ['invalid']
+    if 'admin_id' in claims:
+        return ['admin', claims['admin_id']]
+    if 'user_id' in claims:
+        return ['user', claims['user_id']]
+    return ['invalid']
+
+
+def _note_rule():
+    if request.url_rule is not None:
+        request.environ[RULE] = request.url_rule.rule
+
+
+traffic_capture = TrafficCapture()
@@ -0,0 +1,78 @@
+"""
+Request-scoped unit of work.
+
+Routes stage their changes on db.session (adding objects, flushing when
+they need generated ids, calling the balance engine) and never commit.
+Once the view has returned, the request's changes are committed exactly
+once if the response succeeded, or rolled back if it is an error (4xx or
+5xx). A request therefore either persists everything it did or nothing,
+and pays for one commit instead of one per step.
+
+A commit failure replaces the already-built success response with a 500,
+so a client is never told a write happened when it did not. Read-only
+requests are left alone: their session is closed at teardown as before,
+after any streamed body has been produced.
+"""
+
+from flask import current_app, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models.user import db
+
+WROTE = 'unit_of_work_wrote'
+
+
+class UnitOfWork:
+    """Flask extension committing or rolling back each request's session once"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['unit_of_work'] = self
+        app.after_request(self.finish)
+
+        if not event.contains(Session, 'after_flush', _note_flush):
+            event.listen(Session, 'after_flush', _note_flush)
+            event.listen(Session, 'do_orm_execute', _note_dml)
+            event.listen(Session, 'after_transaction_end', _forget_writes)
+
+    def finish(self, response):
+        """after_request hook: commit a successful request's writes, discard a failed one's"""
+        session = db.session()
+        if not (session.info.get(WROTE) or session.new or session.dirty or session.deleted):
+            return response
+
+        if response.status_code >= 400:
+            session.rollback()
+            return response
+
+        try:
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            current_app.logger.exception('Commit failed for %s', response.status)
+            failed = jsonify({'message': f'Failed to save changes: {str(e)}'})
+            failed.status_code = 500
+            return failed
+        return response
+
+
+def _note_flush(session, flush_context):
+    session.info[WROTE] = True
+
+
+def _note_dml(orm_execute_state):
+    # Core UPDATEs from the balance engine do not go through a flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[WROTE] = True
+
+
+def _forget_writes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(WROTE, None)
+
+
+unit_of_work = UnitOfWork()
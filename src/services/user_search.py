@@ -0,0 +1,117 @@
+"""
+Full-text search over users for the admin listing.
+
+On SQLite, user_search is an FTS5 index over username, email, first_name
+and last_name, using the trigram tokenizer. A term of three or more
+characters therefore matches any substring of those columns,
+case-insensitively, like the LIKE '%term%' scans it replaces, but through
+the index. Matches are ranked by bm25, best first.
+
+The index is an external-content table over user, so it stores only the
+trigrams. Triggers on user keep it in step with every insert, update and
+delete, whether it comes from the ORM, a Core bulk insert or a migration.
+db.create_all() and shard_router.create_all() install it alongside the
+user table, and migration 9 adds it to existing databases and fills it.
+
+Terms shorter than three characters, other databases and SQLite builds
+without FTS5 fall back to the LIKE scans.
+"""
+
+import weakref
+
+from sqlalchemy import column, event, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+
+from src.models.user import User, db
+from src.services.shards import shard_router
+
+INDEX = 'user_search'
+
+# Shortest term the trigram index can match
+MIN_TERM = 3
+
+_COLUMNS = ('username', 'email', 'first_name', 'last_name')
+
+_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX} USING fts5("
+    f"{', '.join(_COLUMNS)}, content='user', content_rowid='id', tokenize='trigram')",
+    f'CREATE TRIGGER IF NOT EXISTS {INDEX}_insert AFTER INSERT ON "user" BEGIN '
+    f"INSERT INTO {INDEX}(rowid, {', '.join(_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + name for name in _COLUMNS)}); END",
+    f'CREATE TRIGGER IF NOT EXISTS {INDEX}_delete AFTER DELETE ON "user" BEGIN '
+    f"INSERT INTO {INDEX}({INDEX}, rowid, {', '.join(_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + name for name in _COLUMNS)}); END",
+    f'CREATE TRIGGER IF NOT EXISTS {INDEX}_update AFTER UPDATE OF {", ".join(_COLUMNS)} ON "user" BEGIN '
+    f"INSERT INTO {INDEX}({INDEX}, rowid, {', '.join(_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + name for name in _COLUMNS)}); "
+    f"INSERT INTO {INDEX}(rowid, {', '.join(_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + name for name in _COLUMNS)}); END",
+]
+
+_index = table(INDEX, column('rowid'), column('rank'))
+
+# Engine -> whether its database has the index
+_available = weakref.WeakKeyDictionary()
+
+
+def install(conn):
+    """Create the index and its triggers on a SQLite connection; returns False where FTS5 is missing"""
+    if conn.dialect.name != 'sqlite':
+        return False
+    try:
+        # A savepoint, so a build without FTS5 leaves the transaction usable
+        with conn.begin_nested():
+            for statement in _DDL:
+                conn.execute(text(statement))
+    except OperationalError:
+        return False
+    return True
+
+
+def rebuild(conn):
+    """Re-read every user into the index"""
+    conn.execute(text(f"INSERT INTO {INDEX}({INDEX}) VALUES ('rebuild')"))
+
+
+def available():
+    """Whether every database holding users has the index"""
+    for engine in shard_router.engines():
+        if engine not in _available:
+            if engine.dialect.name != 'sqlite':
+                _available[engine] = False
+                continue
+            with engine.connect() as conn:
+                _available[engine] = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': INDEX}
+                ).first() is not None
+        if not _available[engine]:
+            return False
+    return True
+
+
+def search_users(query, term):
+    """Filter a User query to users matching term
+
+    Returns (query, rank): rank is the bm25 column to order by (lower is
+    better), or None when the term went through the LIKE fallback.
+    """
+    if len(term) >= MIN_TERM and available():
+        # A quoted FTS5 string is matched as one run of trigrams: a substring
+        phrase = '"' + term.replace('"', '""') + '"'
+        rank = _index.c.rank
+        query = query.join(_index, _index.c.rowid == User.id).filter(
+            literal_column(INDEX).op('MATCH')(phrase)
+        )
+        return query, rank
+    return query.filter(or_(*(getattr(User, name).contains(term) for name in _COLUMNS))), None
+
+
+@event.listens_for(User.__table__, 'after_create')
+def _install_with_table(target, connection, **kw):
+    install(connection)
+
+
+@event.listens_for(User.__table__, 'before_drop')
+def _drop_with_table(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f'DROP TABLE IF EXISTS {INDEX}'))
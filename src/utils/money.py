@@ -0,0 +1,69 @@
+"""
+Currency scale registry and minor-unit conversion.
+
+Balances, amounts and fees are stored as integers in each currency's minor
+unit; Decimal conversion only happens where values enter or leave the API.
+ETH is kept in gwei rather than wei because 64-bit INTEGER columns overflow
+at about 9.2 ETH in wei.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+# Decimal places of each currency's stored minor unit
+CURRENCY_SCALES = {
+    'BTC': 8,   # satoshi
+    'ETH': 9,   # gwei
+    'USDT': 6,  # micro-USDT, the token's native precision
+}
+
+DEFAULT_SCALE = 8
+
+# Largest value a signed 64-bit INTEGER column holds
+MAX_UNITS = 2 ** 63 - 1
+
+
+def scale_for(currency):
+    return CURRENCY_SCALES.get(currency, DEFAULT_SCALE)
+
+
+def to_units(value, currency):
+    """Convert a decimal amount into integer minor units; raises ValueError if it does not fit"""
+    try:
+        # A JSON number arrives as a float; its shortest repr is the literal
+        # the client sent, so it is held to the same scale as a string
+        amount = Decimal(repr(value) if isinstance(value, float) else str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError('Invalid amount format')
+    if not amount.is_finite():
+        raise ValueError('Invalid amount format')
+
+    units = amount.scaleb(scale_for(currency))
+    if units != units.to_integral_value():
+        raise ValueError(f'{currency} amounts support at most {scale_for(currency)} decimal places')
+    if abs(units) > MAX_UNITS:
+        raise ValueError('Amount is too large')
+    return int(units)
+
+
+def parse_amount(value, currency):
+    """Parse a client-supplied amount into positive minor units; raises ValueError"""
+    units = to_units(value, currency)
+    if units <= 0:
+        raise ValueError('Amount must be positive')
+    return units
+
+
+def from_units(units, currency):
+    """Convert integer minor units back into an exact Decimal"""
+    return Decimal(int(units or 0)).scaleb(-scale_for(currency))
+
+
+def to_float(units, currency):
+    """Minor units as a JSON number"""
+    return float(from_units(units, currency))
+
+
+def format_amount(units, currency):
+    """Minor units as a plain decimal string without trailing zeros, e.g. '0.5'"""
+    text = f'{from_units(units, currency):f}'
+    return text.rstrip('0').rstrip('.') if '.' in text else text
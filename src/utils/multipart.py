@@ -0,0 +1,87 @@
+"""
+Streaming multipart/form-data reader.
+
+Unlike request.files, file parts are never buffered as a whole: each chunk
+read from the request stream goes straight to a writer supplied by the
+caller (e.g. a blob-store writer hashing and spooling to disk). Only plain
+form fields are held in memory, and those are size-capped.
+"""
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+
+def read_multipart(stream, content_type, open_writer, chunk_size=64 * 1024,
+                   max_field_size=64 * 1024, max_parts=16):
+    """
+    Read a multipart body from stream.
+
+    open_writer(name, filename) returns an object with write(chunk) and
+    abort() for each file part, or None to discard that part. Returns (fields, writers): field values by name and the
+    writers of completed file parts by name. On error every writer opened so
+    far is aborted before the exception propagates.
+    """
+    mimetype, options = parse_options_header(content_type)
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise ValueError('Expected a multipart/form-data body with a boundary')
+
+    # The decoder's limit caps its internal buffer: one read plus a partial boundary or header block
+    decoder = MultipartDecoder(
+        boundary.encode(), max_form_memory_size=2 * max(chunk_size, max_field_size), max_parts=max_parts
+    )
+    fields = {}
+    writers = {}
+    opened = []
+    part = None
+    buffer = None
+    target = None
+
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            decoder.receive_data(chunk or None)
+
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, Field):
+                    part, buffer, target = event, bytearray(), None
+                elif isinstance(event, File):
+                    target = open_writer(event.name, event.filename)
+                    if target is not None:
+                        opened.append(target)
+                    part, buffer = event, None
+                elif isinstance(event, Data):
+                    if isinstance(part, Field):
+                        buffer += event.data
+                        if len(buffer) > max_field_size:
+                            raise RequestEntityTooLarge()
+                    elif target is not None:
+                        target.write(event.data)
+                    if not event.more_data:
+                        if isinstance(part, Field):
+                            fields[part.name] = buffer.decode('utf-8', 'replace')
+                        elif target is not None:
+                            writers[part.name] = target
+                        part, buffer, target = None, None, None
+                event = decoder.next_event()
+
+            if isinstance(event, Epilogue) or not chunk:
+                break
+    except BaseException:
+        for writer in opened:
+            writer.abort()
+        raise
+
+    if part is not None:
+        for writer in opened:
+            writer.abort()
+        raise ValueError('Truncated multipart body')
+
+    # Duplicate file fields replace earlier parts; drop the losers
+    for writer in opened:
+        if writer not in writers.values():
+            writer.abort()
+
+    return fields, writers
@@ -128,10 +128,11 @@ def test_admin_functionality():
         btc_wallet = Wallet.query.filter_by(user_id=user.id, currency='BTC').first()
         if btc_wallet:
             # Add crypto to wallet
-            from decimal import Decimal
+            from src.services.balances import credit
+            from src.utils.money import format_amount, to_units
             original_balance = btc_wallet.balance
-            amount_to_add = Decimal('0.01')
-            btc_wallet.balance += amount_to_add
+            amount_to_add = to_units('0.01', 'BTC')
+            credit(btc_wallet, amount_to_add)
             
             # Create transaction record
             transaction = Transaction(
@@ -159,16 +160,16 @@ def test_admin_functionality():
                 target_user_id=user.id,
                 action_details={
                     'currency': 'BTC',
-                    'amount': str(amount_to_add),
+                    'amount': format_amount(amount_to_add, 'BTC'),
                     'transaction_id': transaction.id
                 }
             )
             db.session.add(action)
             db.session.commit()
             
-            print(f"   ✅ Sent {amount_to_add} BTC to user")
-            print(f"   Previous balance: {original_balance}")
-            print(f"   New balance: {btc_wallet.balance}")
+            print(f"   ✅ Sent {format_amount(amount_to_add, 'BTC')} BTC to user")
+            print(f"   Previous balance: {format_amount(original_balance, 'BTC')}")
+            print(f"   New balance: {format_amount(btc_wallet.balance, 'BTC')}")
             print(f"   Transaction hash: {transaction.tx_hash}")
         else:
             print("   ❌ BTC wallet not found")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+App factory test.
+
+Builds several apps side by side with create_app() and checks that each
+one reads, commits and caches principals against its own database, however
+many apps were built after it.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from conftest import ADMIN_KEY_HEADERS, make_app
+from src.models.user import Wallet
+from test_balance_concurrency import balance_of
+from test_query_counts import seed
+
+
+def register(app, username):
+    response = app.test_client().post('/api/register', json={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'Factory123!'
+    })
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    return body['user']['id'], {'Authorization': f"Bearer {body['token']}"}
+
+
+@pytest.fixture(scope='module')
+def apps():
+    return make_app(), make_app()
+
+
+def test_reads_go_to_the_requests_own_app(apps):
+    first, second = apps
+    user_id, headers = register(first, 'factory_first')
+    client = first.test_client()
+
+    response = client.get('/api/wallets', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    response = client.get('/api/admin/users', headers=ADMIN_KEY_HEADERS)
+    assert [user['id'] for user in response.get_json()['users']] == [user_id]
+    response = second.test_client().get('/api/admin/users', headers=ADMIN_KEY_HEADERS)
+    assert response.get_json()['users'] == []
+
+
+def test_group_commit_writes_to_its_own_app(apps):
+    first, second = apps
+    for app in apps:
+        app.extensions['group_commit'].enabled = True
+    try:
+        user_id, _ = register(first, 'factory_grouped')
+        response = first.test_client().post('/api/admin/send', json={
+            'admin_key': 'alphazee09_admin_2024', 'user_id': user_id, 'currency': 'BTC', 'amount': '1'
+        })
+        assert response.status_code == 200, response.get_json()
+    finally:
+        for app in apps:
+            app.extensions['group_commit'].enabled = False
+    with first.app_context():
+        wallet_id = Wallet.query.filter_by(user_id=user_id, currency='BTC').one().id
+    assert balance_of(first, wallet_id) == 100000000
+    assert first.extensions['group_commit'].metrics()['writes'] == 1
+    assert second.extensions['group_commit'].metrics()['writes'] == 0
+
+
+def test_principals_are_cached_per_app():
+    first, second = make_app(), make_app()
+    # Fresh databases, so both users get the same id
+    first_id, first_headers = register(first, 'factory_blocked')
+    second_id, second_headers = register(second, 'factory_active')
+    assert first_id == second_id
+
+    assert first.test_client().get('/api/profile', headers=first_headers).status_code == 200
+    admin_headers = {'Authorization': f'Bearer {seed(first, 0)}'}
+    response = first.test_client().post(f'/api/admin/users/{first_id}/block', headers=admin_headers,
+                                        json={'reason': 'factory'})
+    assert response.status_code == 200, response.get_json()
+    assert first.test_client().get('/api/profile', headers=first_headers).status_code == 403
+
+    response = second.test_client().get('/api/profile', headers=second_headers)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['username'] == 'factory_active'
+
+
+if __name__ == "__main__":
+    print("=== App Factory Test ===")
+    print()
+
+    apps = make_app(), make_app()
+    test_reads_go_to_the_requests_own_app(apps)
+    print("   ✅ Each app reads its own database")
+    test_group_commit_writes_to_its_own_app(apps)
+    print("   ✅ Each app's group commits land in its own database")
+    test_principals_are_cached_per_app()
+    print("   ✅ Each app caches its own principals")
+
+    print()
+    print("✅ Apps built side by side stay independent!")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Audit log pipeline test.
+
+Checks that admin page views are logged off the request path, that
+state-changing actions are committed before the response, that a full
+queue applies backpressure instead of dropping entries, that a batch the
+database refuses is spilled and replayed, that retrying a committed batch
+writes nothing twice, and that entries go to the app that recorded them.
+"""
+
+import os
+import sys
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import make_app
+from src.models.user import AdminAction, User
+from src.services.audit_log import AuditLog, audit_log
+from src.utils.ids import new_ulid
+from test_query_counts import count_statements, seed
+
+
+def admin_headers(app):
+    return {'Authorization': f'Bearer {seed(app, 1)}'}
+
+
+def actions(app, action_type):
+    with app.app_context():
+        return AdminAction.query.filter_by(action_type=action_type).count()
+
+
+def test_views_are_logged_off_the_request_path(app):
+    headers = admin_headers(app)
+    before = actions(app, 'view_wallets')
+
+    # Hold the writer back so only the request's own statements are counted
+    with audit_log._write_lock, count_statements(app) as statements:
+        response = app.test_client().get('/api/admin/wallets', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert not any(statement.startswith('INSERT') for statement in statements), statements
+
+    audit_log.flush()
+    assert actions(app, 'view_wallets') == before + 1
+
+
+def test_state_changes_are_logged_durably(app):
+    headers = admin_headers(app)
+    with app.app_context():
+        user_id = User.query.filter_by(is_blocked=False).first().id
+    before = actions(app, 'block_user')
+
+    response = app.test_client().post(f'/api/admin/users/{user_id}/block', json={'reason': 'audit'}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    # No flush: the entry committed with the block itself
+    assert actions(app, 'block_user') == before + 1
+
+    app.test_client().post(f'/api/admin/users/{user_id}/unblock', headers=headers)
+
+
+def test_full_queue_applies_backpressure_without_dropping(app):
+    seed(app, 0)
+    log = AuditLog()
+    app.config['AUDIT_LOG_QUEUE_SIZE'] = 2
+    app.config['AUDIT_LOG_ENQUEUE_TIMEOUT'] = 0.01
+    try:
+        log.init_app(app)
+    finally:
+        app.config['AUDIT_LOG_QUEUE_SIZE'] = 10000
+        app.config['AUDIT_LOG_ENQUEUE_TIMEOUT'] = 0.05
+        app.extensions['audit_log'] = audit_log
+    log._stop.set()  # no background writer, so the queue stays full
+
+    with app.app_context():
+        admin_id = AdminAction.query.first().admin_id
+    before = actions(app, 'backpressure_test')
+    for _ in range(5):
+        log.record(admin_id, 'backpressure_test')
+
+    metrics = log.metrics()
+    assert metrics['queue_depth'] == 2
+    assert metrics['backpressure_waits'] == 3
+    assert metrics['overflow_writes'] == 3
+
+    log.flush()
+    assert actions(app, 'backpressure_test') == before + 5
+
+
+def stopped_log(app):
+    """An AuditLog for app without a background writer, so flush() does the writing"""
+    log = AuditLog()
+    log.init_app(app)
+    app.extensions['audit_log'] = audit_log
+    log._stop.set()
+    return log
+
+
+def test_refused_batches_are_spilled_and_replayed(app):
+    seed(app, 0)
+    log = stopped_log(app)
+    with app.app_context():
+        admin_id = AdminAction.query.first().admin_id
+    before = actions(app, 'spill_test')
+
+    def refuse(app, entries):
+        raise RuntimeError('database is locked')
+
+    log._insert = refuse
+    for _ in range(3):
+        log.record(admin_id, 'spill_test')
+    log.flush()
+    assert log.metrics()['spilled'] == 3 and log.metrics()['failed'] == 0
+    with open(app.config['AUDIT_LOG_SPILL_PATH']) as spill:
+        assert len(spill.readlines()) == 3
+    assert actions(app, 'spill_test') == before
+
+    # The next batch that lands brings the spilled ones with it
+    del log._insert
+    log.record(admin_id, 'spill_test')
+    log.flush()
+    assert log.metrics()['replayed'] == 3
+    assert not os.path.exists(app.config['AUDIT_LOG_SPILL_PATH'])
+    assert actions(app, 'spill_test') == before + 4
+
+
+def test_retried_batch_is_not_written_twice(app):
+    seed(app, 0)
+    log = stopped_log(app)
+    with app.app_context():
+        admin_id = AdminAction.query.first().admin_id
+    before = actions(app, 'retry_test')
+    entry = {
+        'admin_id': admin_id, 'action_type': 'retry_test', 'target_user_id': None, 'action_details': None,
+        'event_id': new_ulid(), 'created_at': datetime.utcnow()
+    }
+    log._write([(app, entry)])
+    # As if the first commit landed but reported an error
+    second = dict(entry, event_id=new_ulid())
+    log._write([(app, entry), (app, second)])
+
+    metrics = log.metrics()
+    assert metrics['already_written'] == 1
+    assert metrics['spilled'] == 0 and metrics['failed'] == 0
+    assert actions(app, 'retry_test') == before + 2
+
+
+def test_entries_go_to_the_recording_app(app):
+    headers = admin_headers(app)
+    before = actions(app, 'view_wallets')
+    # Hold the writer back so the entry is still queued when the next app starts
+    with audit_log._write_lock:
+        response = app.test_client().get('/api/admin/wallets', headers=headers)
+        assert response.status_code == 200, response.get_json()
+    other = make_app()
+    audit_log.flush()
+    assert actions(app, 'view_wallets') == before + 1
+    assert actions(other, 'view_wallets') == 0
+
+
+if __name__ == "__main__":
+    print("=== Audit Log Pipeline Test ===")
+    print()
+
+    app = make_app()
+    test_views_are_logged_off_the_request_path(app)
+    print("   ✅ Page views are logged off the request path")
+    test_state_changes_are_logged_durably(app)
+    print("   ✅ Blocking commits its audit entry with the change")
+    test_full_queue_applies_backpressure_without_dropping(app)
+    print("   ✅ A full queue applies backpressure without dropping entries")
+    test_refused_batches_are_spilled_and_replayed(app)
+    print("   ✅ Batches the database refuses are spilled to disk and replayed")
+    test_retried_batch_is_not_written_twice(app)
+    print("   ✅ Retrying a batch that already committed writes nothing twice")
+    test_entries_go_to_the_recording_app(app)
+    print("   ✅ Queued entries are written to the app that recorded them")
+
+    print()
+    print("✅ Audit log pipeline works!")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Background thread test.
+
+Checks that concurrent callers start a service's thread once, that a thread
+which has died is started again, and that a forked child starts its own
+instead of trusting the one it inherited from the parent.
+"""
+
+import os
+import sys
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.background import BackgroundThread
+
+
+def test_concurrent_callers_start_one_thread():
+    started = []
+    release = threading.Event()
+
+    def run():
+        started.append(threading.get_ident())
+        release.wait(5)
+
+    worker = BackgroundThread(run, 'test-worker')
+    callers = [threading.Thread(target=worker.ensure_started) for _ in range(16)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    release.set()
+    worker._thread.join(5)
+    assert len(started) == 1
+
+
+def test_dead_thread_is_restarted():
+    runs = []
+    worker = BackgroundThread(lambda: runs.append(1), 'test-worker')
+    worker.ensure_started()
+    worker._thread.join(5)
+    assert not worker.is_alive()
+    worker.ensure_started()
+    worker._thread.join(5)
+    assert len(runs) == 2
+
+
+def test_forked_child_starts_its_own_thread():
+    release = threading.Event()
+    worker = BackgroundThread(lambda: release.wait(5), 'test-worker')
+    worker.ensure_started()
+    assert worker.is_alive()
+
+    pid = os.fork()
+    if pid == 0:
+        # The parent's thread object came along, its thread did not
+        ok = not worker.is_alive()
+        worker.ensure_started()
+        ok = ok and worker.is_alive() and worker._pid == os.getpid()
+        os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    release.set()
+    assert os.WEXITSTATUS(status) == 0
+
+
+if __name__ == "__main__":
+    print("=== Background Thread Test ===")
+    print()
+
+    test_concurrent_callers_start_one_thread()
+    print("   ✅ Concurrent callers start a single thread")
+    test_dead_thread_is_restarted()
+    print("   ✅ A thread that has died is started again")
+    test_forked_child_starts_its_own_thread()
+    print("   ✅ A forked child starts its own thread")
+
+    print()
+    print("✅ Background threads start once per process!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Concurrent balance mutation stress test.
+
+Many threads send from one wallet at once while admins credit another. The
+wallet must end exactly at zero with one transaction per successful send
+(no double-spend, no overdraft) and every credit must land (no lost
+updates). Running the script directly also reports sends per second.
+"""
+
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+from conftest import make_app
+from src.models.user import db, User, Wallet, Transaction
+from src.routes.user import SECRET_KEY as USER_SECRET_KEY
+from src.utils.money import to_units
+
+THREADS = 8
+ATTEMPTS_PER_THREAD = 25
+AFFORDABLE_SENDS = 50
+AMOUNT = '0.01'
+AMOUNT_UNITS = to_units(AMOUNT, 'BTC')
+FEE_UNITS = to_units('0.001', 'BTC')  # BTC send fee
+
+_users = 0
+
+
+def make_wallet(app, balance, verified=True):
+    """Create a verified user with a BTC wallet holding balance satoshi"""
+    global _users
+    _users += 1
+    with app.app_context():
+        user = User(username=f'stress{_users}', email=f'stress{_users}@example.com',
+                    password_hash='x', is_verified=verified)
+        db.session.add(user)
+        db.session.flush()
+        wallet = Wallet(user_id=user.id, currency='BTC', balance=balance)
+        wallet.generate_address('BTC')
+        db.session.add(wallet)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, USER_SECRET_KEY, algorithm='HS256')
+        return user.id, wallet.id, {'Authorization': f'Bearer {token}'}
+
+
+def run_concurrently(app, work):
+    """Run work(client) ATTEMPTS_PER_THREAD times on each of THREADS threads"""
+    results = []
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        client = app.test_client()
+        start.wait()
+        for _ in range(ATTEMPTS_PER_THREAD):
+            status = work(client)
+            with lock:
+                results.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def balance_of(app, wallet_id):
+    with app.app_context():
+        return db.session.get(Wallet, wallet_id).balance
+
+
+def stress_sends(app):
+    user_id, wallet_id, headers = make_wallet(app, (AMOUNT_UNITS + FEE_UNITS) * AFFORDABLE_SENDS)
+    payload = {'currency': 'BTC', 'amount': AMOUNT, 'to_address': '1stressdestination'}
+
+    results, elapsed = run_concurrently(
+        app, lambda client: client.post('/api/send', json=payload, headers=headers).status_code
+    )
+
+    assert results.count(200) == AFFORDABLE_SENDS, results
+    assert results.count(400) == len(results) - AFFORDABLE_SENDS, results
+    assert balance_of(app, wallet_id) == 0
+    with app.app_context():
+        sends = Transaction.query.filter_by(user_id=user_id, transaction_type='send').count()
+    assert sends == AFFORDABLE_SENDS
+    return len(results) / elapsed
+
+
+def stress_credits(app):
+    user_id, wallet_id, headers = make_wallet(app, 0)
+    payload = {'admin_key': 'alphazee09_admin_2024', 'user_id': user_id, 'currency': 'BTC', 'amount': AMOUNT}
+
+    results, elapsed = run_concurrently(
+        app, lambda client: client.post('/api/admin/send', json=payload).status_code
+    )
+
+    assert results.count(200) == len(results), results
+    assert balance_of(app, wallet_id) == AMOUNT_UNITS * len(results)
+    return len(results) / elapsed
+
+
+def test_concurrent_sends_never_double_spend(app):
+    stress_sends(app)
+
+
+def test_concurrent_credits_are_not_lost(app):
+    stress_credits(app)
+
+
+def test_invalid_amounts_are_rejected(app):
+    user_id, wallet_id, headers = make_wallet(app, to_units('1', 'BTC'))
+    client = app.test_client()
+    for amount in ['-1', '0', 'NaN', 'Infinity', 'abc', '0.000000001']:
+        response = client.post('/api/send', json={'currency': 'BTC', 'amount': amount, 'to_address': 'x'}, headers=headers)
+        assert response.status_code == 400, (amount, response.get_json())
+    assert balance_of(app, wallet_id) == to_units('1', 'BTC')
+
+
+if __name__ == "__main__":
+    print("=== Concurrent Balance Stress Test ===")
+    print()
+
+    app = make_app()
+    rate = stress_sends(app)
+    print(f"   ✅ {THREADS} threads, {THREADS * ATTEMPTS_PER_THREAD} sends: exactly {AFFORDABLE_SENDS} succeeded, balance ended at 0")
+    print(f"      {rate:.0f} send requests/second")
+    rate = stress_credits(app)
+    print(f"   ✅ {THREADS * ATTEMPTS_PER_THREAD} concurrent credits all landed")
+    print(f"      {rate:.0f} credit requests/second")
+    test_invalid_amounts_are_rejected(app)
+    print("   ✅ Negative, zero, non-numeric and sub-satoshi amounts are rejected")
+
+    print()
+    print("✅ Balance mutations are race-free!")
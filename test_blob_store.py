@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Blob store test.
+
+Checks that identical bytes are stored once, that a blob only appears under
+its digest once it is completely written, that images are served with an
+ETag, conditional and Range support, and that migration 3 moves the legacy
+inline base64 images of an old database into the store unchanged.
+"""
+
+import atexit
+import base64
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+from conftest import make_app
+from src.models.user import db, Blob, KYCRecord, User
+from src.routes.user import SECRET_KEY as USER_SECRET_KEY
+from src.services.blob_store import blob_storage
+from test_query_counts import seed
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+JPEG = b'\xff\xd8\xff\xe0' + b'selfie' * 100
+
+# user and kyc_record as they were before migration 1
+LEGACY_SCHEMA = [
+    'CREATE TABLE user ('
+    'id INTEGER NOT NULL, username VARCHAR(80) NOT NULL, email VARCHAR(120) NOT NULL, '
+    'password_hash VARCHAR(255) NOT NULL, first_name VARCHAR(50), last_name VARCHAR(50), '
+    'phone VARCHAR(20), profile_image TEXT, fingerprint_enabled BOOLEAN, is_verified BOOLEAN, '
+    'created_at DATETIME, updated_at DATETIME, '
+    'PRIMARY KEY (id), UNIQUE (username), UNIQUE (email))',
+    'CREATE TABLE kyc_record ('
+    'id INTEGER NOT NULL, user_id INTEGER NOT NULL, document_type VARCHAR(50) NOT NULL, '
+    'document_number VARCHAR(100) NOT NULL, document_front TEXT NOT NULL, document_back TEXT, '
+    'selfie_image TEXT NOT NULL, status VARCHAR(20), submitted_at DATETIME, reviewed_at DATETIME, '
+    'reviewer_notes TEXT, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id))',
+]
+
+
+def stored_files(app):
+    root = app.config['BLOB_STORAGE_PATH']
+    return sorted(
+        os.path.join(path, name)
+        for path, dirs, names in os.walk(root)
+        if os.path.relpath(path, root).split(os.sep)[0] != 'tmp'
+        for name in names
+    )
+
+
+def leftover_temp_files(app):
+    tmp_dir = os.path.join(app.config['BLOB_STORAGE_PATH'], 'tmp')
+    return os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else []
+
+
+def user_with_image(app, username, image):
+    """Create a user and upload image as their profile picture; returns (user id, headers)"""
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    headers = {'Authorization': f"Bearer {jwt.encode({'user_id': user_id}, USER_SECRET_KEY, algorithm='HS256')}"}
+    data_url = 'data:image/png;base64,' + base64.b64encode(image).decode()
+    response = app.test_client().put('/api/profile', json={'profile_image': data_url}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return user_id, headers
+
+
+def test_identical_bytes_are_stored_once(app):
+    before = stored_files(app)
+    first, _ = user_with_image(app, 'dedupe_a', PNG)
+    second, _ = user_with_image(app, 'dedupe_b', PNG)
+
+    with app.app_context():
+        digests = {db.session.get(User, user_id).profile_image_blob for user_id in (first, second)}
+        assert len(digests) == 1
+        blob = db.session.get(Blob, digests.pop())
+        assert blob.size == len(PNG) and blob.content_type == 'image/png'
+    assert len(stored_files(app)) == len(before) + 1
+
+
+def test_concurrent_identical_uploads_all_succeed(app):
+    data = b'uploaded twice at once' * 1000
+    digest = hashlib.sha256(data).hexdigest()
+    start = threading.Barrier(8)
+    errors = []
+
+    def upload():
+        with app.app_context():
+            start.wait()
+            try:
+                assert blob_storage.store(data) == digest
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with app.app_context():
+        assert Blob.query.filter_by(digest=digest).count() == 1
+
+
+def test_blob_appears_only_when_complete(app):
+    backend = blob_storage.backend
+    data = b'never half written' * 1000
+    digest = hashlib.sha256(data).hexdigest()
+
+    real_replace = os.replace
+
+    def interrupted(source, target):
+        raise OSError('disk full')
+
+    # A crash before the rename leaves neither the blob nor its temp file
+    os.replace = interrupted
+    try:
+        backend.put(data)
+        assert False, 'put() should have failed'
+    except OSError:
+        pass
+    finally:
+        os.replace = real_replace
+    assert not backend.exists(digest)
+    assert leftover_temp_files(app) == []
+
+    # A streamed blob is invisible until commit, and an aborted one leaves nothing
+    writer = backend.writer()
+    writer.write(data[:100])
+    assert not backend.exists(digest)
+    writer.abort()
+    assert leftover_temp_files(app) == []
+
+    writer = backend.writer()
+    for start in range(0, len(data), 4096):
+        writer.write(data[start:start + 4096])
+    assert writer.commit() == digest
+    with backend.open(digest) as stored:
+        assert stored.read() == data
+    assert leftover_temp_files(app) == []
+
+
+def test_images_are_served_with_etag_and_range(app):
+    user_id, _ = user_with_image(app, 'served', PNG)
+    client = app.test_client()
+    url = f'/api/users/{user_id}/profile-image'
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == PNG
+    assert response.mimetype == 'image/png'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    etag = response.headers['ETag']
+    with app.app_context():
+        assert etag.strip('"') == db.session.get(User, user_id).profile_image_blob
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    response = client.get(url, headers={'Range': 'bytes=8-15'})
+    assert response.status_code == 206
+    assert response.data == PNG[8:16]
+    assert response.headers['Content-Range'] == f'bytes 8-15/{len(PNG)}'
+
+
+def legacy_app():
+    """An app on a database in the pre-blob-store shape, seeded with inline images, then migrated"""
+    scratch = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, scratch, True)
+    path = os.path.join(scratch, 'legacy.db')
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA:
+        conn.execute(statement)
+    profile = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+    conn.execute(
+        "INSERT INTO user (id, username, email, password_hash, profile_image) VALUES "
+        "(1, 'legacy', 'legacy@example.com', 'x', ?), "
+        "(2, 'linked', 'linked@example.com', 'x', 'https://example.com/avatar.png'), "
+        "(3, 'plain', 'plain@example.com', 'x', NULL)",
+        (profile,)
+    )
+    conn.execute(
+        "INSERT INTO kyc_record (id, user_id, document_type, document_number, document_front, document_back, "
+        "selfie_image, status) VALUES (1, 1, 'passport', 'P123', ?, NULL, ?, 'pending')",
+        (base64.b64encode(PNG).decode(), base64.b64encode(JPEG).decode())
+    )
+    conn.commit()
+    conn.close()
+    return make_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+
+
+def test_migration_moves_legacy_images_into_the_store():
+    app = legacy_app()
+
+    with app.app_context():
+        columns = {row[1] for row in db.session.execute(db.text('PRAGMA table_info(user)'))}
+        assert 'profile_image' not in columns and 'profile_image_blob' in columns
+
+        legacy = db.session.get(User, 1)
+        with blob_storage.backend.open(legacy.profile_image_blob) as stored:
+            assert stored.read() == PNG
+        # Same bytes as the profile picture, so the KYC front shares its blob
+        kyc = db.session.get(KYCRecord, 1)
+        assert kyc.document_front_blob == legacy.profile_image_blob
+        assert kyc.document_back_blob is None
+        assert db.session.get(Blob, kyc.selfie_image_blob).content_type == 'image/jpeg'
+
+        # A value that was never base64 is kept byte for byte
+        linked = db.session.get(User, 2)
+        with blob_storage.backend.open(linked.profile_image_blob) as stored:
+            assert stored.read() == b'https://example.com/avatar.png'
+        assert db.session.get(User, 3).profile_image_blob is None
+        assert Blob.query.count() == 3
+
+    client = app.test_client()
+    response = client.get('/api/users/1/profile-image')
+    assert response.status_code == 200 and response.data == PNG
+    assert response.mimetype == 'image/png'
+
+    headers = {'Authorization': f'Bearer {seed(app, 0)}'}
+    response = client.get('/api/admin/kyc/1/documents/selfie', headers=headers)
+    assert response.status_code == 200 and response.data == JPEG
+    response = client.get('/api/admin/kyc/1/documents/front', headers=headers)
+    assert response.status_code == 200 and response.data == PNG
+
+
+if __name__ == "__main__":
+    print("=== Blob Store Test ===")
+    print()
+
+    app = make_app()
+    test_identical_bytes_are_stored_once(app)
+    print("   ✅ Identical uploads are stored once")
+    test_concurrent_identical_uploads_all_succeed(app)
+    print("   ✅ Concurrent uploads of the same bytes all succeed")
+    test_blob_appears_only_when_complete(app)
+    print("   ✅ Blobs only appear under their digest once fully written")
+    test_images_are_served_with_etag_and_range(app)
+    print("   ✅ Images are served with ETag, If-None-Match and Range support")
+    test_migration_moves_legacy_images_into_the_store()
+    print("   ✅ Migration 3 moves legacy base64 images into the store intact")
+
+    print()
+    print("✅ Blob store works!")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Dashboard counter consistency test.
+
+Drives registrations, blocks, credits and sends through the API, then
+checks that the incrementally maintained counters match a full recount,
+and that reconciliation repairs drift from writes that bypass the ORM.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from conftest import ADMIN_KEY_HEADERS, make_app
+from src.models.user import db, User
+from src.services.dashboard_counters import dashboard_counters
+from test_query_counts import count_statements, seed
+
+_registered = 0
+
+
+def register(app):
+    global _registered
+    _registered += 1
+    response = app.test_client().post('/api/register', json={
+        'username': f'counter{_registered}',
+        'email': f'counter{_registered}@example.com',
+        'password': 'Counter123!'
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+def reconcile(app):
+    with app.app_context():
+        return dashboard_counters.reconcile()
+
+
+def test_counters_follow_writes(app):
+    admin_headers = {'Authorization': f'Bearer {seed(app, 2)}'}
+    reconcile(app)
+    client = app.test_client()
+
+    registered = register(app)
+    user_id = registered['user']['id']
+    user_headers = {'Authorization': f"Bearer {registered['token']}"}
+
+    response = client.post('/api/admin/send', json={
+        'admin_key': 'alphazee09_admin_2024', 'user_id': user_id, 'currency': 'BTC', 'amount': '0.5'
+    })
+    assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        db.session.get(User, user_id).is_verified = True
+        db.session.commit()
+    response = client.post('/api/send', json={'currency': 'BTC', 'amount': '0.1', 'to_address': '1counter'}, headers=user_headers)
+    assert response.status_code == 200, response.get_json()
+
+    response = client.post(f'/api/admin/users/{user_id}/block', json={'reason': 'counter'}, headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+
+    assert reconcile(app) == {}
+
+
+def test_reconcile_repairs_drift(app):
+    register(app)
+    reconcile(app)
+    with app.app_context():
+        db.session.execute(text("UPDATE wallet SET balance = balance + 7 WHERE currency = 'ETH'"))
+        db.session.commit()
+        wallets = db.session.execute(text("SELECT COUNT(*) FROM wallet WHERE currency = 'ETH'")).scalar()
+
+    assert reconcile(app) == {'balance:ETH': 7 * wallets}
+    assert reconcile(app) == {}
+
+
+def test_stats_read_counters_not_tables(app):
+    seed(app, 1)
+    client = app.test_client()
+    client.get('/api/admin/stats', headers=ADMIN_KEY_HEADERS)
+    with count_statements(app) as statements:
+        response = client.get('/api/admin/stats', headers=ADMIN_KEY_HEADERS)
+    assert response.status_code == 200
+    assert not any('count(' in statement.lower() for statement in statements), statements
+
+
+if __name__ == "__main__":
+    print("=== Dashboard Counter Test ===")
+    print()
+
+    app = make_app()
+    test_counters_follow_writes(app)
+    print("   ✅ Register, credit, send and block keep counters exact")
+    test_reconcile_repairs_drift(app)
+    print("   ✅ Reconciliation repairs drift from raw SQL writes")
+    test_stats_read_counters_not_tables(app)
+    print("   ✅ Stats read counters without COUNT scans")
+
+    print()
+    print("✅ Dashboard counters are consistent!")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Database engine profile test.
+
+Checks that every pooled SQLite connection carries the production pragmas,
+that GET requests read through the query-only pool while writes and the
+auth check's principal load stay on the write pool, that verification
+catches a profile that did not apply, and that building the app never
+connects while forking drops every pool.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from conftest import make_app
+from src.services.db_engine import READ_ONLY, DatabaseEngine
+from test_balance_concurrency import make_wallet
+
+
+@contextmanager
+def statements_by_engine(app):
+    """Collect executed statements per engine name"""
+    seen = {}
+    listeners = []
+    engines = app.extensions['db_engine'].engines()
+    for key, engine in engines.items():
+        statements = seen.setdefault(key or 'default', [])
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany, statements=statements):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        listeners.append((engine, before_cursor_execute))
+    try:
+        yield seen
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+
+def test_connections_carry_the_profile(app):
+    for key, engine in app.extensions['db_engine'].engines().items():
+        with engine.connect() as conn:
+            pragma = lambda name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+            assert pragma('journal_mode') == 'wal'
+            assert pragma('synchronous') == 1
+            assert pragma('busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT']
+            assert pragma('query_only') == (key == READ_ONLY)
+
+
+def test_get_requests_read_from_the_read_pool(app):
+    user_id, wallet_id, headers = make_wallet(app, 0)
+    with statements_by_engine(app) as seen:
+        response = app.test_client().get('/api/wallets', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    # Only the auth check's principal load stays on the primary
+    assert seen['readonly'] and all('FROM user' in statement for statement in seen['default']), seen
+    assert not any('FROM user' in statement for statement in seen['readonly']), seen
+
+
+def test_writes_stay_on_the_write_pool(app):
+    user_id, wallet_id, headers = make_wallet(app, 0)
+    with statements_by_engine(app) as seen:
+        response = app.test_client().put('/api/profile', json={'first_name': 'Pooled'}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert seen['default'] and not seen['readonly'], seen
+
+
+def test_read_pool_rejects_writes(app):
+    with app.extensions['db_engine'].engines()[READ_ONLY].connect() as conn:
+        with pytest.raises(OperationalError, match='readonly'):
+            conn.exec_driver_sql("UPDATE user SET first_name = 'nope'")
+
+
+def test_verify_reports_a_profile_that_did_not_apply(app):
+    original = app.config['SQLITE_BUSY_TIMEOUT']
+    app.config['SQLITE_BUSY_TIMEOUT'] = original + 1
+    try:
+        with pytest.raises(RuntimeError, match='busy_timeout'):
+            app.extensions['db_engine'].verify()
+    finally:
+        app.config['SQLITE_BUSY_TIMEOUT'] = original
+
+
+def test_create_app_does_not_connect():
+    # A fresh interpreter, so the build is the only thing that could connect
+    scratch = tempfile.mkdtemp()
+    try:
+        path = os.path.join(scratch, 'app.db')
+        subprocess.run([sys.executable, '-c', (
+            'from src.main import create_app; '
+            f"create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{path}', 'PRICE_FEED_BACKGROUND': False}})"
+        )], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        assert os.listdir(scratch) == []
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def test_forked_child_drops_every_pool():
+    scratch = tempfile.mkdtemp()
+    try:
+        forked = Flask(__name__)
+        forked.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(scratch, "app.db")}'
+        DatabaseEngine(forked)
+        engines = forked.extensions['db_engine']
+        engines.verify()
+        assert all(engine.pool.checkedin() for engine in engines.engines().values())
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if not any(engine.pool.checkedin() for engine in engines.engines().values()) else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        engines.dispose()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("=== Database Engine Profile Test ===")
+    print()
+
+    app = make_app()
+    test_connections_carry_the_profile(app)
+    print("   ✅ Every pooled connection runs WAL, synchronous=NORMAL and the busy timeout")
+    test_get_requests_read_from_the_read_pool(app)
+    print("   ✅ GET requests read through the query-only pool, auth checks through the primary")
+    test_writes_stay_on_the_write_pool(app)
+    print("   ✅ Write requests stay on the write pool")
+    test_read_pool_rejects_writes(app)
+    print("   ✅ The read pool rejects writes")
+    test_verify_reports_a_profile_that_did_not_apply(app)
+    print("   ✅ Verification reports pragmas that did not apply")
+    test_create_app_does_not_connect()
+    print("   ✅ Building the app never connects to the database")
+    test_forked_child_drops_every_pool()
+    print("   ✅ A forked child drops every pooled connection it inherited")
+
+    print()
+    print("✅ Database engine profile is in force!")
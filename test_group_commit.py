@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Group commit test.
+
+Reruns the concurrent balance stress with GROUP_COMMIT_ENABLED: sends that
+share a batch with failing ones must still commit, failing ones must roll
+back alone, and concurrent writes must actually share commits.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+from conftest import make_app
+from src.models.user import db, Admin, AdminAction
+from src.routes.admin import SECRET_KEY as ADMIN_SECRET_KEY
+from test_balance_concurrency import AMOUNT, AMOUNT_UNITS, balance_of, make_wallet, stress_credits, stress_sends
+
+
+@contextmanager
+def group_commit_enabled(app):
+    committer = app.extensions['group_commit']
+    committer.enabled = True
+    try:
+        yield
+    finally:
+        committer.enabled = False
+
+
+def test_grouped_sends_never_double_spend(app):
+    before = app.extensions['group_commit'].metrics()
+    with group_commit_enabled(app):
+        stress_sends(app)
+    after = app.extensions['group_commit'].metrics()
+    assert after['writes'] - before['writes'] == 200
+    assert after['batches'] - before['batches'] < 200
+    assert after['failed_batches'] == before['failed_batches']
+
+
+def test_grouped_credits_are_not_lost(app):
+    with group_commit_enabled(app):
+        stress_credits(app)
+
+
+def test_grouped_admin_send_commits_audit_entry(app):
+    user_id, wallet_id, headers = make_wallet(app, 0)
+    with app.app_context():
+        admin = Admin.query.filter_by(username='groupadmin').first()
+        if admin is None:
+            admin = Admin(username='groupadmin', email='groupadmin@example.com', password_hash='x', role='admin')
+            db.session.add(admin)
+            db.session.commit()
+        token = jwt.encode({'admin_id': admin.id}, ADMIN_SECRET_KEY, algorithm='HS256')
+
+    # The legacy X-Admin-Key route registered first shadows this URL, so
+    # dispatch to the JWT admin view directly
+    view = app.view_functions['admin.admin_send_crypto']
+    with group_commit_enabled(app), app.test_request_context(
+        '/api/admin/send-crypto', method='POST',
+        json={'user_id': user_id, 'currency': 'BTC', 'amount': AMOUNT},
+        headers={'Authorization': f'Bearer {token}'}
+    ):
+        response = app.make_response(view())
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert body['updated_balance'] == float(AMOUNT)
+    assert balance_of(app, wallet_id) == AMOUNT_UNITS
+    with app.app_context():
+        action = AdminAction.query.filter_by(target_user_id=user_id, action_type='send_crypto').one()
+        assert action.action_details['transaction_id'] == body['transaction']['id']
+
+
+if __name__ == "__main__":
+    print("=== Group Commit Test ===")
+    print()
+
+    app = make_app()
+    test_grouped_sends_never_double_spend(app)
+    metrics = app.extensions['group_commit'].metrics()
+    print(f"   ✅ 200 grouped sends: exactly 50 succeeded in {metrics['batches']} commits (largest batch {metrics['max_batch_seen']})")
+    test_grouped_credits_are_not_lost(app)
+    print("   ✅ Grouped concurrent credits all landed")
+    test_grouped_admin_send_commits_audit_entry(app)
+    print("   ✅ Admin send commits its audit entry in the same batch")
+
+    print()
+    print("✅ Group commit keeps every write's outcome!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Time-ordered ID test.
+
+Checks that IDs generated concurrently never collide, that each thread
+sees them strictly increasing and that their embedded time supports range
+scans.
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.utils.ids import decode_ulid, new_tx_hash, new_ulid, ulid_floor, ulid_timestamp
+
+THREADS = 8
+PER_THREAD = 20000
+
+
+def test_concurrent_ids_are_unique_and_ordered():
+    results = [[] for _ in range(THREADS)]
+
+    def worker(out):
+        for _ in range(PER_THREAD):
+            out.append(new_ulid())
+
+    threads = [threading.Thread(target=worker, args=(out,)) for out in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for ids in results:
+        assert ids == sorted(ids)
+        assert all(decode_ulid(a) < decode_ulid(b) for a, b in zip(ids, ids[1:]))
+    assert len({value for ids in results for value in ids}) == THREADS * PER_THREAD
+
+
+def test_tx_hashes_sort_by_creation():
+    hashes = [new_tx_hash() for _ in range(1000)]
+    assert hashes == sorted(hashes)
+    assert all(len(value) == 66 for value in hashes)
+
+
+def test_ulid_time_range():
+    before = datetime.utcnow() - timedelta(milliseconds=1)
+    value = new_ulid()
+    assert ulid_floor(before) < value
+    assert abs(ulid_timestamp(value) - datetime.utcnow()) < timedelta(seconds=5)
+
+
+if __name__ == "__main__":
+    print("=== Time-Ordered ID Test ===")
+    print()
+
+    test_concurrent_ids_are_unique_and_ordered()
+    print(f"   ✅ {THREADS * PER_THREAD} concurrent IDs, no collisions, increasing per thread")
+    test_tx_hashes_sort_by_creation()
+    print("   ✅ Transaction hashes sort by creation time")
+    test_ulid_time_range()
+    print("   ✅ Embedded timestamps map time ranges to key ranges")
+
+    print()
+    print("✅ ID generation works!")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Streaming KYC upload test.
+
+Posts real multipart/form-data bodies to /api/kyc and feeds the reader
+directly. Document parts must reach the blob store in bounded chunks rather
+than as whole files, oversized and malformed bodies must be refused, and a
+refused upload must leave no temp files or Blob rows behind.
+"""
+
+import io
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from conftest import make_app
+from src.models.user import db, Blob, KYCRecord, User
+from src.routes.user import SECRET_KEY as USER_SECRET_KEY
+from src.utils.multipart import read_multipart
+from test_query_counts import seed
+
+MAX_CONTENT_LENGTH = 256 * 1024
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 64
+JPEG = b'\xff\xd8\xff\xe0' + b'selfie' * 2000
+
+BOUNDARY = 'kycboundary'
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    return {'MAX_CONTENT_LENGTH': MAX_CONTENT_LENGTH}
+
+
+def user_headers(app, username):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, USER_SECRET_KEY, algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def multipart_body(fields, files):
+    """Encode fields and (name, filename, bytes) files as a multipart/form-data body"""
+    body = bytearray()
+    for name, value in fields.items():
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n').encode()
+    for name, filename, data in files:
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode()
+        body += data + b'\r\n'
+    body += f'--{BOUNDARY}--\r\n'.encode()
+    return bytes(body)
+
+
+def post_kyc(app, headers, body):
+    return app.test_client().post(
+        '/api/kyc', data=body, headers=headers, content_type=f'multipart/form-data; boundary={BOUNDARY}'
+    )
+
+
+def leftovers(app):
+    """Temp files in the blob store and Blob rows, to check a refused upload left nothing"""
+    tmp_dir = os.path.join(app.config['BLOB_STORAGE_PATH'], 'tmp')
+    with app.app_context():
+        rows = Blob.query.count()
+    return (os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else []), rows
+
+
+def test_multipart_upload_is_stored_and_served(app):
+    headers = user_headers(app, 'kyc_upload')
+    response = app.test_client().post('/api/kyc', headers=headers, content_type='multipart/form-data', data={
+        'document_type': 'passport',
+        'document_number': 'P1234567',
+        'document_front': (io.BytesIO(PNG), 'front.png'),
+        'selfie_image': (io.BytesIO(JPEG), 'selfie.jpg'),
+    })
+    assert response.status_code == 201, response.get_json()
+    kyc_id = response.get_json()['kyc']['id']
+
+    with app.app_context():
+        kyc = db.session.get(KYCRecord, kyc_id)
+        assert kyc.document_type == 'passport' and kyc.document_number == 'P1234567'
+        assert kyc.document_back_blob is None
+        assert db.session.get(Blob, kyc.document_front_blob).content_type == 'image/png'
+        assert db.session.get(Blob, kyc.selfie_image_blob).size == len(JPEG)
+
+    admin = {'Authorization': f'Bearer {seed(app, 0)}'}
+    client = app.test_client()
+    assert client.get(f'/api/admin/kyc/{kyc_id}/documents/front', headers=admin).data == PNG
+    assert client.get(f'/api/admin/kyc/{kyc_id}/documents/selfie', headers=admin).data == JPEG
+
+
+def test_oversized_uploads_are_refused(app):
+    before = leftovers(app)
+
+    # The whole body is over MAX_CONTENT_LENGTH
+    headers = user_headers(app, 'kyc_too_large')
+    body = multipart_body(
+        {'document_type': 'passport', 'document_number': 'P1'},
+        [('document_front', 'front.png', PNG * 20), ('selfie_image', 'selfie.jpg', JPEG)]
+    )
+    assert len(body) > MAX_CONTENT_LENGTH
+    response = post_kyc(app, headers, body)
+    assert response.status_code == 413, response.get_json()
+
+    # A plain form field is held in memory, so it has its own cap
+    body = multipart_body(
+        {'document_type': 'passport', 'document_number': 'P' * (65 * 1024)},
+        [('document_front', 'front.png', PNG), ('selfie_image', 'selfie.jpg', JPEG)]
+    )
+    assert len(body) < MAX_CONTENT_LENGTH
+    response = post_kyc(app, headers, body)
+    assert response.status_code == 413, response.get_json()
+
+    assert leftovers(app) == before
+    with app.app_context():
+        assert KYCRecord.query.filter(KYCRecord.user.has(username='kyc_too_large')).count() == 0
+
+
+def test_malformed_bodies_are_refused(app):
+    before = leftovers(app)
+    headers = user_headers(app, 'kyc_malformed')
+    body = multipart_body(
+        {'document_type': 'passport', 'document_number': 'P1'},
+        [('document_front', 'front.png', PNG), ('selfie_image', 'selfie.jpg', JPEG)]
+    )
+
+    # Cut off halfway through the selfie
+    response = post_kyc(app, headers, body[:len(body) - len(JPEG) // 2])
+    assert response.status_code == 400, response.get_json()
+
+    # No boundary to split on
+    response = app.test_client().post('/api/kyc', data=body, headers=headers, content_type='multipart/form-data')
+    assert response.status_code == 400, response.get_json()
+
+    # Required documents missing
+    response = post_kyc(app, headers, multipart_body({'document_type': 'passport', 'document_number': 'P1'}, []))
+    assert response.status_code == 400, response.get_json()
+
+    assert leftovers(app) == before
+
+
+class RecordingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.chunks = []
+        self.aborted = False
+
+    def write(self, chunk):
+        self.chunks.append(len(chunk))
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_file_parts_are_never_buffered_whole():
+    document = os.urandom(2 * 1024 * 1024)
+    body = multipart_body({'document_type': 'passport'}, [('document_front', 'front.png', document)])
+    stream = RecordingStream(body)
+    opened = []
+
+    def open_writer(name, filename):
+        opened.append(RecordingWriter())
+        return opened[-1]
+
+    chunk_size = 64 * 1024
+    fields, writers = read_multipart(
+        stream, f'multipart/form-data; boundary={BOUNDARY}', open_writer, chunk_size=chunk_size
+    )
+    assert fields == {'document_type': 'passport'}
+    writer = writers['document_front']
+    assert sum(writer.chunks) == len(document)
+    # Reads are bounded by the chunk size and writes by the decoder's buffer
+    # (a chunk plus a held-back partial boundary), never by the file size
+    assert all(0 < size <= chunk_size for size in stream.reads)
+    assert max(writer.chunks) <= 2 * chunk_size and len(writer.chunks) >= len(document) // (2 * chunk_size)
+
+    # An oversized field after a file part aborts the writer already opened
+    opened.clear()
+    closing = len(f'--{BOUNDARY}--\r\n')
+    file_part = multipart_body({}, [('document_front', 'front.png', PNG)])[:-closing]
+    body = file_part + multipart_body({'document_type': 'x' * (65 * 1024)}, [])
+    with pytest.raises(RequestEntityTooLarge):
+        read_multipart(io.BytesIO(body), f'multipart/form-data; boundary={BOUNDARY}', open_writer)
+    assert opened and all(writer.aborted for writer in opened)
+
+
+if __name__ == "__main__":
+    print("=== Streaming KYC Upload Test ===")
+    print()
+
+    app = make_app({'MAX_CONTENT_LENGTH': MAX_CONTENT_LENGTH})
+    test_multipart_upload_is_stored_and_served(app)
+    print("   ✅ A multipart KYC upload is stored and served back intact")
+    test_oversized_uploads_are_refused(app)
+    print("   ✅ Oversized bodies and form fields are refused with 413")
+    test_malformed_bodies_are_refused(app)
+    print("   ✅ Truncated and malformed bodies are refused with 400")
+    test_file_parts_are_never_buffered_whole()
+    print("   ✅ File parts stream through in bounded chunks")
+
+    print()
+    print("✅ KYC uploads stream into the blob store!")
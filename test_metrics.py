@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Request metrics test.
+
+Builds the app with metrics enabled. Each request must be recorded under
+its endpoint with its latency, SQL statement count and response size,
+/metrics must serve them in the Prometheus text format, and an app with
+metrics disabled must register nothing.
+"""
+
+import os
+import re
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from conftest import make_app
+from src.services.metrics import Metrics
+
+CONFIG = {'METRICS_ENABLED': True}
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    return CONFIG
+
+
+def sample(text, name, **labels):
+    """Value of one sample line in a Prometheus text payload"""
+    wanted = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    series = f'{name}{{{wanted}}}' if labels else name
+    match = re.search(rf'^{re.escape(series)} (\S+)$', text, re.MULTILINE)
+    assert match, f'{series} not in metrics'
+    return float(match.group(1))
+
+
+def test_requests_are_recorded_by_endpoint(app):
+    app.extensions['metrics'].clear()
+    engines = app.extensions['db_engine'].engines().values()
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    for read_engine in engines:
+        event.listen(read_engine, 'after_cursor_execute', on_execute)
+    try:
+        response = client.post('/api/register', json={
+            'username': 'metrics1', 'email': 'metrics1@example.com', 'password': 'Secret123!'
+        })
+    finally:
+        for read_engine in engines:
+            event.remove(read_engine, 'after_cursor_execute', on_execute)
+    assert response.status_code == 201, response.get_json()
+    token = response.get_json()['token']
+
+    response = client.get('/api/wallets', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    wallet_bytes = len(response.data)
+    assert client.get('/api/wallets').status_code == 401
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'http_request_duration_seconds_count', endpoint='user.register', method='POST', status='201') == 1
+    assert sample(text, 'http_request_duration_seconds_count', endpoint='user.get_wallets', method='GET', status='200') == 1
+    assert sample(text, 'http_request_duration_seconds_count', endpoint='user.get_wallets', method='GET', status='401') == 1
+    # Registration's commit happens after the view, and is counted too
+    assert sample(text, 'http_request_sql_statements_sum', endpoint='user.register', method='POST') == len(statements)
+    assert sample(text, 'http_request_sql_duration_seconds_count', endpoint='user.register', method='POST') == 1
+    assert sample(text, 'http_response_size_bytes_sum', endpoint='user.get_wallets', method='GET') >= wallet_bytes
+
+
+def test_metrics_endpoint_is_prometheus_text(app):
+    client = app.test_client()
+    # The SPA catch-all serves every GET, so only another method goes unmatched
+    client.post('/api/no-such-route')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    # The scrape itself is the one request in flight
+    assert sample(text, 'http_requests_in_flight') == 1
+    assert sample(text, 'http_request_duration_seconds_bucket',
+                  endpoint='unmatched', method='POST', status='405', le='+Inf') == 1
+    # Buckets are cumulative
+    buckets = [float(value) for value in re.findall(
+        r'^http_request_duration_seconds_bucket\{endpoint="unmatched",method="POST",status="405",le="[^"]+"\} (\S+)$',
+        text, re.MULTILINE
+    )]
+    assert buckets == sorted(buckets) and buckets[-1] == 1
+
+
+def test_disabled_metrics_register_nothing():
+    plain = Flask(__name__)
+    Metrics(plain)
+    assert 'metrics' not in plain.extensions
+    assert 'metrics' not in plain.view_functions
+    assert not plain.before_request_funcs and not plain.after_request_funcs
+    assert plain.test_client().get('/metrics').status_code == 404
+
+
+if __name__ == "__main__":
+    print("=== Request Metrics Test ===")
+    print()
+
+    app = make_app(CONFIG)
+    test_requests_are_recorded_by_endpoint(app)
+    print("   ✅ Latency, SQL statements and response size are recorded per endpoint")
+    test_metrics_endpoint_is_prometheus_text(app)
+    print("   ✅ /metrics serves cumulative histograms and the in-flight gauge")
+    test_disabled_metrics_register_nothing()
+    print("   ✅ Disabled metrics register no hooks and no endpoint")
+
+    print()
+    print("✅ Request metrics are exposed for Prometheus!")
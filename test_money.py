@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Minor-unit money test.
+
+Checks that amounts convert to and from each currency's integer minor unit
+exactly, that more decimal places than the unit holds are refused whether
+the amount arrives as a string or a JSON number, and that
+migration 4 turns the decimal balances, amounts, fees and gas prices of an
+old database into the same values in minor units.
+"""
+
+import os
+import sqlite3
+import sys
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+import pytest
+from conftest import make_app, scratch_dir
+from src.routes.user import SECRET_KEY as USER_SECRET_KEY
+from src.utils.money import MAX_UNITS, format_amount, from_units, parse_amount, to_float, to_units
+from test_blob_store import LEGACY_SCHEMA
+
+# wallet and transaction as they were before migration 4
+LEGACY_MONEY_SCHEMA = [
+    'CREATE TABLE wallet ('
+    'id INTEGER NOT NULL, user_id INTEGER NOT NULL, currency VARCHAR(10) NOT NULL, '
+    'address VARCHAR(255) NOT NULL, private_key VARCHAR(255) NOT NULL, balance NUMERIC(20, 8), '
+    'created_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id), UNIQUE (address))',
+    'CREATE TABLE "transaction" ('
+    'id INTEGER NOT NULL, user_id INTEGER NOT NULL, from_wallet_id INTEGER, to_wallet_id INTEGER, '
+    'from_address VARCHAR(255) NOT NULL, to_address VARCHAR(255) NOT NULL, currency VARCHAR(10) NOT NULL, '
+    'amount NUMERIC(20, 8) NOT NULL, fee NUMERIC(20, 8), tx_hash VARCHAR(255) NOT NULL, block_number INTEGER, '
+    'block_hash VARCHAR(255), gas_used INTEGER, gas_price NUMERIC(20, 8), contract_address VARCHAR(255), '
+    'token_id VARCHAR(255), status VARCHAR(20), transaction_type VARCHAR(20) NOT NULL, created_at DATETIME, '
+    'confirmed_at DATETIME, PRIMARY KEY (id), UNIQUE (tx_hash))',
+]
+
+# (id, currency, legacy balance, expected minor units)
+LEGACY_WALLETS = [
+    (1, 'BTC', '1.23456789', 123456789),
+    (2, 'ETH', '2.5', 2500000000),
+    (3, 'USDT', '100.123456', 100123456),
+    (4, 'DOGE', '0.00000001', 1),
+]
+
+# (id, currency, amount, fee, gas_price, expected amount, fee and gas_price)
+LEGACY_TRANSACTIONS = [
+    (1, 'BTC', '0.1', '0.0001', None, (10000000, 10000, None)),
+    # Admin transfers recorded the gas price in wei, generated ones in gwei
+    (2, 'ETH', '0.05', '0.00042', '20000000000', (50000000, 420000, 20)),
+    (3, 'ETH', '1', '0.000021', '21', (1000000000, 21000, 21)),
+    (4, 'ETH', '1', '0', '1000000', (1000000000, 0, 0)),
+    (5, 'USDT', '25.5', '1', '999999', (25500000, 1000000, 999999)),
+]
+
+
+def test_amounts_convert_exactly():
+    assert to_units('1.23456789', 'BTC') == 123456789
+    assert to_units('0.000000001', 'ETH') == 1
+    assert to_units('1.000001', 'USDT') == 1000001
+    assert to_units('0', 'BTC') == 0
+    assert to_units(Decimal('21000000'), 'BTC') == 2100000000000000
+    for currency, units in [('BTC', 123456789), ('ETH', 987654321012), ('USDT', 1000001)]:
+        assert to_units(from_units(units, currency), currency) == units
+    assert from_units(123456789, 'BTC') == Decimal('1.23456789')
+    assert from_units(None, 'ETH') == 0
+    assert to_float(50000000, 'BTC') == 0.5
+    assert format_amount(50000000, 'BTC') == '0.5'
+    assert format_amount(100000000, 'BTC') == '1'
+    assert format_amount(1500, 'USDT') == '0.0015'
+
+
+def test_json_floats_convert_like_strings():
+    assert to_units(2.675, 'USDT') == 2675000
+    assert to_units(0.5, 'BTC') == 50000000
+    assert to_units(0.123456789, 'ETH') == 123456789
+    assert to_units(1e-08, 'BTC') == 1
+    # A float carrying more places than the unit is refused, not rounded
+    for value, currency in [(0.1234567891, 'ETH'), (0.1 + 0.2, 'BTC'), (0.000000015, 'BTC'), (1.0000001, 'USDT')]:
+        with pytest.raises(ValueError, match='decimal places'):
+            to_units(value, currency)
+        with pytest.raises(ValueError, match='decimal places'):
+            to_units(repr(value), currency)
+
+
+def test_excess_precision_is_refused():
+    for value, currency in [
+        ('0.123456789', 'BTC'),
+        ('0.0000000001', 'ETH'),
+        ('1.0000001', 'USDT'),
+        ('0.000000001', 'UNKNOWN'),
+    ]:
+        with pytest.raises(ValueError, match='decimal places'):
+            to_units(value, currency)
+
+
+def test_invalid_amounts_are_refused():
+    for value in ['abc', '', None, 'NaN', 'Infinity', float('inf')]:
+        with pytest.raises(ValueError, match='Invalid amount format'):
+            to_units(value, 'BTC')
+    with pytest.raises(ValueError, match='too large'):
+        to_units(str(MAX_UNITS + 1), 'USDT')
+    assert to_units(from_units(MAX_UNITS, 'BTC'), 'BTC') == MAX_UNITS
+    for value in ['0', '-1', -0.5]:
+        with pytest.raises(ValueError, match='positive'):
+            parse_amount(value, 'BTC')
+
+
+def legacy_app():
+    """An app on a database in the pre-minor-unit shape, seeded with decimal amounts, then migrated"""
+    path = os.path.join(scratch_dir(), 'legacy.db')
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA + LEGACY_MONEY_SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT INTO user (id, username, email, password_hash) VALUES (1, 'legacy', 'legacy@example.com', 'x')")
+    for wallet_id, currency, balance, _ in LEGACY_WALLETS:
+        conn.execute(
+            'INSERT INTO wallet (id, user_id, currency, address, private_key, balance) VALUES (?, 1, ?, ?, ?, ?)',
+            (wallet_id, currency, f'address{wallet_id}', 'key', balance)
+        )
+    for tx_id, currency, amount, fee, gas_price, _ in LEGACY_TRANSACTIONS:
+        conn.execute(
+            'INSERT INTO "transaction" (id, user_id, from_address, to_address, currency, amount, fee, tx_hash, '
+            "gas_price, status, transaction_type) VALUES (?, 1, 'from', 'to', ?, ?, ?, ?, ?, 'confirmed', 'send')",
+            (tx_id, currency, amount, fee, f'hash{tx_id}', gas_price)
+        )
+    conn.commit()
+    conn.close()
+    return make_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'}), path
+
+
+def test_migration_converts_decimals_to_minor_units():
+    app, path = legacy_app()
+
+    conn = sqlite3.connect(path)
+    try:
+        wallets = {row[0]: row[1:] for row in conn.execute('SELECT id, balance, typeof(balance) FROM wallet')}
+        transactions = {row[0]: row[1:] for row in conn.execute(
+            'SELECT id, amount, fee, gas_price, typeof(amount) FROM "transaction"'
+        )}
+    finally:
+        conn.close()
+    for wallet_id, _, _, expected in LEGACY_WALLETS:
+        assert wallets[wallet_id] == (expected, 'integer')
+    for tx_id, _, _, _, _, expected in LEGACY_TRANSACTIONS:
+        assert transactions[tx_id] == (*expected, 'integer')
+
+    # The API serves the same amounts the old decimal columns held
+    token = jwt.encode({'user_id': 1}, USER_SECRET_KEY, algorithm='HS256')
+    response = app.test_client().get('/api/wallets', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200, response.get_json()
+    balances = {wallet['currency']: wallet['balance'] for wallet in response.get_json()}
+    assert balances == {currency: float(balance) for _, currency, balance, _ in LEGACY_WALLETS}
+
+
+if __name__ == "__main__":
+    print("=== Minor-Unit Money Test ===")
+    print()
+
+    test_amounts_convert_exactly()
+    print("   ✅ Amounts convert to and from minor units exactly")
+    test_json_floats_convert_like_strings()
+    print("   ✅ JSON floats convert, or are refused, like the same amount as a string")
+    test_excess_precision_is_refused()
+    print("   ✅ More decimal places than the unit holds are refused")
+    test_invalid_amounts_are_refused()
+    print("   ✅ Malformed, oversized and non-positive amounts are refused")
+    test_migration_converts_decimals_to_minor_units()
+    print("   ✅ Migration 4 converts legacy decimals and wei gas prices")
+
+    print()
+    print("✅ Money is stored in exact minor units!")
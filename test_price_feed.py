@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Price feed test.
+
+Replaces the CoinGecko fetch with a counting stand-in. Fresh quotes must
+come from memory, stale ones must be served at once while one background
+refresh runs, concurrent misses must share a single fetch, quotes must
+survive a restart through the CryptoPrices table, and an outage must
+neither block requests nor be retried before the backoff window ends.
+"""
+
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import make_app
+from src.models.user import CryptoPrices
+from src.services.price_feed import FALLBACK_PRICES, Quotes
+
+
+def quotes(price):
+    return [{'symbol': 'BTC', 'name': 'Bitcoin', 'price_usd': price, 'change_24h': 1.0,
+             'market_cap': 1000.0, 'volume_24h': 10.0}]
+
+
+class Upstream:
+    """Stand-in for PriceFeed._fetch: counts calls, can hold them or fail"""
+
+    def __init__(self, price=100.0):
+        self.price = price
+        self.calls = 0
+        self.error = None
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return quotes(self.price)
+
+
+def make_feed(app, upstream, **config):
+    saved = {key: app.config.get(key) for key in config}
+    app.config.update(config)
+    try:
+        feed = Quotes(app)
+    finally:
+        app.config.update(saved)
+    feed._fetch = upstream
+    return feed
+
+
+def settle(feed):
+    """Wait for the in-flight refresh and its write to the table"""
+    done = feed._inflight
+    if done is not None:
+        done.wait(5)
+    time.sleep(0.05)
+
+
+def clear_table(app):
+    with app.app_context():
+        CryptoPrices.query.delete()
+        CryptoPrices.query.session.commit()
+
+
+def test_fresh_quotes_come_from_memory(app):
+    clear_table(app)
+    upstream = Upstream()
+    feed = make_feed(app, upstream)
+    # A cold start does not wait for the upstream
+    assert feed.get_prices() == FALLBACK_PRICES
+    settle(feed)
+    assert feed.get_prices() == quotes(100.0)
+    assert feed.get_prices() == quotes(100.0)
+    assert upstream.calls == 1
+
+
+def test_stale_quotes_are_served_while_one_refresh_runs(app):
+    clear_table(app)
+    upstream = Upstream()
+    feed = make_feed(app, upstream, PRICE_FEED_TTL=0.1)
+    feed.get_prices()
+    settle(feed)
+
+    time.sleep(0.15)
+    upstream.price = 200.0
+    upstream.release.clear()
+    began = time.monotonic()
+    served = [feed.get_prices() for _ in range(20)]
+    assert time.monotonic() - began < 0.5
+    assert all(prices == quotes(100.0) for prices in served)
+    assert upstream.calls == 2
+
+    upstream.release.set()
+    settle(feed)
+    assert feed.get_prices() == quotes(200.0)
+
+
+def test_concurrent_misses_share_one_fetch(app):
+    clear_table(app)
+    upstream = Upstream()
+    upstream.release.clear()
+    feed = make_feed(app, upstream)
+    threads = [threading.Thread(target=feed.get_prices) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    upstream.release.set()
+    settle(feed)
+    assert upstream.calls == 1
+
+
+def test_quotes_survive_a_restart(app):
+    clear_table(app)
+    feed = make_feed(app, Upstream(price=300.0))
+    feed.get_prices()
+    settle(feed)
+
+    # A new process with the upstream down still serves the persisted quotes
+    down = Upstream()
+    down.error = ConnectionError('upstream down')
+    restarted = make_feed(app, down)
+    assert restarted.get_prices() == quotes(300.0)
+
+
+def test_outage_serves_fallback_without_waiting(app):
+    clear_table(app)
+    upstream = Upstream()
+    upstream.error = ConnectionError('upstream down')
+    feed = make_feed(app, upstream, PRICE_FEED_FAILURE_BACKOFF=0.3)
+    assert feed.get_prices() == FALLBACK_PRICES
+    settle(feed)
+    assert upstream.calls == 1
+
+    # Inside the backoff window nobody calls the upstream again
+    began = time.monotonic()
+    for _ in range(50):
+        assert feed.get_prices() == FALLBACK_PRICES
+    assert time.monotonic() - began < 0.5
+    assert upstream.calls == 1
+
+    # Once it has passed, the next request retries in the background
+    time.sleep(0.35)
+    upstream.error = None
+    assert feed.get_prices() == FALLBACK_PRICES
+    settle(feed)
+    assert upstream.calls == 2
+    assert feed.get_prices() == quotes(100.0)
+
+
+if __name__ == "__main__":
+    print("=== Price Feed Test ===")
+    print()
+
+    app = make_app()
+    test_fresh_quotes_come_from_memory(app)
+    print("   ✅ Fresh quotes are served from memory")
+    test_stale_quotes_are_served_while_one_refresh_runs(app)
+    print("   ✅ Stale quotes are served at once while one refresh runs")
+    test_concurrent_misses_share_one_fetch(app)
+    print("   ✅ Concurrent misses share a single upstream fetch")
+    test_quotes_survive_a_restart(app)
+    print("   ✅ Persisted quotes are served after a restart")
+    test_outage_serves_fallback_without_waiting(app)
+    print("   ✅ An outage serves fallback quotes at once and backs off")
+
+    print()
+    print("✅ Price feed never stalls requests!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Principal cache test for the auth decorators.
+
+Checks that a warm cache authenticates without touching the database and
+that blocking, unblocking and deactivation take effect on the next request.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+from src.models.user import db, Admin, User
+from conftest import make_app
+from src.routes.user import SECRET_KEY as USER_SECRET_KEY
+from test_query_counts import count_statements, seed
+
+
+def make_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, USER_SECRET_KEY, algorithm='HS256')
+        return user.id, {'Authorization': f'Bearer {token}'}
+
+
+def test_warm_cache_skips_auth_query(app):
+    user_id, headers = make_user(app, 'cacheuser')
+    client = app.test_client()
+
+    assert client.get('/api/wallets', headers=headers).status_code == 200
+    with count_statements(app) as statements:
+        assert client.get('/api/wallets', headers=headers).status_code == 200
+
+    assert not any('FROM user' in statement for statement in statements), statements
+
+
+def test_block_and_unblock_take_effect_immediately(app):
+    user_id, headers = make_user(app, 'blockeduser')
+    admin_headers = {'Authorization': f'Bearer {seed(app, 0)}'}
+    client = app.test_client()
+
+    assert client.get('/api/wallets', headers=headers).status_code == 200
+
+    response = client.post(f'/api/admin/users/{user_id}/block', json={'reason': 'test'}, headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+    response = client.get('/api/wallets', headers=headers)
+    assert response.status_code == 403
+    assert response.get_json()['blocked_reason'] == 'test'
+
+    response = client.post(f'/api/admin/users/{user_id}/unblock', headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+    assert client.get('/api/wallets', headers=headers).status_code == 200
+
+
+def test_admin_deactivation_takes_effect_immediately(app):
+    admin_headers = {'Authorization': f'Bearer {seed(app, 0)}'}
+    client = app.test_client()
+
+    assert client.get('/api/admin/actions', headers=admin_headers).status_code == 200
+
+    with app.app_context():
+        admin = Admin.query.filter_by(username='countadmin').first()
+        admin.is_active = False
+        db.session.commit()
+    try:
+        assert client.get('/api/admin/actions', headers=admin_headers).status_code == 401
+    finally:
+        with app.app_context():
+            admin = Admin.query.filter_by(username='countadmin').first()
+            admin.is_active = True
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    print("=== Principal Cache Test ===")
+    print()
+
+    app = make_app()
+    test_warm_cache_skips_auth_query(app)
+    print("   ✅ Warm cache authenticates without an auth query")
+    test_block_and_unblock_take_effect_immediately(app)
+    print("   ✅ Block and unblock apply on the next request")
+    test_admin_deactivation_takes_effect_immediately(app)
+    print("   ✅ Admin deactivation applies on the next request")
+
+    print()
+    print("✅ Principal cache invalidation works!")
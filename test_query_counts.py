@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+SQL statement budget test for the admin listing endpoints.
+
+Seeds a scratch database, calls each endpoint and counts the statements it
+issues. Each page must cost a constant number of statements regardless of
+how many rows it returns, so N+1 regressions fail here.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+from contextlib import contextmanager
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from conftest import ADMIN_KEY_HEADERS, make_app
+from src.models.user import db, User, Admin, Wallet, Transaction, AdminAction
+from src.routes.admin import SECRET_KEY as ADMIN_SECRET_KEY
+
+# Maximum statements per request, independent of page size
+STATEMENT_BUDGETS = {
+    '/api/admin/transactions': 1,   # keyset page
+    '/api/admin/stats': 2,          # dashboard counters + recent transactions
+    '/api/admin/crypto-transfers': 1,  # keyset page; auth comes from the principal cache
+    '/api/admin/users': 2,          # user page + wallets for that page
+}
+
+_seeded_users = 0
+
+
+@contextmanager
+def count_statements(app):
+    """Collect every SQL statement executed on the app's engines"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # GET requests read from the read-only pool, so watch every engine
+    engines = list(app.extensions['db_engine'].engines().values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed(app, users):
+    """Add users, each with a wallet, a transaction and an admin transfer; returns an admin token"""
+    global _seeded_users
+
+    with app.app_context():
+        admin = Admin.query.filter_by(username='countadmin').first()
+        if not admin:
+            admin = Admin(
+                username='countadmin',
+                email='countadmin@example.com',
+                password_hash=generate_password_hash('CountAdmin123!'),
+                role='super_admin'
+            )
+            db.session.add(admin)
+            db.session.commit()
+
+        for i in range(_seeded_users, _seeded_users + users):
+            user = User(
+                username=f'countuser{i}',
+                email=f'countuser{i}@example.com',
+                password_hash='x'
+            )
+            db.session.add(user)
+            db.session.flush()
+
+            wallet = Wallet(user_id=user.id, currency='BTC', balance=1)
+            wallet.generate_address('BTC')
+            db.session.add(wallet)
+            db.session.flush()
+
+            transaction = Transaction(
+                user_id=user.id,
+                to_wallet_id=wallet.id,
+                from_address='ADMIN_WALLET',
+                to_address=wallet.address,
+                currency='BTC',
+                amount=1,
+                fee=0,
+                tx_hash=f'0xcount{i}',
+                transaction_type='receive',
+                status='confirmed'
+            )
+            db.session.add(transaction)
+            db.session.add(AdminAction(
+                admin_id=admin.id,
+                action_type='send_crypto',
+                target_user_id=user.id,
+                action_details={'currency': 'BTC', 'amount': '1'}
+            ))
+
+        db.session.commit()
+        _seeded_users += users
+
+        return jwt.encode({'admin_id': admin.id}, ADMIN_SECRET_KEY, algorithm='HS256')
+
+
+def statements_for(app, url, headers):
+    client = app.test_client()
+    # Warm per-process caches so the count reflects steady state
+    client.get(url, headers=headers)
+    with count_statements(app) as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+
+def check_endpoint(app, url, headers_for_token):
+    token = seed(app, 3)
+    small = statements_for(app, url, headers_for_token(token))
+
+    token = seed(app, 40)
+    large = statements_for(app, url, headers_for_token(token))
+
+    assert small == large, f'{url}: {small} statements for 3 rows but {large} for 43 rows'
+    assert large <= STATEMENT_BUDGETS[url], f'{url}: {large} statements, budget is {STATEMENT_BUDGETS[url]}'
+    return large
+
+
+def test_admin_transactions_query_count(app):
+    check_endpoint(app, '/api/admin/transactions', lambda token: ADMIN_KEY_HEADERS)
+
+
+def test_admin_stats_query_count(app):
+    check_endpoint(app, '/api/admin/stats', lambda token: ADMIN_KEY_HEADERS)
+
+
+def test_admin_crypto_transfers_query_count(app):
+    check_endpoint(app, '/api/admin/crypto-transfers', lambda token: {'Authorization': f'Bearer {token}'})
+
+
+def test_admin_users_query_count(app):
+    check_endpoint(app, '/api/admin/users', lambda token: ADMIN_KEY_HEADERS)
+
+
+if __name__ == "__main__":
+    print("=== Admin Listing Query Count Test ===")
+    print()
+
+    app = make_app()
+    for url, headers_for_token in [
+        ('/api/admin/transactions', lambda token: ADMIN_KEY_HEADERS),
+        ('/api/admin/stats', lambda token: ADMIN_KEY_HEADERS),
+        ('/api/admin/crypto-transfers', lambda token: {'Authorization': f'Bearer {token}'}),
+        ('/api/admin/users', lambda token: ADMIN_KEY_HEADERS),
+    ]:
+        count = check_endpoint(app, url, headers_for_token)
+        print(f"   ✅ {url}: {count} statements (budget {STATEMENT_BUDGETS[url]})")
+
+    print()
+    print("✅ All admin listings run a constant number of queries per page!")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Index usage test for the hot read routes.
+
+Calls each route against a seeded scratch database, captures the SELECTs it
+issues and runs EXPLAIN QUERY PLAN on them. A plan step that scans a table
+without an index means a hot path has lost its index.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+from sqlalchemy import event
+from conftest import ADMIN_KEY_HEADERS, make_app
+from src.models.user import db, User
+from src.routes.user import SECRET_KEY as USER_SECRET_KEY
+from test_query_counts import seed
+
+_tokens = {}
+
+
+def tokens(app):
+    if app not in _tokens:
+        _tokens[app] = {'admin': seed(app, 20)}
+        with app.app_context():
+            user = User.query.order_by(User.id).first()
+            _tokens[app]['user'] = jwt.encode({'user_id': user.id}, USER_SECRET_KEY, algorithm='HS256')
+    return _tokens[app]
+
+
+def user_headers(app):
+    return {'Authorization': f"Bearer {tokens(app)['user']}"}
+
+
+def admin_headers(app):
+    return {'Authorization': f"Bearer {tokens(app)['admin']}"}
+
+
+ROUTES = [
+    ('/api/wallets', user_headers),
+    ('/api/wallets/BTC', user_headers),
+    ('/api/transactions', user_headers),
+    ('/api/transactions/BTC', user_headers),
+    ('/api/kyc/status', user_headers),
+    ('/api/admin/transactions', lambda app: ADMIN_KEY_HEADERS),
+    ('/api/admin/users', lambda app: ADMIN_KEY_HEADERS),
+    ('/api/admin/crypto-transfers', admin_headers),
+    ('/api/admin/actions', admin_headers),
+    ('/api/admin/actions?action_type=send_crypto', admin_headers),
+]
+
+
+def capture_selects(app, url, headers):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    # GET requests read from the read-only pool, so watch every engine
+    engines = list(app.extensions['db_engine'].engines().values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = app.test_client().get(url, headers=headers)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200, response.get_json()
+    return statements
+
+
+def unindexed_scans(app, statement, parameters):
+    """Return the plan steps that read a table without using an index"""
+    with app.app_context():
+        with db.engine.connect() as conn:
+            plan = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+
+    # An unfiltered rowid-order scan that needs no sort stops after LIMIT
+    # rows, so a first keyset page over the primary key is still bounded
+    upper = statement.upper()
+    if 'LIMIT' in upper and 'WHERE' not in upper and not any('TEMP B-TREE' in step for step in plan):
+        return []
+    return [
+        step for step in plan
+        if step.startswith('SCAN ') and 'INDEX' not in step and 'PRIMARY KEY' not in step
+    ]
+
+
+def check_route(app, url, headers):
+    statements = capture_selects(app, url, headers)
+    assert statements, f'{url}: no SELECT statements captured'
+
+    for statement, parameters in statements:
+        scans = unindexed_scans(app, statement, parameters)
+        assert not scans, f'{url}: {scans} in plan for {statement}'
+    return len(statements)
+
+
+def test_hot_routes_use_indexes(app):
+    for url, headers in ROUTES:
+        check_route(app, url, headers(app))
+
+
+if __name__ == "__main__":
+    print("=== Hot Route Query Plan Test ===")
+    print()
+
+    app = make_app()
+    for url, headers in ROUTES:
+        count = check_route(app, url, headers(app))
+        print(f"   ✅ {url}: {count} SELECT(s), all index-backed")
+
+    print()
+    print("✅ Every hot route reads through an index!")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Read replica routing test.
+
+Builds the app with one replica, a SQLite file copy of its primary taken
+before the primary's last write. GET reads must see the copy while it is
+within the lag bound, a client must read its own writes right after
+writing, a replica that falls too far behind must stop serving reads, and
+auth checks must see a block the moment it commits.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+import pytest
+from flask import jsonify
+from sqlalchemy.engine import make_url
+from conftest import make_app, scratch_dir
+from src.models.user import db, User
+from src.routes.user import SECRET_KEY as USER_SECRET_KEY
+from test_query_counts import seed
+
+
+def config():
+    return {
+        'DATABASE_REPLICAS': [f"sqlite:///{os.path.join(scratch_dir(), 'replica.db')}"],
+        'DATABASE_REPLICA_MAX_LAG': 0.5,
+        # The test drives lag checks itself; the monitor's first check
+        # lands before any lag has built up and the next one never comes
+        'DATABASE_REPLICA_CHECK_INTERVAL': 3600,
+    }
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    return config()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def replicated(app):
+    add_replicated_routes(app)
+
+
+def count_users():
+    return jsonify({'users': User.query.count()})
+
+
+def touch():
+    return jsonify({'message': 'ok'})
+
+
+def add_user(name):
+    db.session.add(User(username=name, email=f'{name}@example.com', password_hash='x'))
+    db.session.commit()
+
+
+def database_path(uri):
+    return make_url(uri).database
+
+
+def copy_primary_to_replica(app):
+    source = sqlite3.connect(database_path(app.config['SQLALCHEMY_DATABASE_URI']))
+    target = sqlite3.connect(database_path(app.config['DATABASE_REPLICAS'][0]))
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+def add_replicated_routes(app):
+    """Add the probe routes, then a replica that misses the primary's last write"""
+    app.add_url_rule('/users/count', view_func=count_users)
+    app.add_url_rule('/touch', view_func=touch, methods=['POST'])
+    replicas = app.extensions['db_engine']
+    with app.app_context():
+        add_user('replicated')
+        replicas.beat()
+        copy_primary_to_replica(app)
+        add_user('not_replicated_yet')
+        replicas.check_replicas()
+
+
+def count(client, token):
+    return client.get('/users/count', headers={'Authorization': token}).get_json()['users']
+
+
+def test_reads_use_a_replica_within_bounds(app):
+    assert app.extensions['db_engine'].replica_status()['replica0']['healthy']
+    assert count(app.test_client(), 'reader') == 1
+
+
+def test_writers_read_their_own_writes(app):
+    client = app.test_client()
+    assert client.post('/touch', headers={'Authorization': 'writer'}).status_code == 200
+    assert count(client, 'writer') == 2
+    assert count(client, 'reader') == 1
+
+
+def test_lagging_replica_stops_serving_reads(app):
+    replicas = app.extensions['db_engine']
+    time.sleep(app.config['DATABASE_REPLICA_MAX_LAG'] + 0.1)
+    with app.app_context():
+        lags = replicas.check_replicas()
+    assert lags['replica0'] > app.config['DATABASE_REPLICA_MAX_LAG']
+    assert not replicas.replica_status()['replica0']['healthy']
+    assert count(app.test_client(), 'reader') == 2
+
+
+def test_block_is_seen_despite_a_lagging_replica():
+    # A replica within a generous bound that predates the block
+    app = make_app({**config(), 'DATABASE_REPLICA_MAX_LAG': 5})
+    admin_headers = {'Authorization': f'Bearer {seed(app, 0)}'}
+    with app.app_context():
+        add_user('blocked_on_primary')
+        user_id = User.query.filter_by(username='blocked_on_primary').one().id
+        app.extensions['db_engine'].beat()
+        copy_primary_to_replica(app)
+        app.extensions['db_engine'].check_replicas()
+    assert app.extensions['db_engine'].replica_status()['replica0']['healthy']
+    headers = {'Authorization': f"Bearer {jwt.encode({'user_id': user_id}, USER_SECRET_KEY, algorithm='HS256')}"}
+    client = app.test_client()
+
+    assert client.get('/api/profile', headers=headers).status_code == 200
+    response = client.post(f'/api/admin/users/{user_id}/block', json={'reason': 'lagging'}, headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+    # Neither the next request nor a cached copy of its principal is stale
+    for _ in range(2):
+        response = client.get('/api/profile', headers=headers)
+        assert response.status_code == 403, response.get_json()
+        assert response.get_json()['blocked_reason'] == 'lagging'
+
+
+if __name__ == "__main__":
+    print("=== Read Replica Routing Test ===")
+    print()
+
+    app = make_app(config())
+    add_replicated_routes(app)
+    test_reads_use_a_replica_within_bounds(app)
+    print("   ✅ GET reads are served by a replica within the lag bound")
+    test_writers_read_their_own_writes(app)
+    print("   ✅ A client reads its own writes right after writing")
+    test_lagging_replica_stops_serving_reads(app)
+    print("   ✅ A replica past the lag bound stops serving reads")
+    test_block_is_seen_despite_a_lagging_replica()
+    print("   ✅ A block takes effect at once even while a replica lags")
+
+    print()
+    print("✅ Read routing respects the staleness bound!")
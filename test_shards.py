@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Sharded user data test.
+
+Builds the app with its user data split over two SQLite shard files.
+Users must land on the shard their id names, usernames and emails must
+stay unique across shards, a user's requests must read and write their
+own shard, and the admin listings and dashboard must gather every shard.
+"""
+
+import os
+import sqlite3
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from sqlalchemy.engine import make_url
+from conftest import ADMIN_KEY_HEADERS, make_app, scratch_dir
+from src.models.user import User, UserDirectory
+from src.services.shards import ShardNotSelected, shard_router
+
+SHARDS = 2
+USERS = 6
+
+
+def config():
+    scratch = scratch_dir()
+    return {'DATABASE_SHARDS': [f"sqlite:///{os.path.join(scratch, f'shard{index}.db')}" for index in range(SHARDS)]}
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    return config()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def registered(app):
+    register_users(app)
+
+
+def register_users(app):
+    client = app.test_client()
+    for index in range(USERS):
+        response = register(client, f'shard{index}')
+        assert response.status_code == 201, response.get_json()
+
+
+def primary_path(app):
+    return make_url(app.config['SQLALCHEMY_DATABASE_URI']).database
+
+
+def shard_paths(app):
+    return [make_url(uri).database for uri in app.config['DATABASE_SHARDS']]
+
+
+def register(client, name, email=None):
+    return client.post('/api/register', json={
+        'username': name, 'email': email or f'{name}@example.com', 'password': 'Secret123!'
+    })
+
+
+def rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_users_live_on_the_shard_their_id_names(app):
+    placed = {}
+    for shard, path in enumerate(shard_paths(app)):
+        for user_id, in rows(path, 'SELECT id FROM user'):
+            assert user_id % SHARDS == shard
+            placed[user_id] = shard
+        wallet_owners = {user_id for user_id, in rows(path, 'SELECT user_id FROM wallet')}
+        assert wallet_owners == {user_id for user_id, shard_of in placed.items() if shard_of == shard}
+    assert len(placed) == USERS
+    primary = primary_path(app)
+    assert rows(primary, 'SELECT count(*) FROM user') == [(0,)]
+    assert rows(primary, 'SELECT count(*) FROM user_directory') == [(USERS,)]
+    assert rows(primary, 'SELECT count(*) FROM address_directory') == [(USERS * 3,)]
+
+
+def test_usernames_and_emails_are_unique_across_shards(app):
+    client = app.test_client()
+    for attempt in range(2):
+        response = register(client, 'shard0', email=f'other{attempt}@example.com')
+        assert response.status_code == 400
+        assert response.get_json()['message'] == 'Username already exists'
+        response = register(client, f'other{attempt}', email='shard1@example.com')
+        assert response.status_code == 400
+        assert response.get_json()['message'] == 'Email already exists'
+
+
+def test_user_requests_use_their_shard(app):
+    client = app.test_client()
+    response = client.post('/api/login', json={'username': 'shard3', 'password': 'Secret123!'})
+    assert response.status_code == 200, response.get_json()
+    user_id = response.get_json()['user']['id']
+    headers = {'Authorization': f'Bearer {response.get_json()["token"]}'}
+
+    response = client.post(f'/api/admin/users/{user_id}/add-crypto', headers=ADMIN_KEY_HEADERS,
+                           json={'currency': 'BTC', 'amount': '1.5'})
+    assert response.status_code == 200, response.get_json()
+    transaction_id = response.get_json()['transaction']['id']
+    assert transaction_id % SHARDS == user_id % SHARDS
+
+    wallets = client.get('/api/wallets', headers=headers).get_json()
+    assert {wallet['currency']: wallet['balance'] for wallet in wallets}['BTC'] == 1.5
+    transactions = client.get('/api/transactions', headers=headers).get_json()
+    assert [tx['id'] for tx in transactions] == [transaction_id]
+
+
+def test_admin_listings_gather_every_shard(app):
+    client = app.test_client()
+    response = client.get('/api/admin/users?limit=4&include_total=true', headers=ADMIN_KEY_HEADERS)
+    first = response.get_json()
+    assert response.status_code == 200, first
+    assert first['total'] == USERS and first['count'] == 4 and first['has_next']
+    response = client.get(f'/api/admin/users?limit=4&cursor={first["next_cursor"]}', headers=ADMIN_KEY_HEADERS)
+    second = response.get_json()
+    ids = [user['id'] for user in first['users'] + second['users']]
+    assert ids == sorted(ids) and len(ids) == USERS
+    assert all(len(user['wallets']) == 3 for user in first['users'] + second['users'])
+
+    with app.app_context():
+        user_ids = [entry.id for entry in UserDirectory.query.order_by(UserDirectory.id)]
+    # One user from each shard
+    for user_id in {user_id % SHARDS: user_id for user_id in user_ids}.values():
+        response = client.post(f'/api/admin/users/{user_id}/add-crypto', headers=ADMIN_KEY_HEADERS,
+                               json={'currency': 'ETH', 'amount': '2'})
+        assert response.status_code == 200, response.get_json()
+    response = client.get('/api/admin/transactions?include_total=true', headers=ADMIN_KEY_HEADERS)
+    listing = response.get_json()
+    assert response.status_code == 200, listing
+    assert listing['pagination']['total'] == len(listing['transactions']) >= 3
+    shards = {tx['id'] % SHARDS for tx in listing['transactions']}
+    assert shards == set(range(SHARDS))
+    created = [tx['created_at'] for tx in listing['transactions']]
+    assert created == sorted(created, reverse=True)
+
+
+def test_offset_pages_gather_every_shard(app):
+    client = app.test_client()
+    client.post('/api/admin/register', json={'username': 'shardadmin', 'email': 'shardadmin@example.com', 'password': 'x'})
+    token = client.post('/api/admin/login', json={'username': 'shardadmin', 'password': 'x'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    ids = []
+    for page in range(1, 5):
+        listing = client.get(f'/api/admin/wallets?per_page=5&page={page}', headers=headers).get_json()
+        assert listing['total'] == USERS * 3 and listing['pages'] == 4
+        assert listing['has_next'] == (page < 4)
+        ids += [wallet['id'] for wallet in listing['wallets']]
+    assert ids == sorted(ids) and len(set(ids)) == USERS * 3
+
+
+def test_dashboard_sums_every_shard(app):
+    response = app.test_client().get('/api/admin/stats', headers=ADMIN_KEY_HEADERS)
+    stats = response.get_json()
+    assert response.status_code == 200, stats
+    assert stats['stats']['total_users'] == USERS
+    assert stats['stats']['total_wallets'] == USERS * 3
+    balances = {entry['currency']: entry['total_balance'] for entry in stats['currency_stats']}
+    assert balances['BTC'] == 1.5 and balances['ETH'] == 4
+
+
+def test_sharded_tables_need_a_shard(app):
+    with app.app_context():
+        with pytest.raises(ShardNotSelected):
+            User.query.count()
+        assert shard_router.count(User.query) == USERS
+
+
+if __name__ == "__main__":
+    print("=== Sharded User Data Test ===")
+    print()
+
+    app = make_app(config())
+    register_users(app)
+    test_users_live_on_the_shard_their_id_names(app)
+    print("   ✅ Users and their wallets live on the shard their id names")
+    test_usernames_and_emails_are_unique_across_shards(app)
+    print("   ✅ Usernames and emails stay unique across shards")
+    test_user_requests_use_their_shard(app)
+    print("   ✅ Login, wallets, transactions and credits use the user's shard")
+    test_admin_listings_gather_every_shard(app)
+    print("   ✅ Admin user and transaction listings gather every shard in order")
+    test_offset_pages_gather_every_shard(app)
+    print("   ✅ Offset pages gather every shard in order")
+    test_dashboard_sums_every_shard(app)
+    print("   ✅ Dashboard totals sum every shard")
+    test_sharded_tables_need_a_shard(app)
+    print("   ✅ Sharded tables refuse queries with no shard chosen")
+
+    print()
+    print("✅ User data is sharded by user id!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Slow-query log test.
+
+Builds the app with a slow-query threshold that catches every statement.
+Each record must carry the statement, its parameter types (never the
+values), the route and a query plan; the log must rotate; and the admin
+endpoint must list the worst statements first.
+"""
+
+import glob
+import json
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from conftest import make_app, scratch_dir
+
+
+def config():
+    return {
+        'SLOW_QUERY_LOG_ENABLED': True,
+        'SLOW_QUERY_THRESHOLD': 0,
+        'SLOW_QUERY_LOG_PATH': os.path.join(scratch_dir(), 'slow.log'),
+        'SLOW_QUERY_LOG_MAX_BYTES': 20000,
+        'SLOW_QUERY_LOG_BACKUPS': 2,
+    }
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    return config()
+
+
+_headers = {}
+
+
+def admin_headers(app):
+    """Register a user and an admin on first use; returns the admin's headers"""
+    if app not in _headers:
+        client = app.test_client()
+        client.post('/api/register', json={'username': 'slow1', 'email': 'slow1@example.com', 'password': 'Secret123!'})
+        client.post('/api/admin/register', json={'username': 'slowadmin', 'email': 'slowadmin@example.com', 'password': 'x'})
+        token = client.post('/api/admin/login', json={'username': 'slowadmin', 'password': 'x'}).get_json()['token']
+        _headers[app] = {'Authorization': f'Bearer {token}'}
+    return _headers[app]
+
+
+def log_files(app):
+    return glob.glob(app.config['SLOW_QUERY_LOG_PATH'] + '*')
+
+
+def records(app):
+    entries = []
+    for path in sorted(log_files(app), reverse=True):
+        with open(path) as log:
+            entries += [json.loads(line) for line in log]
+    return entries
+
+
+def test_slow_statements_are_logged_with_route_and_plan(app):
+    response = app.test_client().get('/api/admin/wallets?currency=btc', headers=admin_headers(app))
+    assert response.status_code == 200, response.get_json()
+    listing = [entry for entry in records(app)
+               if entry['route'] and entry['route']['endpoint'] == 'admin.get_all_wallets'
+               and entry['statement'].lstrip().upper().startswith('SELECT')
+               and 'FROM wallet' in entry['statement']]
+    assert listing, 'wallet listing was not logged'
+    entry = listing[-1]
+    assert entry['route'] == {'endpoint': 'admin.get_all_wallets', 'method': 'GET', 'rule': '/api/admin/wallets'}
+    assert 'str' in entry['parameters'] and 'BTC' not in json.dumps(entry)
+    assert entry['plan'] and any('wallet' in line for line in entry['plan'])
+    assert entry['duration'] >= 0
+
+
+def test_values_never_reach_the_log(app):
+    admin_headers(app)
+    text = ''.join(open(path).read() for path in log_files(app))
+    assert 'slow1@example.com' not in text and 'Secret123!' not in text
+    assert 'pbkdf2' not in text and 'scrypt' not in text
+
+
+def test_log_rotates(app):
+    client = app.test_client()
+    for _ in range(30):
+        client.get('/api/admin/wallets', headers=admin_headers(app))
+    files = log_files(app)
+    assert app.config['SLOW_QUERY_LOG_PATH'] + '.1' in files
+    assert len(files) <= 3
+    assert all(os.path.getsize(path) <= 20000 + 5000 for path in files)
+
+
+def test_admin_endpoint_lists_worst_first(app):
+    client = app.test_client()
+    headers = admin_headers(app)
+    response = client.get('/api/admin/slow-queries?sort=count&limit=5', headers=headers)
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert body['enabled'] and body['threshold'] == 0
+    counts = [query['count'] for query in body['queries']]
+    assert 0 < len(counts) <= 5 and counts == sorted(counts, reverse=True)
+    assert all('plan' in query and 'route' in query for query in body['queries'])
+
+    assert client.get('/api/admin/slow-queries?sort=bogus', headers=headers).status_code == 400
+    assert client.get('/api/admin/slow-queries').status_code == 401
+
+
+def test_fast_statements_are_not_recorded(app):
+    slow_queries = app.extensions['slow_queries']
+    headers = admin_headers(app)
+    slow_queries.threshold = 60
+    try:
+        slow_queries.clear()
+        before = len(records(app))
+        app.test_client().get('/api/admin/wallets', headers=headers)
+        assert slow_queries.top() == []
+        assert len(records(app)) <= before
+    finally:
+        slow_queries.threshold = 0
+
+
+if __name__ == "__main__":
+    print("=== Slow-Query Log Test ===")
+    print()
+
+    app = make_app(config())
+    test_slow_statements_are_logged_with_route_and_plan(app)
+    print("   ✅ Slow statements are logged with their route and query plan")
+    test_values_never_reach_the_log(app)
+    print("   ✅ Only parameter types are logged, never values")
+    test_log_rotates(app)
+    print("   ✅ The log rotates and keeps a bounded number of files")
+    test_admin_endpoint_lists_worst_first(app)
+    print("   ✅ The admin endpoint lists the worst statements first")
+    test_fast_statements_are_not_recorded(app)
+    print("   ✅ Statements under the threshold are not recorded")
+
+    print()
+    print("✅ Slow queries are logged with their plans!")
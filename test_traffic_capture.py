@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Traffic capture test.
+
+Builds the app with capture enabled. Every request must be recorded with
+its route, principal, status, timing and size; passwords, emails,
+usernames and tokens must never reach the capture; and load() and
+materialize() must turn the records back into requests of the same shape.
+"""
+
+import json
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from conftest import ADMIN_KEY_HEADERS, make_app, scratch_dir
+from src.services.traffic_capture import load, materialize, sanitize
+
+
+def config():
+    return {'TRAFFIC_CAPTURE_ENABLED': True, 'TRAFFIC_CAPTURE_DIR': os.path.join(scratch_dir(), 'traffic')}
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    return config()
+
+
+_tokens = {}
+
+
+def user_token(app):
+    """Send the captured requests on first use; returns the registered user's token"""
+    if app not in _tokens:
+        client = app.test_client()
+        response = client.post('/api/register', json={
+            'username': 'trafficuser', 'email': 'traffic@example.com', 'password': 'Secret123!'
+        })
+        assert response.status_code == 201, response.get_json()
+        _tokens[app] = response.get_json()['token']
+        # A WSGI server always closes the response; the test client leaves it to us
+        response.close()
+        client.post('/api/login', json={'username': 'trafficuser', 'password': 'Secret123!'}).close()
+        client.get('/api/transactions/btc', headers={'Authorization': f'Bearer {_tokens[app]}'}).close()
+        client.get('/api/admin/users?search=traffic&page=2', headers=ADMIN_KEY_HEADERS).close()
+        # The SPA catch-all serves every GET, so only another method goes unmatched
+        client.post('/api/no-such-route').close()
+    return _tokens[app]
+
+
+def capture_files(app):
+    capture_dir = app.config['TRAFFIC_CAPTURE_DIR']
+    return sorted(os.path.join(capture_dir, name) for name in os.listdir(capture_dir))
+
+
+def records(app):
+    user_token(app)
+    return load([app.config['TRAFFIC_CAPTURE_DIR']])
+
+
+def test_requests_are_recorded(app):
+    captured = records(app)
+    assert [record['r'] for record in captured] == [
+        '/api/register', '/api/login', '/api/transactions/<string:currency>', '/api/admin/users', None
+    ]
+    assert [record['s'] for record in captured] == [201, 200, 200, 200, 405]
+    assert all(record['d'] > 0 and record['z'] > 0 for record in captured)
+    assert [record['t'] for record in captured] == sorted(record['t'] for record in captured)
+    register, login, transactions, admin_users, _ = captured
+    assert register['a'] is None and register['k'] == 'json'
+    assert transactions['a'] == ['user', 1] and transactions['p'] == '/api/transactions/btc'
+    assert admin_users['a'] == ['admin_key']
+    assert admin_users['q'] == {'search': '~s7', 'page': 2}
+
+
+def test_content_never_reaches_the_capture(app):
+    token = user_token(app)
+    text = ''.join(open(path).read() for path in capture_files(app))
+    for secret in ('trafficuser', 'traffic@example.com', 'Secret123!', token, 'alphazee09_admin_2024'):
+        assert secret not in text
+    register = records(app)[0]
+    assert register['b'] == {'username': '~s11', 'email': '~e19', 'password': '~s10'}
+
+
+def test_sanitize_keeps_plan_steering_fields():
+    shape = sanitize({'currency': 'BTC', 'amount': '0.5', 'to_address': '0xabc', 'items': [1, 'x'], 'flag': True})
+    assert shape == {'currency': 'BTC', 'amount': '0.5', 'to_address': '~s5', 'items': [1, '~s1'], 'flag': True}
+
+
+def test_materialize_restores_the_shape(app):
+    rng = random.Random(0)
+    body = materialize(records(app)[0]['b'], rng)
+    assert len(body['username']) == 11 and len(body['password']) == 10
+    assert '@' in body['email'] and len(body['email']) == 19
+    assert materialize({'currency': 'BTC', 'page': 2}, rng) == {'currency': 'BTC', 'page': 2}
+    assert materialize(records(app)[0]['b'], random.Random(0)) == body
+
+
+def test_replayed_request_is_served(app):
+    # A captured registration replays as a new registration of the same shape
+    register = records(app)[0]
+    body = materialize(register['b'], random.Random(1))
+    response = app.test_client().open(register['p'], method=register['m'], json=body)
+    assert response.status_code == register['s']
+    response.close()
+    assert json.loads(open(capture_files(app)[-1]).read().splitlines()[-1])['r'] == '/api/register'
+
+
+if __name__ == "__main__":
+    print("=== Traffic Capture Test ===")
+    print()
+
+    app = make_app(config())
+    test_requests_are_recorded(app)
+    print("   ✅ Requests are recorded with route, principal, status, timing and size")
+    test_content_never_reaches_the_capture(app)
+    print("   ✅ Passwords, emails, usernames and tokens never reach the capture")
+    test_sanitize_keeps_plan_steering_fields()
+    print("   ✅ Enumerated fields are kept, free-form strings become their length")
+    test_materialize_restores_the_shape(app)
+    print("   ✅ Records materialize into repeatable requests of the same shape")
+    test_replayed_request_is_served(app)
+    print("   ✅ A materialized request is served like the captured one")
+
+    print()
+    print("✅ Traffic is captured for replay!")
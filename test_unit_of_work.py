@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Request unit-of-work test.
+
+Write requests must commit exactly once, error responses must leave no
+partial changes behind, a failed commit must not be reported as success,
+and read-only requests must not commit at all.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from conftest import make_app
+from src.models.user import db, User, Wallet
+from test_balance_concurrency import make_wallet
+
+_registrations = 0
+
+
+@contextmanager
+def count_commits(app):
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    # GET requests read from the read-only pool, so watch every engine
+    engines = list(app.extensions['db_engine'].engines().values())
+    for engine in engines:
+        event.listen(engine, 'commit', on_commit)
+    try:
+        yield commits
+    finally:
+        for engine in engines:
+            event.remove(engine, 'commit', on_commit)
+
+
+def register(client):
+    global _registrations
+    _registrations += 1
+    name = f'uow{_registrations}'
+    return name, client.post('/api/register', json={
+        'username': name, 'email': f'{name}@example.com', 'password': 'Secret123!'
+    })
+
+
+def test_register_commits_once(app):
+    with count_commits(app) as commits:
+        name, response = register(app.test_client())
+    assert response.status_code == 201, response.get_json()
+    assert len(commits) == 1
+    with app.app_context():
+        user = User.query.filter_by(username=name).one()
+        assert Wallet.query.filter_by(user_id=user.id).count() == 3
+
+
+def test_error_response_discards_staged_changes(app):
+    user_id, wallet_id, headers = make_wallet(app, 0)
+    response = app.test_client().put('/api/profile', headers=headers, json={
+        'first_name': 'Changed', 'profile_image': 'data:image/png;base64,not an image'
+    })
+    assert response.status_code == 400, response.get_json()
+    with app.app_context():
+        assert db.session.get(User, user_id).first_name != 'Changed'
+
+
+def test_failed_commit_is_reported(app):
+    def refuse(session):
+        raise RuntimeError('disk full')
+
+    event.listen(Session, 'before_commit', refuse)
+    try:
+        name, response = register(app.test_client())
+    finally:
+        event.remove(Session, 'before_commit', refuse)
+    assert response.status_code == 500, response.get_json()
+    assert 'disk full' in response.get_json()['message']
+    with app.app_context():
+        assert User.query.filter_by(username=name).count() == 0
+
+
+def test_reads_do_not_commit(app):
+    user_id, wallet_id, headers = make_wallet(app, 0)
+    client = app.test_client()
+    with count_commits(app) as commits:
+        for url in ['/api/profile', '/api/wallets', '/api/transactions']:
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200, response.get_json()
+    assert commits == []
+
+
+if __name__ == "__main__":
+    print("=== Unit of Work Test ===")
+    print()
+
+    app = make_app()
+    test_register_commits_once(app)
+    print("   ✅ Registration (user + 3 wallets) commits once")
+    test_error_response_discards_staged_changes(app)
+    print("   ✅ An error response discards the request's staged changes")
+    test_failed_commit_is_reported(app)
+    print("   ✅ A failed commit returns 500 and persists nothing")
+    test_reads_do_not_commit(app)
+    print("   ✅ Read-only requests do not commit")
+
+    print()
+    print("✅ Every request commits once or not at all!")
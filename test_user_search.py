@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Admin user search test.
+
+Searches GET /api/admin/users through the app from create_app(), which
+also serves that URL to the admin panel's X-Admin-Key listing. Searches
+must match any substring of username, email or name case-insensitively
+through the FTS5 index rather than a table scan, rank the best matches
+first, page correctly, and follow inserts, updates and deletes. Migration
+9 must index a database that predates the index.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import event, text
+from conftest import ADMIN_KEY_HEADERS, make_app
+from src.models.migrations import _user_search_index
+from src.models.user import User, db
+from src.services import user_search
+
+USERS = [
+    ('searchme', 'searchme@example.com', 'Sam', 'Smith'),
+    ('alice', 'alice@wonder.example', 'Alice', 'Liddell'),
+    ('bob', 'bob@example.com', 'Robert', 'Researchmenot'),
+    ('carol', 'carol@example.com', 'Carol', 'Danvers'),
+    ('dave', 'dave@example.com', 'David', 'Bowie'),
+]
+
+_headers = {}
+
+
+def admin_headers(app):
+    """Add USERS and an admin on first use; returns the admin's headers"""
+    if app not in _headers:
+        with app.app_context():
+            for username, email, first_name, last_name in USERS:
+                db.session.add(User(username=username, email=email, password_hash='x',
+                                    first_name=first_name, last_name=last_name))
+            db.session.commit()
+        client = app.test_client()
+        client.post('/api/admin/register', json={'username': 'searchadmin', 'email': 'searchadmin@example.com', 'password': 'x'})
+        token = client.post('/api/admin/login', json={'username': 'searchadmin', 'password': 'x'}).get_json()['token']
+        _headers[app] = {'Authorization': f'Bearer {token}'}
+    return _headers[app]
+
+
+def search(app, term, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    response = app.test_client().get(f'/api/admin/users?search={term}&{query}', headers=admin_headers(app))
+    body = response.get_json()
+    assert response.status_code == 200, body
+    return body
+
+
+def usernames(app, term, **params):
+    return [user['username'] for user in search(app, term, **params)['users']]
+
+
+def test_index_is_created_with_the_table(app):
+    with app.app_context():
+        names = {row[0] for row in db.session.execute(text('SELECT name FROM sqlite_master'))}
+    assert {'user_search', 'user_search_insert', 'user_search_update', 'user_search_delete'} <= names
+
+
+def test_substrings_match_case_insensitively(app):
+    assert usernames(app, 'ALIC') == ['alice']
+    assert usernames(app, 'wonder') == ['alice']
+    assert usernames(app, 'bowi') == ['dave']
+    assert usernames(app, 'nobody') == []
+
+
+def test_best_matches_rank_first(app):
+    # searchme matches in username and email; bob only inside his last name
+    assert usernames(app, 'searchme') == ['searchme', 'bob']
+
+
+def test_search_uses_the_index(app):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if 'MATCH' in statement:
+            statements.append((statement, parameters))
+
+    engines = list(app.extensions['db_engine'].engines().values())
+    for each in engines:
+        event.listen(each, 'before_cursor_execute', on_execute)
+    try:
+        search(app, 'example')
+    finally:
+        for each in engines:
+            event.remove(each, 'before_cursor_execute', on_execute)
+    assert statements
+    with app.app_context():
+        for statement, parameters in statements:
+            plan = ' '.join(row[3] for row in db.session.connection().exec_driver_sql(
+                'EXPLAIN QUERY PLAN ' + statement, parameters
+            ))
+            assert 'VIRTUAL TABLE INDEX' in plan
+            assert 'SCAN user ' not in plan + ' '
+
+
+def test_results_are_paged(app):
+    # Every user has "example" in their email
+    pages = [search(app, 'example', per_page=2, page=page) for page in (1, 2, 3)]
+    assert pages[0]['total'] == 5 and pages[0]['pages'] == 3
+    assert [page['has_next'] for page in pages] == [True, True, False]
+    ids = [user['id'] for page in pages for user in page['users']]
+    assert len(ids) == len(set(ids)) == 5
+
+
+def test_short_terms_fall_back_to_like(app):
+    assert usernames(app, 'bo') == ['bob', 'dave']
+
+
+def test_admin_key_gets_the_panel_listing(app):
+    admin_headers(app)
+    client = app.test_client()
+    response = client.get('/api/admin/users?limit=2&search=alice', headers=ADMIN_KEY_HEADERS)
+    body = response.get_json()
+    assert response.status_code == 200, body
+    # Keyset pages by id with wallets, not ranked search results
+    assert [user['username'] for user in body['users']] == ['searchme', 'alice']
+    assert body['has_next'] and body['next_cursor'] and 'wallets' in body['users'][0]
+    assert client.get('/api/admin/users?search=alice').status_code == 401
+
+
+def test_index_follows_writes(app):
+    admin_headers(app)
+    with app.app_context():
+        carol = User.query.filter_by(username='carol').one()
+        carol.last_name = 'Marvel'
+        db.session.add(User(username='erin', email='erin@example.org', password_hash='x'))
+        db.session.delete(User.query.filter_by(username='dave').one())
+        db.session.commit()
+    assert usernames(app, 'marvel') == ['carol']
+    assert usernames(app, 'danvers') == []
+    assert usernames(app, 'example.org') == ['erin']
+    assert usernames(app, 'bowie') == []
+
+
+def test_migration_indexes_existing_users(app):
+    admin_headers(app)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE user_search')
+            for trigger in ('insert', 'update', 'delete'):
+                conn.exec_driver_sql(f'DROP TRIGGER user_search_{trigger}')
+            conn.exec_driver_sql(
+                "INSERT INTO user (username, email, password_hash, first_name, last_name) "
+                "VALUES ('frank', 'frank@legacy.example', 'x', 'Frank', 'Zappa')"
+            )
+        user_search._available.clear()
+        assert not user_search.available()
+        with db.engine.begin() as conn:
+            _user_search_index(conn)
+    user_search._available.clear()
+    assert usernames(app, 'legacy') == ['frank']
+    assert usernames(app, 'alice') == ['alice']
+
+
+if __name__ == "__main__":
+    print("=== Admin User Search Test ===")
+    print()
+
+    app = make_app()
+    test_index_is_created_with_the_table(app)
+    print("   ✅ The FTS5 index and its triggers are created with the user table")
+    test_substrings_match_case_insensitively(app)
+    print("   ✅ Any substring of username, email or name matches, ignoring case")
+    test_best_matches_rank_first(app)
+    print("   ✅ Results are ranked best match first")
+    test_search_uses_the_index(app)
+    print("   ✅ Searches use the index instead of scanning users")
+    test_results_are_paged(app)
+    print("   ✅ Ranked results are paged")
+    test_short_terms_fall_back_to_like(app)
+    print("   ✅ Terms under three characters fall back to LIKE")
+    test_admin_key_gets_the_panel_listing(app)
+    print("   ✅ Admin key requests still get the admin panel's keyset listing")
+    test_index_follows_writes(app)
+    print("   ✅ The index follows inserts, updates and deletes")
+    test_migration_indexes_existing_users(app)
+    print("   ✅ Migration 9 indexes users that predate the index")
+
+    print()
+    print("✅ Admin user search is indexed!")